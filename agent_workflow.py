@@ -0,0 +1,60 @@
+import re
+
+# Company ID references inside agent prompts: "_" followed by a 24 character hex ID.
+COMPANY_REFERENCE_PATTERN = re.compile(r'_[a-fA-F0-9]{24}')
+
+# Server-managed agent fields; id and companyId must stay in the payload.
+AGENT_READ_ONLY_FIELDS = {"createdAt", "updatedAt"}
+
+
+def retarget_agent(setup_api, agent_id: str, target_company_id: str) -> dict:
+    """
+    Points the prompt of an agent in the target company at target_company_id.
+
+    Fetches the agent's versions (latest first), replaces every company reference in the
+    latest prompt with "_<target_company_id>", increments the version and PUTs the agent back.
+
+    Returns:
+        dict: Result row with agent, id, sent_version, replacements, status ("OK" or
+              "FAILED: ..."), payload and api_response.
+    """
+    versions = setup_api.get_agent_by_id(agent_id)
+    if not versions:
+        return {
+            "agent": agent_id,
+            "id": agent_id,
+            "sent_version": "-",
+            "replacements": "",
+            "status": f"FAILED: could not fetch versions. {setup_api.last_error or ''}",
+            "payload": None,
+            "api_response": None,
+        }
+
+    agent = versions[0]
+    prompt = agent.get("prompt") or ""
+    matches = COMPANY_REFERENCE_PATTERN.findall(prompt)
+    replacements_label = (
+        ", ".join(f"{m} → _{target_company_id}" for m in sorted(set(matches)))
+        if matches else "none"
+    )
+
+    version_str = str(agent.get("version", "1.0"))
+    try:
+        new_version = str(int(float(version_str)) + 1)
+    except (ValueError, TypeError):
+        new_version = "2"
+
+    payload = {k: v for k, v in agent.items() if k not in AGENT_READ_ONLY_FIELDS}
+    payload["prompt"] = COMPANY_REFERENCE_PATTERN.sub(f"_{target_company_id}", prompt)
+    payload["version"] = new_version
+
+    update_result = setup_api.update_agent(agent_id, payload)
+    return {
+        "agent": agent.get("name", agent_id),
+        "id": agent_id,
+        "sent_version": new_version,
+        "replacements": replacements_label,
+        "status": "OK" if update_result is not None else f"FAILED: {setup_api.last_error or 'unknown error'}",
+        "payload": payload,
+        "api_response": update_result,
+    }
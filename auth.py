@@ -173,12 +173,13 @@ class HypatosAPI:
 
 
         
-    def get_all_routing_rule_ids(self, limit=20):
+    def get_routing_rules(self, limit=20):
         """
-        Retrieves all routing rule IDs using the routingsList endpoint (/v2/routings).
-        This method uses pagination to fetch all rules and returns a list of their IDs.
+        Retrieves all routing rules as returned by the routingsList endpoint (/v2/routings).
+        This method uses pagination to fetch all rules and returns a list of rule dictionaries,
+        or None if any page cannot be retrieved (a partial listing is never returned).
         """
-        all_ids = []
+        all_rules = []
         offset = 0
 
         while True:
@@ -186,24 +187,25 @@ class HypatosAPI:
                 "limit": str(limit),
                 "offset": str(offset)
             }
-            response = requests.get(
-                f"{self.base_url}/routings",
-                headers=self.get_headers(),
-                params=query
-            )
+            try:
+                response = requests.get(
+                    f"{self.base_url}/routings",
+                    headers=self.get_headers(),
+                    params=query
+                )
+            except Exception as err:
+                print(f"Unexpected error while retrieving routing rules: {err}")
+                return None
             if response.status_code != 200:
                 print(f"Failed to retrieve routing rules. Status code: {response.status_code}")
-                break
+                return None
 
             data = response.json()
             rules = data.get("data", [])
             if not rules:
                 break
 
-            for rule in rules:
-                rule_id = rule.get("id")
-                if rule_id:
-                    all_ids.append(rule_id)
+            all_rules.extend(rules)
 
             # If fewer than 'limit' rules were returned, we've reached the end.
             if len(rules) < limit:
@@ -211,7 +213,14 @@ class HypatosAPI:
 
             offset += limit
 
-        return all_ids
+        return all_rules
+
+    def get_all_routing_rule_ids(self, limit=20):
+        """
+        Retrieves all routing rule IDs using the routingsList endpoint (/v2/routings).
+        This method uses pagination to fetch all rules and returns a list of their IDs.
+        """
+        return [rule["id"] for rule in self.get_routing_rules(limit) or [] if rule.get("id")]
 
     def get_routing_by_id(self, routing_id):
         """
@@ -249,6 +258,30 @@ class HypatosAPI:
             print(f"Unexpected error while updating project {project_id}: {err}")
         return None
 
+    def create_project(self, payload, body=None):
+        """
+        Creates a new project using POST /projects.
+        Expects a payload with name, note, ocr, extractionModelId, completion, duplicates,
+        members, schema and retentionDays. body, if given, is the payload already encoded
+        as JSON bytes and is sent as is.
+        Returns the created project on success, or None on failure.
+        """
+        url = f"{self.base_url}/projects"
+        headers = self.get_headers()
+        try:
+            if body is not None:
+                headers["Content-Type"] = "application/json"
+                response = requests.post(url, data=body, headers=headers)
+            else:
+                response = requests.post(url, json=payload, headers=headers)
+            response.raise_for_status()
+            return response.json()
+        except requests.HTTPError as http_err:
+            print(f"HTTP error while creating project {payload.get('name')}: {http_err}")
+        except Exception as err:
+            print(f"Unexpected error while creating project {payload.get('name')}: {err}")
+        return None
+
     def create_routing_rule(self, rule_payload):
         """
         Creates a new routing rule using the /routings endpoint.
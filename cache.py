@@ -0,0 +1,238 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from fetcher import DEFAULT_FETCH_WORKERS, fetch_many
+
+# How long fetched project details and schemas are reused before the API is asked again.
+RESPONSE_TTL_SECONDS = 600
+
+# Maximum age of a cached response that an action writing to a company may copy from.
+# Anything older may have been changed elsewhere in the meantime and is fetched again.
+PREFETCH_MAX_AGE_SECONDS = 60
+
+
+def canonical_json(obj) -> bytes:
+    """Serializes obj as canonical JSON (sorted keys, compact separators) in UTF-8."""
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def canonical_hash(obj) -> str:
+    """
+    Returns a SHA-256 hex digest of obj serialized as canonical JSON,
+    so equal content always hashes the same regardless of key order.
+    """
+    return hashlib.sha256(canonical_json(obj)).hexdigest()
+
+
+class LRUCache:
+    """
+    A thread-safe, bounded least-recently-used cache with an optional time-to-live.
+    Module-level instances are shared by every page and session of the app process.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None, max_age: float = None):
+        """
+        Returns the cached value for key, or default if it is missing or expired. With max_age,
+        a value stored more than max_age seconds ago is treated as missing (but kept).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if self.ttl_seconds is not None and age > self.ttl_seconds:
+                del self._entries[key]
+                self.misses += 1
+                return default
+            if max_age is not None and age > max_age:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Stores value under key, evicting the least recently used entries beyond max_entries."""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Diff results keyed by (comparison kind, source content hash, target content hash).
+DIFF_CACHE = LRUCache(max_entries=2048)
+
+# API responses keyed by (resource, base_url, client_id, project_id).
+RESPONSE_CACHE = LRUCache(max_entries=8192, ttl_seconds=RESPONSE_TTL_SECONDS)
+
+
+# Background fetches started by prefetch_projects, shared by every session of the app process.
+_PREFETCH_POOL = ThreadPoolExecutor(max_workers=DEFAULT_FETCH_WORKERS, thread_name_prefix="prefetch")
+_IN_FLIGHT = {}
+_IN_FLIGHT_LOCK = threading.Lock()
+
+
+def _response_key(resource, auth, project_id):
+    # The client_id is part of the key so one tenant's credentials never see another's cached data.
+    return (resource, auth.base_url, auth.client_id, project_id)
+
+
+def _cached_response(key, max_age=None):
+    """The cached response for key, waiting for a running prefetch of it first."""
+    cached = RESPONSE_CACHE.get(key, max_age=max_age)
+    if cached is not None:
+        return cached
+    with _IN_FLIGHT_LOCK:
+        future = _IN_FLIGHT.get(key)
+    if future is None:
+        return None
+    wait([future])
+    return RESPONSE_CACHE.get(key, max_age=max_age)
+
+
+def _fetch_schema(auth, project_id):
+    schema = auth.get_project_schema(project_id)
+    if not schema:
+        return None, None
+    entry = (schema, canonical_hash(schema))
+    RESPONSE_CACHE.set(_response_key("schema", auth, project_id), entry)
+    return entry
+
+
+def _fetch_details(auth, project_id):
+    details = auth.get_project_by_id(project_id)
+    if details:
+        RESPONSE_CACHE.set(_response_key("details", auth, project_id), details)
+    return details
+
+
+def cached_project_schema(auth, project_id, use_cache=True, max_age=None):
+    """
+    Returns (schema, content_hash) for a project, reusing a recent or prefetched response if
+    available (and, with max_age, fetched at most max_age seconds ago).
+    Returns (None, None) if the schema cannot be fetched.
+    """
+    if use_cache:
+        cached = _cached_response(_response_key("schema", auth, project_id), max_age)
+        if cached is not None:
+            return cached
+    return _fetch_schema(auth, project_id)
+
+
+def cached_project_details(auth, project_id, use_cache=True, max_age=None):
+    """
+    Returns the project details, reusing a recent or prefetched response if available
+    (and, with max_age, fetched at most max_age seconds ago), or None on failure.
+    """
+    if use_cache:
+        cached = _cached_response(_response_key("details", auth, project_id), max_age)
+        if cached is not None:
+            return cached
+    return _fetch_details(auth, project_id)
+
+
+def prefetch_projects(auth, project_ids, details=True, schemas=True, max_age=PREFETCH_MAX_AGE_SECONDS) -> int:
+    """
+    Starts fetching the details and/or schemas of projects into the response cache in the
+    background and returns immediately, e.g. as soon as projects are selected, so the action
+    that follows finds them cached. Responses being fetched or cached within max_age seconds
+    are skipped, and cached_project_details/cached_project_schema wait for a running prefetch
+    instead of fetching again. Returns the number of fetches started.
+    """
+    fetches = []
+    if details:
+        fetches.append(("details", _fetch_details))
+    if schemas:
+        fetches.append(("schema", _fetch_schema))
+    started = 0
+    for project_id in project_ids:
+        for resource, fetch in fetches:
+            key = _response_key(resource, auth, project_id)
+            with _IN_FLIGHT_LOCK:
+                if key in _IN_FLIGHT or RESPONSE_CACHE.get(key, max_age=max_age) is not None:
+                    continue
+                future = _PREFETCH_POOL.submit(fetch, auth, project_id)
+                _IN_FLIGHT[key] = future
+            future.add_done_callback(lambda _, key=key: _finish_prefetch(key))
+            started += 1
+    return started
+
+
+def _finish_prefetch(key):
+    with _IN_FLIGHT_LOCK:
+        _IN_FLIGHT.pop(key, None)
+
+
+def invalidate_project_responses(auth, project_id):
+    """Drops the cached details and schema of a project, e.g. after it was updated."""
+    RESPONSE_CACHE.pop(_response_key("details", auth, project_id))
+    RESPONSE_CACHE.pop(_response_key("schema", auth, project_id))
+
+
+def lookup_diff(kind, source_hash, target_hash):
+    """The remembered diff of two contents identified by their hashes, or None."""
+    if not source_hash or not target_hash:
+        return None
+    return DIFF_CACHE.get((kind, source_hash, target_hash))
+
+
+def store_diff(kind, source_hash, target_hash, result):
+    """Remembers a diff computed elsewhere (e.g. in a process pool) for lookup_diff/cached_diff."""
+    # Without both hashes the contents are unknown, so the diff cannot be matched again.
+    if source_hash and target_hash:
+        DIFF_CACHE.set((kind, source_hash, target_hash), result)
+
+
+def cached_diff(kind, source_hash, target_hash, compute, use_cache=True):
+    """
+    Returns the diff for two contents identified by their hashes, calling
+    compute() and remembering its result only if the pair has not been diffed before.
+    kind names the result format, so different diffs of the same contents never mix.
+    """
+    if use_cache:
+        cached = lookup_diff(kind, source_hash, target_hash)
+        if cached is not None:
+            return cached
+    result = compute()
+    store_diff(kind, source_hash, target_hash, result)
+    return result
+
+
+def cached_project_details_many(auth, project_ids, max_workers=DEFAULT_FETCH_WORKERS, use_cache=True):
+    """
+    Fetches the details of many projects concurrently through the response cache.
+    Returns a dict mapping project ID to details; projects that could not be fetched are left out.
+    """
+    details, _ = fetch_many(
+        lambda project_id: cached_project_details(auth, project_id, use_cache), project_ids, max_workers
+    )
+    return details
@@ -0,0 +1,329 @@
+import hashlib
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from cache import (
+    PREFETCH_MAX_AGE_SECONDS, cached_project_details, cached_project_schema, canonical_hash, canonical_json,
+)
+from clone_journal import KIND_PROJECT, KIND_ROUTING
+from fetcher import DEFAULT_FETCH_WORKERS
+from routing import RoutingRuleIndex
+
+# Number of POST /projects requests in flight at the same time. Kept below the
+# fetch concurrency because project creation is the heavier call on the API side.
+DEFAULT_CREATE_WORKERS = 4
+
+# Clone result statuses. "Reused" means an earlier run already created the object.
+STATUS_CREATED = "Created"
+STATUS_REUSED = "Reused"
+STATUS_FAILED = "Failed"
+
+
+def project_name_with_affixes(project_name, prefix="", suffix=""):
+    return f"{prefix or ''}{project_name}{suffix or ''}"
+
+
+def build_project_payload(project_details, project_schema, name, model_id) -> dict:
+    """The POST /projects payload that copies a source project under a new name and model."""
+    return {
+        "name": name,
+        "note": project_details.get("note", ""),
+        "ocr": project_details.get("ocr", {}),
+        "extractionModelId": model_id,
+        "completion": project_details.get("completion", "manual"),
+        "duplicates": project_details.get("duplicates", "allow"),
+        "members": {"allow": "all"},
+        "schema": project_schema,
+        "retentionDays": project_details.get("retentionDays", 180),
+    }
+
+
+def encode_project_payload(payload, schema_json: bytes) -> bytes:
+    """
+    The canonical JSON body of a build_project_payload payload, with the schema spliced in
+    from schema_json (its canonical JSON) instead of being serialized again.
+    """
+    head = canonical_json({key: value for key, value in payload.items() if key != "schema"})
+    # "schema" sorts after every other payload key, so it closes the canonical object.
+    return head[:-1] + b',"schema":' + schema_json + b"}"
+
+
+class SchemaPool:
+    """
+    The distinct schemas of a clone run, by content hash. Projects with the same schema share
+    one schema object and one canonical JSON encoding, so a schema used by many projects is
+    held and serialized once. Safe to share between worker threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._schemas = {}
+        self._json = {}
+
+    def __contains__(self, schema_hash):
+        return schema_hash in self._schemas
+
+    def __len__(self):
+        return len(self._schemas)
+
+    def intern(self, schema_hash, schema):
+        """The pooled schema with schema_hash, adding schema if it is the first one."""
+        with self._lock:
+            return self._schemas.setdefault(schema_hash, schema)
+
+    def get(self, schema_hash):
+        return self._schemas.get(schema_hash)
+
+    def json(self, schema_hash) -> bytes:
+        """Canonical JSON of a pooled schema, encoded on first use."""
+        encoded = self._json.get(schema_hash)
+        if encoded is None:
+            encoded = canonical_json(self._schemas[schema_hash])
+            with self._lock:
+                encoded = self._json.setdefault(schema_hash, encoded)
+        return encoded
+
+
+# Fields the API sets on a routing rule; they are dropped when a rule is copied.
+ROUTING_READ_ONLY_FIELDS = ["id", "createdAt", "updatedAt"]
+
+
+def routing_rule_payload(rule, new_from, new_to) -> dict:
+    """The POST /routings payload that copies a rule between two mapped target projects."""
+    payload = dict(rule)
+    payload["fromProjectId"] = new_from
+    payload["toProjectId"] = new_to
+    for field in ROUTING_READ_ONLY_FIELDS:
+        payload.pop(field, None)
+    return payload
+
+
+class TargetLookup:
+    """
+    Finds objects that already exist in the target company, e.g. created by an interrupted
+    run that could not journal the result. The target projects and rules are listed once,
+    on first use.
+    """
+
+    def __init__(self, target_auth):
+        self.target_auth = target_auth
+        self._lock = threading.Lock()
+        self._projects = None
+        self._routings = None
+
+    def project_id(self, name):
+        with self._lock:
+            if self._projects is None:
+                data = self.target_auth.get_projects() or {}
+                self._projects = {proj.get("name"): proj["id"] for proj in data.get("data", [])}
+            return self._projects.get(name)
+
+    def routing_index(self):
+        """The RoutingRuleIndex of the target, or None if its rules cannot all be listed."""
+        with self._lock:
+            if self._routings is None:
+                index = RoutingRuleIndex.from_auth(self.target_auth)
+                # A failed listing is remembered too (False), so it is not retried per rule.
+                self._routings = index if index is not None else False
+            return self._routings if self._routings is not False else None
+
+    def routing_id(self, payload):
+        """The ID of a target rule between the same projects with the same routingNode, or None."""
+        index = self.routing_index()
+        return index.find(payload) if index is not None else None
+
+
+def _journaled_create(kind, source_id, payload, create, find_existing, journal, payload_hash=None):
+    """
+    Runs create(payload) unless the journal shows an earlier run already created it.
+    payload_hash defaults to canonical_hash(payload). Returns (status, target_id, reason).
+    """
+    if journal is None:
+        created = create(payload)
+        if not created or not created.get("id"):
+            return STATUS_FAILED, "", None
+        return STATUS_CREATED, created["id"], None
+
+    payload_hash = payload_hash or canonical_hash(payload)
+    name = payload.get("name") or ""
+    target_id = journal.created_id(kind, source_id, payload_hash)
+    if target_id:
+        return STATUS_REUSED, target_id, "Already created by an earlier run."
+    if journal.is_unfinished(kind, source_id, payload_hash):
+        # The earlier request may have created the object even though no outcome (or a
+        # failure, e.g. a timeout) was journaled, so look for it before creating again.
+        target_id = find_existing(payload)
+        if target_id:
+            journal.complete(kind, source_id, payload_hash, target_id, name)
+            return STATUS_REUSED, target_id, "Created by an interrupted or failed earlier run."
+
+    journal.begin(kind, source_id, payload_hash, name)
+    created = create(payload)
+    if not created or not created.get("id"):
+        journal.fail(kind, source_id, payload_hash, name, "Target API did not create the object.")
+        return STATUS_FAILED, "", None
+    journal.complete(kind, source_id, payload_hash, created["id"], name)
+    return STATUS_CREATED, created["id"], None
+
+
+def create_routing_rule(target_auth, rule_id, payload, journal=None, lookup=None):
+    """
+    Creates a copied routing rule unless the target company already has an equivalent rule
+    (same projects and routingNode) or the journal shows an earlier run created it.
+    Nothing is created if the target rules cannot be listed, since duplicates could not be
+    detected. Returns (status, new_rule_id, reason).
+    """
+    lookup = lookup or TargetLookup(target_auth)
+    index = lookup.routing_index()
+    if index is None:
+        return STATUS_FAILED, "", "The routing rules of the target company could not be listed."
+    existing_id = index.reserve(payload)
+    if existing_id:
+        return STATUS_REUSED, existing_id, "An equivalent rule already exists in the target company."
+    try:
+        status, new_rule_id, reason = _journaled_create(
+            KIND_ROUTING, rule_id, payload, target_auth.create_routing_rule, index.find, journal,
+        )
+    except BaseException:
+        index.release(payload)
+        raise
+    if status == STATUS_FAILED:
+        index.release(payload)
+        return status, new_rule_id, "Target API did not create the routing rule."
+    index.add(payload, new_rule_id)
+    return status, new_rule_id, reason or "Created in the target company."
+
+
+def _create_project(target_auth, project_id, payload, body, journal, lookup):
+    # body is the canonical JSON of payload, so its digest equals canonical_hash(payload).
+    status, new_project_id, reason = _journaled_create(
+        KIND_PROJECT, project_id, payload, lambda payload: target_auth.create_project(payload, body=body),
+        lambda payload: lookup.project_id(payload["name"]), journal, hashlib.sha256(body).hexdigest(),
+    )
+    if status == STATUS_FAILED:
+        reason = "Target API did not create the project."
+    return status, new_project_id, reason or "Created in the target company."
+
+
+def fetch_source_project(source_auth, project_id, use_cache, schema_pool=None):
+    """
+    (details, schema, schema_hash) of a source project, or None. With use_cache, only responses
+    fetched within PREFETCH_MAX_AGE_SECONDS are reused. If the source knows schema hashes up
+    front (snapshots), a schema already in schema_pool is not read again.
+    """
+    details = cached_project_details(source_auth, project_id, use_cache, PREFETCH_MAX_AGE_SECONDS)
+    if not details:
+        return None
+    if schema_pool is not None and hasattr(source_auth, "get_schema_hash"):
+        schema_hash = source_auth.get_schema_hash(project_id)
+        if schema_hash in schema_pool:
+            return details, schema_pool.get(schema_hash), schema_hash
+    schema, schema_hash = cached_project_schema(source_auth, project_id, use_cache, PREFETCH_MAX_AGE_SECONDS)
+    if not schema:
+        return None
+    return details, schema, schema_hash
+
+
+def _encoded_payload(source, new_name, model_id, schema_pool):
+    details, schema, schema_hash = source
+    schema = schema_pool.intern(schema_hash, schema)
+    payload = build_project_payload(details, schema, new_name, model_id)
+    return payload, encode_project_payload(payload, schema_pool.json(schema_hash))
+
+
+def _result(status, project_id, project_name, new_name, new_project_id="", reason=""):
+    return {
+        "status": status,
+        "source_project_id": project_id,
+        "source_project_name": project_name,
+        "new_project_id": new_project_id,
+        "new_project_name": new_name,
+        "reason": reason,
+    }
+
+
+def clone_project(source_auth, target_auth, project_id, project_name, model_id, prefix="", suffix="",
+                  use_cache=False, journal=None, lookup=None, schema_pool=None) -> dict:
+    """
+    Copies one project (fetch, then create). Returns a result dict like clone_projects yields.
+    With a CloneJournal, a project an earlier run already created is reused. Pass one
+    SchemaPool to all projects of a run to share schemas between them.
+    """
+    new_name = project_name_with_affixes(project_name, prefix, suffix)
+    schema_pool = schema_pool if schema_pool is not None else SchemaPool()
+    source = fetch_source_project(source_auth, project_id, use_cache, schema_pool)
+    if source is None:
+        return _result(STATUS_FAILED, project_id, project_name, new_name,
+                       reason="Could not retrieve the project details or schema from the source company.")
+    payload, body = _encoded_payload(source, new_name, model_id, schema_pool)
+    status, new_project_id, reason = _create_project(
+        target_auth, project_id, payload, body, journal, lookup or TargetLookup(target_auth),
+    )
+    return _result(status, project_id, project_name, new_name, new_project_id, reason)
+
+
+def clone_projects(source_auth, target_auth, projects, model_id, prefix="", suffix="",
+                   max_workers=DEFAULT_FETCH_WORKERS, create_workers=DEFAULT_CREATE_WORKERS, use_cache=False,
+                   journal=None, fetch_source=None, schema_pool=None):
+    """
+    Copies projects from the source to the target company as a two-stage pipeline.
+
+    The details and schema of all projects are fetched concurrently (bounded by max_workers),
+    and each project is created in the target company as soon as its inputs have arrived,
+    with at most create_workers creations in flight.
+
+    Args:
+        projects: List of (project_id, project_name) tuples.
+        model_id: extractionModelId of the new projects.
+        use_cache: Reuse details and schemas fetched (e.g. prefetched) within PREFETCH_MAX_AGE_SECONDS
+                   instead of fetching them again.
+        journal: Optional CloneJournal. Projects an earlier run already created with the same
+                 payload are reused (status "Reused") instead of created again.
+        fetch_source: Optional callable(project_id) returning (details, schema, schema_hash) or
+                      None, e.g. TemplateCatalog.source; by default both are fetched from source_auth.
+        schema_pool: Optional SchemaPool, to share schema encodings between runs (e.g. one per target).
+
+    Projects with the same schema share one schema object and one JSON encoding of it
+    (see SchemaPool); with a snapshot source, a shared schema is also read only once.
+
+    Yields:
+        dict: One result per project in completion order, with the keys status, source_project_id,
+              source_project_name, new_project_id, new_project_name and reason.
+    """
+    names = dict(projects)
+    lookup = TargetLookup(target_auth)
+    schema_pool = schema_pool if schema_pool is not None else SchemaPool()
+    if fetch_source is None:
+        def fetch_source(project_id):
+            return fetch_source_project(source_auth, project_id, use_cache, schema_pool)
+    with ThreadPoolExecutor(max_workers=max_workers) as fetch_pool, \
+            ThreadPoolExecutor(max_workers=create_workers) as create_pool:
+        pending = {
+            fetch_pool.submit(fetch_source, project_id): ("fetch", project_id)
+            for project_id, _ in projects
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, project_id = pending.pop(future)
+                new_name = project_name_with_affixes(names[project_id], prefix, suffix)
+                try:
+                    outcome = future.result()
+                except Exception as err:
+                    print(f"Unexpected error while cloning project {project_id}: {err}")
+                    outcome = None
+
+                if stage == "fetch":
+                    if outcome is None:
+                        yield _result(STATUS_FAILED, project_id, names[project_id], new_name,
+                                      reason="Could not retrieve the project details or schema from the source company.")
+                        continue
+                    payload, body = _encoded_payload(outcome, new_name, model_id, schema_pool)
+                    future = create_pool.submit(_create_project, target_auth, project_id, payload, body, journal, lookup)
+                    pending[future] = ("create", project_id)
+                elif outcome is None:
+                    yield _result(STATUS_FAILED, project_id, names[project_id], new_name,
+                                  reason="Target API did not create the project.")
+                else:
+                    status, new_project_id, reason = outcome
+                    yield _result(status, project_id, names[project_id], new_name, new_project_id, reason)
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+from config import CLONE_JOURNAL_DIR
+
+# Journal entry statuses. A "pending" entry without a later "created" or "failed" entry
+# means the create request was sent but its outcome is unknown.
+JOURNAL_PENDING = "pending"
+JOURNAL_CREATED = "created"
+JOURNAL_FAILED = "failed"
+
+# Kinds of journaled operations.
+KIND_PROJECT = "project"
+KIND_ROUTING = "routing"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class CloneJournal:
+    """
+    Durable, append-only record of the objects a clone created in the target company.
+
+    Every create is journaled as "pending" before the request is sent and as "created"
+    (with the new target ID) or "failed" afterwards. Entries are keyed by kind, source ID
+    and the hash of the create payload, so a rerun with the same inputs reuses what was
+    already created instead of creating duplicates, and only the missing work is redone.
+    Lines are flushed and synced as they are written, so the journal survives a crash.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = {}
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except ValueError:
+                        # A line cut off by a crash; the operation is redone.
+                        continue
+
+    def _apply(self, entry):
+        key = (entry["kind"], entry["source_id"], entry["payload_hash"])
+        self._state[key] = entry
+
+    def _write(self, entry):
+        entry["at"] = _now()
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(entry)
+
+    def entry(self, kind, source_id, payload_hash):
+        """The latest entry of an operation, or None if it was never started."""
+        with self._lock:
+            return self._state.get((kind, source_id, payload_hash))
+
+    def created_id(self, kind, source_id, payload_hash):
+        """The target ID created by an operation, or None if it did not complete."""
+        entry = self.entry(kind, source_id, payload_hash)
+        return entry["target_id"] if entry and entry["status"] == JOURNAL_CREATED else None
+
+    def is_unfinished(self, kind, source_id, payload_hash) -> bool:
+        """
+        Whether an operation was started but not completed: pending, or failed. A failed
+        request (e.g. a timeout) may still have created the object in the target company.
+        """
+        entry = self.entry(kind, source_id, payload_hash)
+        return bool(entry) and entry["status"] in (JOURNAL_PENDING, JOURNAL_FAILED)
+
+    def begin(self, kind, source_id, payload_hash, name=""):
+        self._write({"kind": kind, "source_id": source_id, "payload_hash": payload_hash,
+                     "status": JOURNAL_PENDING, "target_id": None, "name": name})
+
+    def complete(self, kind, source_id, payload_hash, target_id, name=""):
+        self._write({"kind": kind, "source_id": source_id, "payload_hash": payload_hash,
+                     "status": JOURNAL_CREATED, "target_id": target_id, "name": name})
+
+    def fail(self, kind, source_id, payload_hash, name="", reason=""):
+        self._write({"kind": kind, "source_id": source_id, "payload_hash": payload_hash,
+                     "status": JOURNAL_FAILED, "target_id": None, "name": name, "reason": reason})
+
+    def entries(self) -> list:
+        """The latest entry of every journaled operation."""
+        with self._lock:
+            return list(self._state.values())
+
+    def counts(self) -> dict:
+        """Number of operations per kind and status, e.g. {("project", "created"): 12}."""
+        counts = {}
+        for entry in self.entries():
+            key = (entry["kind"], entry["status"])
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def clear(self):
+        """Forgets every journaled operation, so the next run creates everything again."""
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._state = {}
+
+
+def journal_path(source_auth, source_company_id, target_auth, target_company_id) -> str:
+    """Path of the journal of one source/target company pair."""
+    key = f"{source_auth.base_url}|{source_company_id}|{target_auth.base_url}|{target_company_id}"
+    return os.path.join(CLONE_JOURNAL_DIR, f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:24]}.jsonl")
+
+
+def open_clone_journal(source_auth, target_auth):
+    """
+    Opens the journal of the companies behind source_auth and target_auth.
+    Returns None if either company cannot be identified.
+    """
+    source_company = source_auth.get_company_info() or {}
+    target_company = target_auth.get_company_info() or {}
+    if not source_company.get("id") or not target_company.get("id"):
+        return None
+    return CloneJournal(journal_path(source_auth, source_company["id"], target_auth, target_company["id"]))
@@ -0,0 +1,551 @@
+import json
+import os
+import pickle
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+
+import numpy as np
+import pandas as pd
+from cache import (
+    cached_diff, cached_project_details, cached_project_schema, canonical_hash, lookup_diff, store_diff,
+)
+from diff_records import CHANGED, ENTIRE_DATAPOINT, EXTRA_IN_TARGET, MISSING_IN_TARGET, DiffRecord, diff_values
+from fetcher import DEFAULT_FETCH_WORKERS
+from helpers import datapoints_from_schema, metadata_from_schema
+
+# Datapoint attributes compared at the detailed level.
+DATAPOINT_ATTRIBUTES = ["internalName", "displayName", "type", "rules", "normalization", "derivation", "source"]
+
+# Project detail fields compared at the meta level, mapped to their path in the project details.
+PROJECT_META_FIELDS = {
+    "extractionModelId": ("extractionModelId",),
+    "members": ("members",),
+    "retentionDays": ("retentionDays",),
+    "duplicates": ("duplicates",),
+    "completion": ("completion",),
+    "features": ("ocr", "features"),
+    "isLive": ("isLive",),
+}
+
+# Number of shared datapoints diffed per process pool task. Smaller comparisons
+# are diffed in-process because the task overhead would outweigh the gain.
+DEFAULT_SHARD_SIZE = 250
+
+
+# --- Flatten Schema Function ---
+
+def flatten_schema(datapoints, parent=""):
+    """
+    Recursively flattens a list of datapoint dictionaries.
+    Each datapoint is keyed by its internalName. If a datapoint contains a nested
+    list of datapoints (under the key "dataPoints"), these are flattened with a composite key.
+    For example, a datapoint with internalName "items" having nested datapoints with internalName "C"
+    will be represented with the composite key "items.C".
+    
+    Returns a dict mapping composite keys to datapoint dictionaries.
+    """
+    flat = {}
+    for dp in datapoints:
+        key = dp.get("internalName", "unknown")
+        composite_key = f"{parent}.{key}" if parent else key
+        flat[composite_key] = dp
+        # Look for nested datapoints under "dataPoints" key.
+        if "dataPoints" in dp and isinstance(dp["dataPoints"], list) and dp["dataPoints"]:
+            nested = flatten_schema(dp["dataPoints"], parent=composite_key)
+            flat.update(nested)
+    return flat
+
+
+# --- Process Pool Helpers ---
+
+def create_diff_pool(processes=None):
+    """Returns a process pool for diffing, sized to the number of CPU cores by default."""
+    return ProcessPoolExecutor(max_workers=processes or os.cpu_count() or 1)
+
+
+def encode_diff_input(obj) -> bytes:
+    """
+    Serializes diff input for shipping to a worker process. Pickle keeps every value as it is
+    (tuples, non-string keys, ...), so a worker diffs exactly what an in-process diff would.
+    """
+    return zlib.compress(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def decode_diff_input(data: bytes):
+    """Reverses encode_diff_input."""
+    return pickle.loads(zlib.decompress(data))
+
+
+def _compact_datapoints(flat, keys=None):
+    """
+    Reduces flattened datapoints to the attributes that are actually compared.
+    Parent datapoints otherwise carry their whole nested "dataPoints" list with them.
+    """
+    keys = flat.keys() if keys is None else keys
+    return {key: {attr: flat[key].get(attr) for attr in DATAPOINT_ATTRIBUTES} for key in keys}
+
+
+def diff_datapoint_shard(payload: bytes):
+    """Process pool task: diffs one encoded key range of datapoints present on both sides."""
+    source_flat, target_flat = decode_diff_input(payload)
+    return _diff_shared_datapoints(source_flat, target_flat, list(source_flat))
+
+
+# --- Diff Functions ---
+
+def datapoint_hash(datapoint) -> str:
+    """Hashes only the compared attributes of a datapoint, so equal hashes mean no differences."""
+    return canonical_hash({attr: datapoint.get(attr) for attr in DATAPOINT_ATTRIBUTES})
+
+
+def _diff_shared_datapoints(source_flat, target_flat, keys):
+    """Diffs the compared attributes of datapoints that exist in both schemas."""
+    differences = []
+    for key in keys:
+        src_dp = source_flat[key]
+        tgt_dp = target_flat[key]
+        for attr in DATAPOINT_ATTRIBUTES:
+            # Equal values are skipped inside diff_values without calling DeepDiff.
+            differences.extend(diff_values(key, attr, src_dp.get(attr), tgt_dp.get(attr)))
+    return differences
+
+
+def compare_datapoints_detailed(source_flat, target_flat, diff_pool=None, shard_size=DEFAULT_SHARD_SIZE,
+                                source_hashes=None, target_hashes=None):
+    """
+    Compares flattened datapoints in detail, checking multiple attributes.
+    If diff_pool is given and enough datapoints exist on both sides, the shared
+    datapoints are split into sorted key ranges of shard_size and diffed in the pool.
+    source_hashes optionally maps source keys to datapoint_hash values; shared
+    datapoints whose target hash matches are skipped without diffing. target_hashes
+    does the same for the target side, so matching datapoints are not even read
+    (e.g. from a snapshot FlatSchema).
+    Returns a list of DiffRecord.
+    """
+    differences = []
+    shared_keys = []
+    for key in sorted(set(source_flat.keys()).union(set(target_flat.keys()))):
+        if key not in target_flat:
+            differences.append(DiffRecord(key, ENTIRE_DATAPOINT, "root", MISSING_IN_TARGET))
+        elif key not in source_flat:
+            differences.append(DiffRecord(key, ENTIRE_DATAPOINT, "root", EXTRA_IN_TARGET))
+        elif source_hashes is None:
+            shared_keys.append(key)
+        else:
+            target_hash = target_hashes[key] if target_hashes is not None else datapoint_hash(target_flat[key])
+            if source_hashes.get(key) != target_hash:
+                shared_keys.append(key)
+
+    if diff_pool is None or len(shared_keys) <= shard_size:
+        differences.extend(_diff_shared_datapoints(source_flat, target_flat, shared_keys))
+        return differences
+
+    payloads = []
+    for start in range(0, len(shared_keys), shard_size):
+        keys = shared_keys[start:start + shard_size]
+        payloads.append(encode_diff_input([
+            _compact_datapoints(source_flat, keys),
+            _compact_datapoints(target_flat, keys),
+        ]))
+    for shard_differences in diff_pool.map(diff_datapoint_shard, payloads):
+        differences.extend(shard_differences)
+    return differences
+
+
+def compare_schemas_very_low(source_schema, target_schema, diff_pool=None,
+                             source_hash=None, target_hash=None, use_cache=True):
+    """
+    Compares two schemas at a very detailed level.
+    Both schemas are expected to have a "dataPoints" list.
+    This function flattens the datapoints recursively (using the nested "dataPoints" key)
+    so that nested datapoints are given composite keys (e.g. "items.C").
+    
+    It then compares a set of attributes for each datapoint:
+       internalName, displayName, type, rules, normalization, derivation, source.
+    
+    For each composite key in the union of source and target, differences are captured.
+    Returns a list of DiffRecord; use diff_records.records_frame to display them.
+
+    Results are memoized by the content hashes of both schemas, so comparing the
+    same schema contents again returns immediately. Pass source_hash/target_hash
+    if they are already known (e.g. from cached_project_schema).
+    """
+    def _compute():
+        source_flat = flatten_schema(source_schema.get("dataPoints", []))
+        target_flat = flatten_schema(target_schema.get("dataPoints", []))
+        return compare_datapoints_detailed(source_flat, target_flat, diff_pool=diff_pool)
+
+    return cached_diff(
+        "schema",
+        source_hash or canonical_hash(source_schema),
+        target_hash or canonical_hash(target_schema),
+        _compute,
+        use_cache=use_cache,
+    )
+
+
+def compare_flat_schemas(source_flat, target_flat, source_hash, target_hash, diff_pool=None, use_cache=True):
+    """
+    Same result as compare_schemas_very_low for two already flattened schemas with
+    datapoint hashes, such as snapshot FlatSchemas. Only datapoints whose hashes
+    differ are decoded and diffed.
+    """
+    return cached_diff(
+        "schema",
+        source_hash,
+        target_hash,
+        lambda: compare_datapoints_detailed(
+            source_flat, target_flat, diff_pool=diff_pool,
+            source_hashes=source_flat.hashes, target_hashes=target_flat.hashes,
+        ),
+        use_cache=use_cache,
+    )
+
+
+# --- One-to-Many Comparison ---
+
+class PreparedSource:
+    """
+    A source schema that is flattened and hashed once, so it can be compared
+    against many target schemas without repeating that work per target.
+    """
+
+    def __init__(self, schema, schema_hash=None):
+        self.schema = schema
+        self.hash = schema_hash or canonical_hash(schema)
+        self.flat = flatten_schema(schema.get("dataPoints", []))
+        self.datapoint_hashes = {key: datapoint_hash(dp) for key, dp in self.flat.items()}
+
+    def compare(self, target_schema, target_hash=None, diff_pool=None, use_cache=True):
+        """Same result as compare_schemas_very_low(self.schema, target_schema)."""
+        def _compute():
+            target_flat = flatten_schema(target_schema.get("dataPoints", []))
+            return compare_datapoints_detailed(
+                self.flat, target_flat, diff_pool=diff_pool, source_hashes=self.datapoint_hashes
+            )
+
+        return cached_diff(
+            "schema",
+            self.hash,
+            target_hash or canonical_hash(target_schema),
+            _compute,
+            use_cache=use_cache,
+        )
+
+    def compare_flat(self, target_flat, target_hash, diff_pool=None, use_cache=True):
+        """Same as compare() for a flattened target schema with datapoint hashes (a snapshot FlatSchema)."""
+        return cached_diff(
+            "schema",
+            self.hash,
+            target_hash,
+            lambda: compare_datapoints_detailed(
+                self.flat, target_flat, diff_pool=diff_pool,
+                source_hashes=self.datapoint_hashes, target_hashes=target_flat.hashes,
+            ),
+            use_cache=use_cache,
+        )
+
+
+def _compare_one_target(source, target_auth, target_project_id, diff_pool, use_cache):
+    if hasattr(target_auth, "get_flat_schema"):
+        # Snapshots serve flattened schemas, so unchanged datapoints are never decoded.
+        target_flat = target_auth.get_flat_schema(target_project_id)
+        if target_flat is None:
+            return None
+        return source.compare_flat(target_flat, target_auth.snapshot.schema_hash(target_project_id),
+                                   diff_pool, use_cache)
+    target_schema, target_hash = cached_project_schema(target_auth, target_project_id, use_cache)
+    if not target_schema:
+        return None
+    return source.compare(target_schema, target_hash, diff_pool, use_cache)
+
+
+def compare_one_to_many(source, target_auth, target_projects, max_workers=DEFAULT_FETCH_WORKERS,
+                        diff_pool=None, use_cache=True):
+    """
+    Compares one PreparedSource against many target projects.
+    target_projects is a list of (project_id, project_name) tuples. Target schemas
+    are fetched and diffed concurrently on a thread pool bounded by max_workers.
+
+    Yields (project_id, project_name, differences) tuples in completion order, where
+    differences is a list of DiffRecord, or None if the target schema could not be retrieved.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(_compare_one_target, source, target_auth, project_id, diff_pool, use_cache):
+                (project_id, project_name)
+            for project_id, project_name in target_projects
+        }
+        for future in as_completed(futures):
+            project_id, project_name = futures[future]
+            try:
+                differences = future.result()
+            except Exception as e:
+                print(f"Unexpected error while comparing target project {project_id}: {e}")
+                differences = None
+            yield project_id, project_name, differences
+
+
+# --- Metadata Comparison ---
+
+def compare_metadata_detailed(source_meta, target_meta):
+    """
+    Compares metadata dictionaries field by field.
+    Returns a list of DiffRecord with datapoint None, one per differing field.
+    """
+    differences = []
+    for field in source_meta:
+        src_val = source_meta[field]
+        tgt_val = target_meta.get(field)
+        if src_val != tgt_val:
+            differences.append(DiffRecord(None, field, "root", CHANGED, src_val, tgt_val))
+    return differences
+
+
+def diff_pair_data(comparison_type, source_data, target_data):
+    """Runs the diff for one pair of already fetched inputs."""
+    if comparison_type == "Data Points":
+        return compare_datapoints_detailed(source_data, target_data)
+    return compare_metadata_detailed(source_data, target_data)
+
+
+def encode_pair_data(comparison_type, source_data, target_data) -> bytes:
+    """Serializes one pair's inputs compactly for diff_pair_payload."""
+    if comparison_type == "Data Points":
+        source_data = _compact_datapoints(source_data)
+        target_data = _compact_datapoints(target_data)
+    return encode_diff_input([source_data, target_data])
+
+
+def diff_pair_payload(comparison_type, payload: bytes):
+    """Process pool task: diffs one pair encoded with encode_pair_data."""
+    source_data, target_data = decode_diff_input(payload)
+    return diff_pair_data(comparison_type, source_data, target_data)
+
+
+# --- Metadata Matrix ---
+
+def _meta_value(details, path):
+    value = details
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def project_meta(details) -> dict:
+    """The meta-level fields of one project's details, keyed by PROJECT_META_FIELDS name."""
+    return {field: _meta_value(details, path) for field, path in PROJECT_META_FIELDS.items()}
+
+
+def project_meta_frame(details_by_project) -> pd.DataFrame:
+    """
+    Flattens the meta-level fields of many projects into one frame with one row per project ID.
+    Values are stored as canonical JSON, so nested values such as members or completion
+    compare equal whenever their content is equal, regardless of key order.
+
+    Args:
+        details_by_project: Dict mapping project ID to the project details from get_project_by_id().
+    """
+    rows = {
+        project_id: [
+            json.dumps(_meta_value(details, path), sort_keys=True, default=str)
+            for path in PROJECT_META_FIELDS.values()
+        ]
+        for project_id, details in details_by_project.items()
+    }
+    frame = pd.DataFrame.from_dict(rows, orient="index", columns=list(PROJECT_META_FIELDS))
+    frame.index.name = "Project ID"
+    return frame
+
+
+def meta_difference_matrix(source_frame, target_frame):
+    """
+    Compares every source project with every target project at once.
+    Each field of both frames is factorized into one set of integer codes, so a single
+    broadcast comparison per field covers all N×M pairs.
+
+    Returns:
+        tuple: (DataFrame of the number of differing fields, indexed by source project ID
+                with one column per target project ID,
+                dict mapping each field to a boolean N×M array of the pairs where it differs)
+    """
+    n_source = len(source_frame)
+    counts = np.zeros((n_source, len(target_frame)), dtype=np.uint8)
+    masks = {}
+    for field in PROJECT_META_FIELDS:
+        codes, _ = pd.factorize(pd.concat([source_frame[field], target_frame[field]], ignore_index=True))
+        differs = codes[:n_source, None] != codes[None, n_source:]
+        masks[field] = differs
+        counts += differs
+    matrix = pd.DataFrame(counts, index=source_frame.index, columns=target_frame.index)
+    return matrix, masks
+
+
+def meta_differences_long(source_frame, target_frame, masks, source_rows=None):
+    """
+    Lists the differing fields of the compared pairs, one row per pair and field, with the
+    columns Source Project ID, Target Project ID, Field, Source Value and Target Value.
+    source_rows optionally restricts the listing to some row positions of source_frame.
+    """
+    columns = ["Source Project ID", "Target Project ID", "Field", "Source Value", "Target Value"]
+    parts = []
+    for field, differs in masks.items():
+        if source_rows is not None:
+            rows = np.asarray(source_rows)
+            src_pos, tgt_pos = np.nonzero(differs[rows])
+            src_pos = rows[src_pos]
+        else:
+            src_pos, tgt_pos = np.nonzero(differs)
+        if not len(src_pos):
+            continue
+        parts.append(pd.DataFrame({
+            "Source Project ID": source_frame.index.values[src_pos],
+            "Target Project ID": target_frame.index.values[tgt_pos],
+            "Field": field,
+            "Source Value": source_frame[field].values[src_pos],
+            "Target Value": target_frame[field].values[tgt_pos],
+        }))
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(parts, ignore_index=True).sort_values(
+        ["Source Project ID", "Target Project ID"], kind="stable", ignore_index=True
+    )
+
+
+# --- Bulk Pair Comparison ---
+
+def _fetch_project_name(auth, project_id, use_cache=True):
+    """Returns the project name, falling back to the ID if the details cannot be fetched."""
+    try:
+        details = cached_project_details(auth, project_id, use_cache=use_cache)
+        if details:
+            return details.get("name", project_id)
+    except Exception:
+        pass  # Keep ID as name if fetch fails
+    return project_id
+
+
+def _pair_result(source_project_id, source_project_name, target_project_id, target_project_name,
+                 differences=None, error=None):
+    return {
+        "source_project_id": source_project_id,
+        "source_project_name": source_project_name,
+        "target_project_id": target_project_id,
+        "target_project_name": target_project_name,
+        "has_differences": None if error else len(differences) > 0,
+        "differences": [] if error else differences,
+        "error": error,
+    }
+
+
+def _fetch_pair(source_api, target_api, source_project_id, target_project_id, comparison_type, run_diff,
+                use_cache=True):
+    """
+    Fetches names and comparison inputs for one pair.
+    If the diff is already cached, or run_diff is True, a finished result is returned.
+    Otherwise the result is returned together with the raw inputs and the diff
+    cache key for a later diff step.
+    """
+    source_project_name = source_project_id
+    target_project_name = target_project_id
+    try:
+        source_project_name = _fetch_project_name(source_api, source_project_id, use_cache)
+        target_project_name = _fetch_project_name(target_api, target_project_id, use_cache)
+
+        source_schema, source_hash = cached_project_schema(source_api, source_project_id, use_cache)
+        target_schema, target_hash = cached_project_schema(target_api, target_project_id, use_cache)
+        if comparison_type == "Data Points":
+            source_data = datapoints_from_schema(source_schema)
+            target_data = datapoints_from_schema(target_schema)
+        else:
+            source_data = metadata_from_schema(source_schema)
+            target_data = metadata_from_schema(target_schema)
+
+        # The diff only depends on the two schemas, so their hashes identify it; the kind
+        # keeps data point and metadata results of the same schemas apart.
+        kind = "pair_datapoints" if comparison_type == "Data Points" else "pair_metadata"
+        cache_key = (kind, source_hash, target_hash)
+        if run_diff:
+            differences = cached_diff(
+                *cache_key, lambda: diff_pair_data(comparison_type, source_data, target_data), use_cache=use_cache,
+            )
+        else:
+            differences = lookup_diff(*cache_key) if use_cache else None
+        if differences is not None:
+            return _pair_result(source_project_id, source_project_name,
+                                target_project_id, target_project_name, differences), None
+        pending = _pair_result(source_project_id, source_project_name,
+                               target_project_id, target_project_name, [])
+        return pending, (source_data, target_data, cache_key)
+    except Exception as e:
+        return _pair_result(source_project_id, source_project_name,
+                            target_project_id, target_project_name, error=str(e)), None
+
+
+def compare_pairs(source_api, target_api, pairs, comparison_type,
+                  max_workers=DEFAULT_FETCH_WORKERS, diff_processes=0, use_cache=True):
+    """
+    Compares (source_project_id, target_project_id) pairs concurrently.
+
+    API calls run on a thread pool bounded by max_workers. If diff_processes is
+    greater than zero, each pair is encoded compactly and diffed in a process pool
+    of that size so CPU-heavy comparisons are not serialized by the GIL; otherwise
+    each diff runs on the thread that fetched the pair.
+
+    With use_cache, recently fetched projects and previously computed diffs of
+    the same schema contents are reused instead of being fetched and diffed again.
+
+    Yields (index, result) tuples in completion order, where index is the
+    position of the pair in the input and result has the same shape as a row
+    of the bulk comparison results.
+    """
+    diff_pool = create_diff_pool(diff_processes) if diff_processes else None
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as fetch_pool:
+            pending = {}
+            for index, (source_project_id, target_project_id) in enumerate(pairs):
+                future = fetch_pool.submit(
+                    _fetch_pair,
+                    source_api,
+                    target_api,
+                    source_project_id,
+                    target_project_id,
+                    comparison_type,
+                    diff_pool is None,
+                    use_cache,
+                )
+                pending[future] = (index, None)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, partial = pending.pop(future)
+                    if partial is None:
+                        # Fetch step finished.
+                        result, inputs = future.result()
+                        if inputs is None:
+                            yield index, result
+                        else:
+                            source_data, target_data, cache_key = inputs
+                            diff_future = diff_pool.submit(
+                                diff_pair_payload,
+                                comparison_type,
+                                encode_pair_data(comparison_type, source_data, target_data),
+                            )
+                            pending[diff_future] = (index, (result, cache_key))
+                    else:
+                        # Diff step finished in the process pool.
+                        partial, cache_key = partial
+                        try:
+                            partial["differences"] = future.result()
+                            partial["has_differences"] = len(partial["differences"]) > 0
+                            store_diff(*cache_key, partial["differences"])
+                        except Exception as e:
+                            partial["has_differences"] = None
+                            partial["error"] = str(e)
+                        yield index, partial
+    finally:
+        if diff_pool is not None:
+            diff_pool.shutdown(cancel_futures=True)
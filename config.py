@@ -1,3 +1,15 @@
+import os
+
 BASE_URL_EU = 'https://api.cloud.hypatos.ai/v2'
 BASE_URL_US = 'https://api.cloud.hypatos.com/v2'
-BASE_URL_SETUP = 'https://setup.cloud.hypatos.ai'
\ No newline at end of file
+BASE_URL_SETUP = 'https://setup.cloud.hypatos.ai'
+
+# Local history of snapshot drift reports, one JSON report per line.
+DRIFT_HISTORY_PATH = os.environ.get(
+    "HYCUTOVER_DRIFT_HISTORY", os.path.join(os.path.expanduser("~"), ".hycutover", "drift_history.jsonl")
+)
+
+# Journals of clone operations, one JSON Lines file per source/target company pair.
+CLONE_JOURNAL_DIR = os.environ.get(
+    "HYCUTOVER_CLONE_JOURNAL_DIR", os.path.join(os.path.expanduser("~"), ".hycutover", "clone_journals")
+)
@@ -0,0 +1,289 @@
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from agent_workflow import retarget_agent
+from cache import cached_project_details
+from clone_engine import (
+    STATUS_FAILED as CLONE_FAILED, STATUS_REUSED, SchemaPool, TargetLookup, clone_project, create_routing_rule,
+    routing_rule_payload,
+)
+from fetcher import DEFAULT_FETCH_WORKERS, iter_fetch
+
+# Step statuses.
+STATUS_DONE = "Done"
+STATUS_FAILED = "Failed"
+STATUS_SKIPPED = "Skipped"
+
+# Step kinds of a company cutover plan.
+KIND_PROJECT = "project"
+KIND_CONFIG = "config"
+KIND_ROUTING = "routing"
+KIND_WORKFLOW = "workflow"
+KIND_AGENTS = "agents"
+
+# Configuration fields copied onto a cloned project, as on the Config Clone page.
+CONFIG_FIELDS = {"completion": "manual", "duplicates": "fail", "retentionDays": 180, "isLive": False}
+
+
+class PlanStep:
+    """One step of a CutoverPlan: an action that may only start once its dependencies are done."""
+
+    def __init__(self, step_id, kind, label, action, depends_on=()):
+        self.step_id = step_id
+        self.kind = kind
+        self.label = label
+        self.action = action
+        self.depends_on = list(depends_on)
+
+
+class CutoverPlan:
+    """
+    A dependency graph of cutover steps.
+
+    run() starts every step whose dependencies are done, as soon as they are done, on one
+    thread pool. A step whose dependency failed or was skipped is skipped as well, so one
+    failed project only holds back the steps that actually need it.
+    """
+
+    def __init__(self):
+        self.steps = {}
+
+    def __len__(self):
+        return len(self.steps)
+
+    def add(self, step_id, kind, label, action, depends_on=()):
+        """
+        Adds a step. action() runs on a worker thread and returns (status, detail), where
+        status is STATUS_DONE or STATUS_FAILED and detail is a short message.
+        """
+        if step_id in self.steps:
+            raise ValueError(f"Duplicate plan step: {step_id}")
+        self.steps[step_id] = PlanStep(step_id, kind, label, action, depends_on)
+
+    def validate(self):
+        """Raises ValueError if a step depends on an unknown step or the steps form a cycle."""
+        for step in self.steps.values():
+            for dependency in step.depends_on:
+                if dependency not in self.steps:
+                    raise ValueError(f"Step {step.step_id} depends on unknown step {dependency}")
+        remaining = {step_id: len(set(step.depends_on)) for step_id, step in self.steps.items()}
+        dependents = self._dependents()
+        ready = [step_id for step_id, count in remaining.items() if count == 0]
+        ordered = 0
+        while ready:
+            step_id = ready.pop()
+            ordered += 1
+            for dependent in dependents[step_id]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+        if ordered != len(self.steps):
+            raise ValueError("The cutover plan contains a dependency cycle.")
+
+    def _dependents(self):
+        dependents = {step_id: [] for step_id in self.steps}
+        for step in self.steps.values():
+            for dependency in set(step.depends_on):
+                dependents[dependency].append(step.step_id)
+        return dependents
+
+    def _result(self, step, status, detail):
+        return {"step": step.step_id, "kind": step.kind, "label": step.label, "status": status, "detail": detail}
+
+    def run(self, max_workers=DEFAULT_FETCH_WORKERS):
+        """
+        Executes the plan with at most max_workers steps in flight.
+
+        Yields:
+            dict: One result per step in completion order, with the keys step, kind, label,
+                  status and detail.
+        """
+        self.validate()
+        dependents = self._dependents()
+        waiting = {step_id: set(step.depends_on) for step_id, step in self.steps.items()}
+        ready = [step_id for step_id, deps in waiting.items() if not deps]
+        blocked = []
+
+        def _finish(step_id, ok):
+            for dependent in dependents[step_id]:
+                if dependent not in waiting:
+                    # Already skipped because another of its dependencies failed.
+                    continue
+                if ok:
+                    waiting[dependent].discard(step_id)
+                    if not waiting[dependent]:
+                        ready.append(dependent)
+                else:
+                    blocked.append((dependent, step_id))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            pending = {}
+            while ready or pending or blocked:
+                while blocked:
+                    step_id, cause = blocked.pop()
+                    if waiting.pop(step_id, None) is None:
+                        continue
+                    yield self._result(self.steps[step_id], STATUS_SKIPPED,
+                                       f"Depends on {self.steps[cause].label}, which did not complete.")
+                    _finish(step_id, False)
+                while ready:
+                    step_id = ready.pop(0)
+                    if waiting.pop(step_id, None) is not None:
+                        pending[pool.submit(self.steps[step_id].action)] = step_id
+                if not pending:
+                    continue
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step_id = pending.pop(future)
+                    try:
+                        status, detail = future.result()
+                    except Exception as err:
+                        print(f"Unexpected error in cutover step {step_id}: {err}")
+                        status, detail = STATUS_FAILED, str(err)
+                    yield self._result(self.steps[step_id], status, detail)
+                    _finish(step_id, status == STATUS_DONE)
+
+
+class CutoverState:
+    """Mappings filled in by the steps of a company cutover plan while it runs."""
+
+    def __init__(self):
+        self.project_id_map = {}
+        self.project_name_map = {}
+        self.routing_map = {}
+        self.agent_results = []
+        self._lock = threading.Lock()
+
+    def add_project(self, source_id, source_name, new_id, new_name):
+        with self._lock:
+            self.project_id_map[source_id] = new_id
+            self.project_name_map[source_id] = source_name
+            self.project_name_map[new_id] = new_name
+
+
+def _project_step(state, source_auth, target_auth, project_id, project_name, model_id, prefix, suffix, use_cache,
+                  journal, lookup, schema_pool):
+    def _run():
+        result = clone_project(source_auth, target_auth, project_id, project_name, model_id, prefix, suffix,
+                               use_cache=use_cache, journal=journal, lookup=lookup, schema_pool=schema_pool)
+        if result["status"] == CLONE_FAILED:
+            return STATUS_FAILED, result["reason"]
+        state.add_project(project_id, project_name, result["new_project_id"], result["new_project_name"])
+        verb = "Reused" if result["status"] == STATUS_REUSED else "Created"
+        return STATUS_DONE, f"{verb} '{result['new_project_name']}' ({result['new_project_id']})."
+    return _run
+
+
+def _config_step(state, source_auth, target_auth, project_id):
+    def _run():
+        # The project step has just fetched these details, so they come from the response cache.
+        details = cached_project_details(source_auth, project_id)
+        if not details:
+            return STATUS_FAILED, "Could not retrieve the source project configuration."
+        payload = {field: details.get(field, default) for field, default in CONFIG_FIELDS.items()}
+        if not target_auth.update_project(state.project_id_map[project_id], payload):
+            return STATUS_FAILED, "Target API did not update the project configuration."
+        return STATUS_DONE, "Configuration copied."
+    return _run
+
+
+def _routing_step(state, target_auth, rule, journal, lookup):
+    def _run():
+        new_from = state.project_id_map[rule["fromProjectId"]]
+        new_to = state.project_id_map[rule["toProjectId"]]
+        status, new_rule_id, reason = create_routing_rule(
+            target_auth, rule["id"], routing_rule_payload(rule, new_from, new_to), journal, lookup,
+        )
+        if status == CLONE_FAILED:
+            return STATUS_FAILED, reason
+        state.routing_map[rule["id"]] = new_rule_id
+        verb = "Reused" if status == STATUS_REUSED else "Created"
+        return STATUS_DONE, f"{verb} routing rule {new_rule_id}."
+    return _run
+
+
+def _workflow_step(setup_api, workflow_id, target_company_id):
+    def _run():
+        if setup_api.copy_workflow(workflow_id, target_company_id) is None:
+            return STATUS_FAILED, f"Copy failed. {setup_api.last_error or ''}".strip()
+        return STATUS_DONE, "Workflow copied."
+    return _run
+
+
+def _agents_step(state, setup_api, target_company_id, max_workers):
+    def _run():
+        agents = setup_api.get_agents(target_company_id)
+        agent_ids = [agent["id"] for agent in agents if agent.get("id")]
+        if not agent_ids:
+            return STATUS_FAILED, f"No agents found or fetch failed. {setup_api.last_error or ''}".strip()
+
+        def _retarget(agent_id):
+            return retarget_agent(setup_api, agent_id, target_company_id)
+
+        state.agent_results = [result for _, result in iter_fetch(_retarget, agent_ids, max_workers) if result]
+        failed = len(agent_ids) - sum(1 for result in state.agent_results if result["status"] == "OK")
+        if failed:
+            return STATUS_FAILED, f"{failed} of {len(agent_ids)} agents could not be updated."
+        return STATUS_DONE, f"Updated {len(agent_ids)} agents."
+    return _run
+
+
+def build_company_cutover_plan(source_auth, target_auth, projects, model_id, prefix="", suffix="",
+                               copy_config=True, routing_rules=(), setup_api=None, workflow_ids=(),
+                               target_company_id=None, max_workers=DEFAULT_FETCH_WORKERS, use_cache=False,
+                               journal=None):
+    """
+    Builds the plan that migrates a company's projects, configuration, routing rules and
+    agent workflows into the target company.
+
+    Each project is one step. Its configuration step and every routing rule between two
+    selected projects depend only on the projects they touch, so they start while other
+    projects are still being created. Workflows are copied independently; the agent
+    prompts are retargeted once all workflows are in.
+
+    Args:
+        projects: List of (project_id, project_name) tuples to clone.
+        routing_rules: Full source routing rules; rules whose projects are not both selected are left out.
+        setup_api: Optional SetupAPI; needed for workflow_ids.
+        workflow_ids: Prompting-settings workflows to copy to target_company_id.
+        journal: Optional CloneJournal; projects and routing rules an earlier run of the
+                 plan already created are reused, so a failed plan can simply be run again.
+
+    Returns:
+        tuple: (CutoverPlan, CutoverState, list of routing rules left out of the plan)
+    """
+    plan = CutoverPlan()
+    state = CutoverState()
+    selected = {project_id for project_id, _ in projects}
+    lookup = TargetLookup(target_auth)
+    schema_pool = SchemaPool()
+
+    for project_id, project_name in projects:
+        plan.add(f"{KIND_PROJECT}:{project_id}", KIND_PROJECT, f"Project '{project_name}'",
+                 _project_step(state, source_auth, target_auth, project_id, project_name, model_id,
+                               prefix, suffix, use_cache, journal, lookup, schema_pool))
+        if copy_config:
+            plan.add(f"{KIND_CONFIG}:{project_id}", KIND_CONFIG, f"Configuration of '{project_name}'",
+                     _config_step(state, source_auth, target_auth, project_id),
+                     depends_on=[f"{KIND_PROJECT}:{project_id}"])
+
+    left_out = []
+    for rule in routing_rules:
+        endpoints = (rule.get("fromProjectId"), rule.get("toProjectId"))
+        if not rule.get("id") or not all(endpoint in selected for endpoint in endpoints):
+            left_out.append(rule)
+            continue
+        plan.add(f"{KIND_ROUTING}:{rule['id']}", KIND_ROUTING, f"Routing rule '{rule.get('name') or rule['id']}'",
+                 _routing_step(state, target_auth, rule, journal, lookup),
+                 depends_on=[f"{KIND_PROJECT}:{endpoint}" for endpoint in endpoints])
+
+    if setup_api is not None and workflow_ids and target_company_id:
+        workflow_steps = []
+        for workflow_id in workflow_ids:
+            workflow_steps.append(f"{KIND_WORKFLOW}:{workflow_id}")
+            plan.add(workflow_steps[-1], KIND_WORKFLOW, f"Workflow {workflow_id}",
+                     _workflow_step(setup_api, workflow_id, target_company_id))
+        plan.add(KIND_AGENTS, KIND_AGENTS, "Agent prompts",
+                 _agents_step(state, setup_api, target_company_id, max_workers), depends_on=workflow_steps)
+
+    return plan, state, left_out
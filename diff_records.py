@@ -0,0 +1,124 @@
+import json
+from typing import Any, NamedTuple
+
+import pandas as pd
+from deepdiff import DeepDiff
+from deepdiff.helper import notpresent
+
+# Kinds of difference, mapped from DeepDiff report types.
+CHANGED = "changed"
+TYPE_CHANGED = "type_changed"
+ADDED = "added"
+REMOVED = "removed"
+MISSING_IN_TARGET = "missing_in_target"
+EXTRA_IN_TARGET = "extra_in_target"
+
+_REPORT_KINDS = {
+    "values_changed": CHANGED,
+    "type_changes": TYPE_CHANGED,
+    "dictionary_item_added": ADDED,
+    "iterable_item_added": ADDED,
+    "attribute_added": ADDED,
+    "set_item_added": ADDED,
+    "dictionary_item_removed": REMOVED,
+    "iterable_item_removed": REMOVED,
+    "attribute_removed": REMOVED,
+    "set_item_removed": REMOVED,
+}
+
+# Attribute name used for differences that concern a whole datapoint.
+ENTIRE_DATAPOINT = "Entire datapoint"
+
+
+class DiffRecord(NamedTuple):
+    """
+    One difference between a source and a target value.
+
+    datapoint is the composite datapoint key (e.g. "items.C"), or None for metadata
+    differences. attribute is the compared datapoint attribute or metadata field.
+    path points into the attribute value in DeepDiff notation ("root" is the whole
+    value). old and new are the source and target values at that path, None if absent.
+    """
+    datapoint: Any
+    attribute: str
+    path: str
+    kind: str
+    old: Any = None
+    new: Any = None
+
+
+def _value(value):
+    return None if value is notpresent else value
+
+
+def diff_values(datapoint, attribute, source_value, target_value) -> list:
+    """Diffs two attribute values and returns one DiffRecord per changed path."""
+    if source_value == target_value:
+        return []
+    tree = DeepDiff(source_value, target_value, ignore_order=True, view="tree")
+    records = []
+    for report_type, levels in tree.items():
+        kind = _REPORT_KINDS.get(report_type, report_type)
+        for level in levels:
+            records.append(DiffRecord(datapoint, attribute, level.path(), kind, _value(level.t1), _value(level.t2)))
+    return records
+
+
+def _text(value) -> str:
+    if value is None:
+        return "—"
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, default=str)
+
+
+def render_record(record: DiffRecord) -> str:
+    """Renders a record as the one-line text shown in the result tables."""
+    if record.kind == MISSING_IN_TARGET:
+        return "Missing in target"
+    if record.kind == EXTRA_IN_TARGET:
+        return "Extra in target"
+    location = "" if record.path == "root" else f"{record.path}: "
+    if record.kind == ADDED:
+        return f"{location}added {_text(record.new)}"
+    if record.kind == REMOVED:
+        return f"{location}removed {_text(record.old)}"
+    return f"{location}{_text(record.old)} → {_text(record.new)}"
+
+
+def records_frame(records, **columns) -> pd.DataFrame:
+    """
+    Builds the display table of a list of records. Datapoint records become the columns
+    Data Point, Attribute, Difference; metadata records become Field, Source Value,
+    Target Value. Extra keyword arguments are added as leading constant columns
+    (e.g. records_frame(records, **{"Target Project": name})).
+    """
+    records = list(records)
+    if records and records[0].datapoint is None:
+        table = {
+            "Field": [r.attribute for r in records],
+            "Source Value": [_text(r.old) for r in records],
+            "Target Value": [_text(r.new) for r in records],
+        }
+    else:
+        table = {
+            "Data Point": [r.datapoint for r in records],
+            "Attribute": [r.attribute for r in records],
+            "Difference": [render_record(r) for r in records],
+        }
+    frame = pd.DataFrame(table)
+    for position, (name, value) in enumerate(columns.items()):
+        frame.insert(position, name, value)
+    return frame
+
+
+def record_row(record: DiffRecord) -> dict:
+    """Flat dict of a record for the row exports; values keep their type."""
+    return {
+        "Data Point": record.datapoint,
+        "Attribute": record.attribute,
+        "Path": record.path,
+        "Kind": record.kind,
+        "Source Value": record.old,
+        "Target Value": record.new,
+    }
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+from comparison import compare_flat_schemas, compare_metadata_detailed, project_meta
+from config import DRIFT_HISTORY_PATH
+from diff_records import ADDED, CHANGED, REMOVED, DiffRecord, diff_values
+
+# Attribute name of routing rule differences.
+ROUTING_ATTRIBUTE = "rule"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def report_id(base_snapshot_id: str, current_snapshot_id: str) -> str:
+    """Identifies the drift report between two snapshots; the same pair always gets the same ID."""
+    return hashlib.sha256(f"{base_snapshot_id}:{current_snapshot_id}".encode("utf-8")).hexdigest()
+
+
+def _project_meta(snapshot, project_id, listing) -> dict:
+    meta = {"name": listing.get("name")}
+    meta.update(project_meta(snapshot.details(project_id) or {}))
+    return meta
+
+
+def _project_drift(base, current, project_id, base_listing, current_listing, diff_pool, use_cache):
+    """Drift of one project present in both snapshots, or None if it is unchanged."""
+    metadata, schema = [], []
+    # Equal content hashes mean equal content, so only changed blobs are decoded and diffed.
+    if base.details_hash(project_id) != current.details_hash(project_id) \
+            or base_listing.get("name") != current_listing.get("name"):
+        metadata = compare_metadata_detailed(
+            _project_meta(base, project_id, base_listing), _project_meta(current, project_id, current_listing)
+        )
+    base_hash, current_hash = base.schema_hash(project_id), current.schema_hash(project_id)
+    if base_hash and current_hash and base_hash != current_hash:
+        schema = compare_flat_schemas(
+            base.flat_schema(project_id), current.flat_schema(project_id), base_hash, current_hash,
+            diff_pool=diff_pool, use_cache=use_cache,
+        )
+    if not metadata and not schema:
+        return None
+    return {
+        "project_id": project_id,
+        "name": current_listing.get("name"),
+        "status": CHANGED,
+        "metadata": metadata,
+        "schema": schema,
+    }
+
+
+def _routing_drift(base, current):
+    base_hashes = base.manifest.get("routings", {})
+    current_hashes = current.manifest.get("routings", {})
+    changes = []
+    for routing_id in sorted(base_hashes.keys() | current_hashes.keys()):
+        base_hash, current_hash = base_hashes.get(routing_id), current_hashes.get(routing_id)
+        if base_hash == current_hash:
+            continue
+        if base_hash is None or current_hash is None:
+            rule = current.routing(routing_id) if base_hash is None else base.routing(routing_id)
+            changes.append({
+                "routing_id": routing_id,
+                "name": (rule or {}).get("name"),
+                "status": ADDED if base_hash is None else REMOVED,
+                "differences": [],
+            })
+            continue
+        old, new = base.routing(routing_id), current.routing(routing_id)
+        changes.append({
+            "routing_id": routing_id,
+            "name": new.get("name"),
+            "status": CHANGED,
+            "differences": diff_values(routing_id, ROUTING_ATTRIBUTE, old, new),
+        })
+    return changes
+
+
+def drift_report(base, current, diff_pool=None, use_cache=True) -> dict:
+    """
+    Compares two snapshots of the same company (base taken before current).
+
+    Projects are matched by ID. A project whose details and schema hashes are equal in both
+    snapshots is counted as unchanged without decoding anything; only the others are diffed
+    at metadata and datapoint level. Routing rules are compared the same way.
+
+    Returns:
+        dict: The report, holding only added, removed and changed projects and rules
+              (as lists of DiffRecord), plus a summary with counts.
+    """
+    base_projects = {proj["id"]: proj for proj in base.projects}
+    current_projects = {proj["id"]: proj for proj in current.projects}
+
+    projects = []
+    unchanged = 0
+    for project_id, listing in current_projects.items():
+        if project_id not in base_projects:
+            projects.append({"project_id": project_id, "name": listing.get("name"), "status": ADDED,
+                             "metadata": [], "schema": []})
+            continue
+        change = _project_drift(base, current, project_id, base_projects[project_id], listing, diff_pool, use_cache)
+        if change is None:
+            unchanged += 1
+        else:
+            projects.append(change)
+    for project_id, listing in base_projects.items():
+        if project_id not in current_projects:
+            projects.append({"project_id": project_id, "name": listing.get("name"), "status": REMOVED,
+                             "metadata": [], "schema": []})
+
+    routings = _routing_drift(base, current)
+    routing_count = len(base.manifest.get("routings", {}).keys() | current.manifest.get("routings", {}).keys())
+
+    def _count(changes, status):
+        return sum(1 for change in changes if change["status"] == status)
+
+    return {
+        "report_id": report_id(base.snapshot_id, current.snapshot_id),
+        "created_at": _now(),
+        "company": current.company or base.company,
+        "base": {"snapshot_id": base.snapshot_id, "created_at": base.created_at},
+        "current": {"snapshot_id": current.snapshot_id, "created_at": current.created_at},
+        "summary": {
+            "projects_unchanged": unchanged,
+            "projects_changed": _count(projects, CHANGED),
+            "projects_added": _count(projects, ADDED),
+            "projects_removed": _count(projects, REMOVED),
+            "routings_unchanged": routing_count - len(routings),
+            "routings_changed": _count(routings, CHANGED),
+            "routings_added": _count(routings, ADDED),
+            "routings_removed": _count(routings, REMOVED),
+        },
+        "projects": projects,
+        "routings": routings,
+    }
+
+
+# --- History ---
+
+def _decode_report(report: dict) -> dict:
+    """Turns the stored record lists of a report back into DiffRecords."""
+    for change in report["projects"]:
+        change["metadata"] = [DiffRecord(*record) for record in change["metadata"]]
+        change["schema"] = [DiffRecord(*record) for record in change["schema"]]
+    for change in report["routings"]:
+        change["differences"] = [DiffRecord(*record) for record in change["differences"]]
+    return report
+
+
+class DriftHistory:
+    """
+    Append-only store of drift reports in a JSON Lines file, one report per line.
+
+    Reports only hold what changed, so the file stays small even for large companies.
+    The file is read incrementally: each call only parses lines appended since the last one,
+    and reports are indexed by report ID.
+    """
+
+    def __init__(self, path=DRIFT_HISTORY_PATH):
+        self.path = path
+        self._reports = []
+        self._by_id = {}
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # A report that is still being written; read it next time.
+                    break
+                self._offset += len(line)
+                try:
+                    report = _decode_report(json.loads(line))
+                except (ValueError, KeyError, TypeError) as e:
+                    print(f"Skipping unreadable drift report in {self.path}: {e}")
+                    continue
+                self._reports.append(report)
+                self._by_id[report["report_id"]] = report
+
+    def add(self, report: dict):
+        """Appends a report to the history file."""
+        line = json.dumps(report, default=str, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._load()
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._load()
+
+    def get(self, base_snapshot_id: str, current_snapshot_id: str):
+        """Returns the stored report between two snapshots, or None."""
+        with self._lock:
+            self._load()
+            return self._by_id.get(report_id(base_snapshot_id, current_snapshot_id))
+
+    def reports(self, company_id=None) -> list:
+        """Stored reports, newest first, optionally only those of one company."""
+        with self._lock:
+            self._load()
+            reports = list(self._reports)
+        if company_id is not None:
+            reports = [report for report in reports if (report.get("company") or {}).get("id") == company_id]
+        return reports[::-1]
+
+    def since(self, company_id, base_snapshot_id: str):
+        """
+        The newest report of a company taken against base_snapshot_id (e.g. the snapshot
+        taken at cutover), answering "what changed since then" without diffing again.
+        """
+        for report in self.reports(company_id):
+            if report["base"]["snapshot_id"] == base_snapshot_id:
+                return report
+        return None
+
+    def project_history(self, company_id, project_id) -> list:
+        """(report, change) tuples of every stored report in which a project changed, newest first."""
+        return [
+            (report, change)
+            for report in self.reports(company_id)
+            for change in report["projects"]
+            if change["project_id"] == project_id
+        ]
+
+
+# Shared history at the configured path, so its index survives page reruns.
+DRIFT_HISTORY = DriftHistory()
+
+
+def drift_report_with_history(base, current, history: DriftHistory = DRIFT_HISTORY, diff_pool=None,
+                              use_cache=True) -> dict:
+    """Returns the stored report for the two snapshots, or computes and stores it."""
+    report = history.get(base.snapshot_id, current.snapshot_id)
+    if report is None:
+        report = drift_report(base, current, diff_pool=diff_pool, use_cache=use_cache)
+        history.add(report)
+    return report
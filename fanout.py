@@ -0,0 +1,247 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from auth import HypatosAPI
+from config import BASE_URL_EU, BASE_URL_US
+from clone_engine import (
+    DEFAULT_CREATE_WORKERS, STATUS_CREATED, STATUS_FAILED, STATUS_REUSED, SchemaPool, TargetLookup,
+    clone_projects, create_routing_rule, fetch_source_project, routing_rule_payload,
+)
+from clone_journal import CloneJournal, journal_path
+from fetcher import DEFAULT_FETCH_WORKERS, fetch_many, iter_fetch
+from pairing import ProjectNameIndex
+from project_catalog import invalidate_project_catalog
+from routing import routing_graph
+
+# Number of target companies cloned into at the same time. Each target also runs up to
+# DEFAULT_CREATE_WORKERS create requests, so this bounds the total load on the API.
+DEFAULT_FANOUT_WORKERS = 4
+
+# Region names accepted in place of a base URL in the target list.
+REGIONS = {"EU": BASE_URL_EU, "US": BASE_URL_US}
+
+
+def parse_target_credentials(text: str, default_base_url: str) -> list:
+    """
+    Parses one target per line as "client_id,client_secret" or "client_id,client_secret,region",
+    where region is EU, US or a base URL. Blank lines and lines starting with "#" are ignored.
+    Raises ValueError for a malformed line or a client ID listed twice for the same region,
+    since two runs would clone into the same company at the same time.
+
+    Returns:
+        list: (client_id, client_secret, base_url) tuples.
+    """
+    targets = []
+    seen = set()
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = [part.strip() for part in line.split(",")]
+        if len(parts) < 2 or not parts[0] or not parts[1]:
+            raise ValueError(f"Line '{parts[0]}...' is not 'client_id,client_secret[,region]'.")
+        region = parts[2] if len(parts) > 2 and parts[2] else None
+        base_url = REGIONS.get(region.upper(), region) if region else default_base_url
+        if (base_url, parts[0]) in seen:
+            raise ValueError(f"Target '{parts[0]}' is listed more than once.")
+        seen.add((base_url, parts[0]))
+        targets.append((parts[0], parts[1], base_url))
+    return targets
+
+
+def _authenticate_target(credentials, required_scopes):
+    client_id, client_secret, base_url = credentials
+    auth = HypatosAPI(client_id, client_secret, base_url)
+    target = {"client_id": client_id, "auth": None, "company": {}, "error": None}
+    if not auth.authenticate():
+        target["error"] = f"Authentication failed: {auth.last_error or 'unknown error'}"
+        return target
+    missing = auth.get_missing_scopes(required_scopes)
+    if missing:
+        target["error"] = "Missing scopes: " + ", ".join(missing)
+        return target
+    company = auth.get_company_info()
+    if not company or not company.get("id"):
+        target["error"] = "Company details could not be fetched (companies.read)."
+        return target
+    target["auth"] = auth
+    target["company"] = company
+    return target
+
+
+def authenticate_targets(credentials, required_scopes, max_workers=DEFAULT_FETCH_WORKERS) -> list:
+    """
+    Authenticates every target concurrently and fetches its company.
+
+    Returns:
+        list: One dict per credential, in input order, with client_id, auth (None on failure),
+              company and error.
+    """
+    results, _ = fetch_many(lambda index: _authenticate_target(credentials[index], required_scopes),
+                            range(len(credentials)), max_workers)
+    return [
+        results.get(index) or {"client_id": credentials[index][0], "auth": None, "company": {},
+                               "error": "Unexpected error during authentication."}
+        for index in range(len(credentials))
+    ]
+
+
+class SourceBundle:
+    """
+    Everything a clone reads from the source company (company, project details, schemas and
+    the routing rules between the selected projects), read once and shared by all targets.
+    """
+
+    def __init__(self, source_auth, company, projects, sources, routing_rules, schema_pool, failed,
+                 unresolved_routings=()):
+        self.source_auth = source_auth
+        self.company = company
+        self.projects = projects
+        self.routing_rules = routing_rules
+        self.unresolved_routings = list(unresolved_routings)
+        self.schema_pool = schema_pool
+        self.failed = failed
+        self._sources = sources
+
+    @classmethod
+    def load(cls, source_auth, projects, max_workers=DEFAULT_FETCH_WORKERS, progress_callback=None):
+        """
+        Reads the selected projects (list of (project_id, project_name)) and their routing rules.
+        Projects whose details or schema cannot be read are left out and listed in failed;
+        routing rules that cannot be read are listed in unresolved_routings. Returns None if
+        the routing rules of the source company cannot be listed.
+        """
+        graph = routing_graph(source_auth, use_cache=False)
+        if graph is None:
+            return None
+        schema_pool = SchemaPool()
+        sources, failed = fetch_many(
+            lambda project_id: fetch_source_project(source_auth, project_id, False, schema_pool),
+            [project_id for project_id, _ in projects],
+            max_workers,
+            progress_callback,
+        )
+        for details, schema, schema_hash in sources.values():
+            schema_pool.intern(schema_hash, schema)
+        loaded = [(project_id, name) for project_id, name in projects if project_id in sources]
+        rules = graph.rules_within(sources)
+        company = source_auth.get_company_info() or {}
+        return cls(source_auth, company, loaded, sources, rules, schema_pool, failed, graph.unresolved)
+
+    def source(self, project_id):
+        """(details, schema, schema_hash) of a loaded project, or None."""
+        return self._sources.get(project_id)
+
+
+def target_model_id(target_auth, model_project_name):
+    """
+    The extractionModelId new projects get in a target: the model of the project named
+    model_project_name. None if the target has no such project (or it has no model).
+    """
+    data = target_auth.get_projects() or {}
+    found = ProjectNameIndex(data.get("data", [])).match(model_project_name)
+    return found[0].get("extractionModelId") if found else None
+
+
+def _target_summary(target, error=""):
+    """A failed summary of a target with zero counts, filled in as the clone proceeds."""
+    return {
+        "target": target["company"].get("name") or target["client_id"],
+        "company_id": target["company"].get("id"),
+        "status": "Failed",
+        "projects_created": 0,
+        "projects_reused": 0,
+        "projects_failed": 0,
+        "routings_created": 0,
+        "routings_reused": 0,
+        "routings_failed": 0,
+        "error": error,
+        "project_id_map": {},
+    }
+
+
+def _clone_into_target(bundle, target, prefix, suffix, model_project_name, create_workers):
+    target_auth = target["auth"]
+    company = target["company"]
+    summary = _target_summary(target)
+    model_id = target_model_id(target_auth, model_project_name)
+    if not model_id:
+        # Guessing a model would silently give the copies the wrong extraction model.
+        summary["error"] = f"No project named '{model_project_name}' with an extraction model in the target company."
+        return summary
+
+    journal = None
+    if bundle.company.get("id"):
+        journal = CloneJournal(journal_path(bundle.source_auth, bundle.company["id"], target_auth, company["id"]))
+
+    project_id_map = summary["project_id_map"]
+    for result in clone_projects(bundle.source_auth, target_auth, bundle.projects, model_id, prefix, suffix,
+                                 create_workers=create_workers, journal=journal, fetch_source=bundle.source,
+                                 schema_pool=bundle.schema_pool):
+        if result["status"] == STATUS_FAILED:
+            summary["projects_failed"] += 1
+            continue
+        project_id_map[result["source_project_id"]] = result["new_project_id"]
+        summary["projects_reused" if result["status"] == STATUS_REUSED else "projects_created"] += 1
+
+    invalidate_project_catalog(target_auth)
+
+    lookup = TargetLookup(target_auth)
+    rules = {
+        rule["id"]: routing_rule_payload(rule, project_id_map[rule["fromProjectId"]], project_id_map[rule["toProjectId"]])
+        for rule in bundle.routing_rules
+        if rule["fromProjectId"] in project_id_map and rule["toProjectId"] in project_id_map
+    }
+    # Rules that could not be read from the source cannot be copied either.
+    summary["routings_failed"] = len(bundle.routing_rules) - len(rules) + len(bundle.unresolved_routings)
+
+    def _create(rule_id):
+        return create_routing_rule(target_auth, rule_id, rules[rule_id], journal, lookup)
+
+    for _, outcome in iter_fetch(_create, list(rules), create_workers):
+        status = outcome[0] if outcome else STATUS_FAILED
+        if status == STATUS_CREATED:
+            summary["routings_created"] += 1
+        elif status == STATUS_REUSED:
+            summary["routings_reused"] += 1
+        else:
+            summary["routings_failed"] += 1
+
+    if not project_id_map:
+        summary["error"] = "No project could be created in the target company."
+    elif summary["projects_failed"] + summary["routings_failed"]:
+        summary["status"] = "Partial"
+    else:
+        summary["status"] = "Done"
+    return summary
+
+
+def fan_out_clone(bundle, targets, model_project_name, prefix="", suffix="",
+                  max_targets=DEFAULT_FANOUT_WORKERS, create_workers=DEFAULT_CREATE_WORKERS):
+    """
+    Clones the projects and routing rules of a SourceBundle into every target in parallel.
+
+    Each target runs in isolation: its own model ID, clone journal and target lookup, and an
+    error in one target never affects the others. The source is not read again; all targets
+    clone from the bundle and share its schema encodings.
+
+    Args:
+        targets: Authenticated targets as returned by authenticate_targets (failed ones are skipped).
+
+    Yields:
+        dict: One summary per target in completion order, with target, company_id, status
+              ("Done", "Partial" or "Failed"), created/reused/failed counts of projects and
+              routing rules, error and project_id_map.
+    """
+    ready = [target for target in targets if target["auth"] is not None]
+    with ThreadPoolExecutor(max_workers=max_targets) as pool:
+        futures = {
+            pool.submit(_clone_into_target, bundle, target, prefix, suffix, model_project_name, create_workers): target
+            for target in ready
+        }
+        for future in as_completed(futures):
+            target = futures[future]
+            try:
+                yield future.result()
+            except Exception as err:
+                print(f"Unexpected error while cloning into {target['client_id']}: {err}")
+                yield _target_summary(target, str(err))
@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Number of API requests in flight at the same time.
+DEFAULT_FETCH_WORKERS = 8
+
+
+def iter_fetch(fetch, keys, max_workers=DEFAULT_FETCH_WORKERS):
+    """
+    Calls fetch(key) for every key on a thread pool bounded by max_workers.
+    Yields (key, result) tuples in completion order on the calling thread; result is
+    None if the fetch returned nothing or raised.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(fetch, key): key for key in keys}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                result = future.result()
+            except Exception as err:
+                print(f"Unexpected error while fetching {key}: {err}")
+                result = None
+            yield key, result
+
+
+def fetch_many(fetch, keys, max_workers=DEFAULT_FETCH_WORKERS, progress_callback=None):
+    """
+    Fetches many resources concurrently, see iter_fetch.
+
+    Args:
+        progress_callback: Optional callable(done, total) invoked on the calling thread.
+
+    Returns:
+        tuple: (dict mapping key to result for every successful fetch, list of failed keys)
+    """
+    keys = list(keys)
+    results = {}
+    failed = []
+    for done, (key, result) in enumerate(iter_fetch(fetch, keys, max_workers), start=1):
+        if result:
+            results[key] = result
+        else:
+            failed.append(key)
+        if progress_callback:
+            progress_callback(done, len(keys))
+    return results, failed
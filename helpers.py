@@ -1,5 +1,8 @@
+import zipfile
+
 import streamlit as st
 from config import BASE_URL_EU, BASE_URL_US
+from project_catalog import PAGE_SIZE
 
 # Required scopes for API operations
 REQUIRED_SCOPES = ["projects.read", "projects.write", "routings.read", "routings.write", "companies.read"]
@@ -82,6 +85,40 @@ def validate_scopes(auth, company_name: str):
         return False
     return True
 
+def snapshot_input(label: str, key: str):
+    """
+    Displays a file uploader for a company snapshot.
+    Returns a SnapshotAPI serving the uploaded snapshot, or None if no valid file is uploaded.
+    The opened snapshot is kept in session state until another file is uploaded.
+    """
+    # Imported here because snapshot depends on comparison, which imports this module.
+    from snapshot import SNAPSHOT_FILE_EXTENSION, open_snapshot_upload, remove_snapshot_file
+
+    def _discard(opened):
+        # The stored copy of a replaced or removed upload is deleted right away.
+        if opened:
+            opened[1].snapshot.close()
+            remove_snapshot_file(opened[1].snapshot.path)
+
+    uploaded = st.file_uploader(label, type=[SNAPSHOT_FILE_EXTENSION], key=key)
+    if uploaded is None:
+        _discard(st.session_state.pop(f"{key}_api", None))
+        return None
+    file_id = getattr(uploaded, "file_id", uploaded.name)
+    opened = st.session_state.get(f"{key}_api")
+    if not opened or opened[0] != file_id:
+        _discard(st.session_state.pop(f"{key}_api", None))
+        try:
+            opened = (file_id, open_snapshot_upload(uploaded))
+        except (zipfile.BadZipFile, KeyError, ValueError) as e:
+            st.error(f"❌ Not a valid company snapshot: {e}")
+            return None
+        st.session_state[f"{key}_api"] = opened
+    snapshot_api = opened[1]
+    summary = snapshot_api.snapshot.summary()
+    st.caption(f"📦 {summary['Company']} · {summary['Created']} · {summary['Projects']} projects")
+    return snapshot_api
+
 def check_admin_access() -> bool:
     """
     Checks if the current user has admin access.
@@ -115,6 +152,62 @@ def check_admin_access() -> bool:
     return False
 
 
+def project_selector(label: str, catalog, key: str, multiple: bool = False, default=None, none_label: str = None):
+    """
+    Displays a search box and a selectbox (or multiselect) over the projects of a ProjectCatalog.
+    Only the first page of matches is rendered; "Show more" adds another page. Chosen
+    projects stay selectable when the search changes. With none_label, the selectbox
+    starts with a None option shown as none_label. "Refresh project list" drops the
+    cached catalog, so projects created elsewhere (e.g. in another session) show up.
+
+    Returns:
+        The selected (project_id, project_name) option, a list of options if multiple is True,
+        or None if nothing is selected or matches.
+    """
+    query = st.text_input(f"Search {label.lower()}", key=f"{key}_search", placeholder="Name or project ID")
+    st.caption(f"Project list retrieved at {catalog.listed_at}.")
+    if st.button("Refresh project list", key=f"{key}_refresh"):
+        catalog.invalidate()
+        st.rerun()
+    pages_key = f"{key}_pages"
+    if st.session_state.get(f"{pages_key}_query") != query:
+        st.session_state[pages_key] = 1
+        st.session_state[f"{pages_key}_query"] = query
+    shown, total = catalog.search(query, limit=st.session_state[pages_key] * PAGE_SIZE)
+
+    if multiple:
+        chosen = [option for option in st.session_state.get(key, default or []) if option[0] in catalog]
+        options = chosen + [option for option in shown if option not in chosen]
+        if key not in st.session_state and default:
+            st.session_state[key] = chosen
+        selected = st.multiselect(label, options, format_func=lambda x: x[1], key=key)
+    else:
+        current = st.session_state.get(key, default)
+        options = list(shown)
+        if current and current[0] in catalog and current not in options:
+            options.insert(0, current)
+        if none_label is not None:
+            options.insert(0, None)
+        if not options:
+            st.info("No project matches the search.")
+            return None
+        index = options.index(current) if current in options else 0
+        selected = st.selectbox(
+            label,
+            options,
+            index=index,
+            format_func=lambda x: none_label if x is None else x[1],
+            key=key,
+        )
+
+    if len(shown) < total:
+        st.caption(f"Showing {len(shown)} of {total} matching projects.")
+        if st.button("Show more", key=f"{key}_more"):
+            st.session_state[pages_key] += 1
+            st.rerun()
+    return selected
+
+
 def select_project_and_get_schema(auth):
     """
     Displays a selectbox listing all projects retrieved via the provided auth instance.
@@ -155,7 +248,13 @@ def get_datapoints_dict(auth, project_id):
     Returns:
         dict: A dictionary of datapoints from the schema, or empty dict if retrieval fails.
     """
-    schema = auth.get_project_schema(project_id)
+    return datapoints_from_schema(auth.get_project_schema(project_id))
+
+def datapoints_from_schema(schema):
+    """
+    Extracts the datapoints dictionary from an already fetched schema.
+    Returns an empty dict if the schema is missing.
+    """
     if not schema:
         return {}
     
@@ -175,7 +274,13 @@ def get_metadata(auth, project_id):
     Returns:
         dict: A dictionary of metadata from the schema, or empty dict if retrieval fails.
     """
-    schema = auth.get_project_schema(project_id)
+    return metadata_from_schema(auth.get_project_schema(project_id))
+
+def metadata_from_schema(schema):
+    """
+    Extracts the metadata (everything except datapoints) from an already fetched schema.
+    Returns an empty dict if the schema is missing.
+    """
     if not schema:
         return {}
     
@@ -1,8 +1,27 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-from deepdiff import DeepDiff
 from auth import HypatosAPI
-from helpers import get_source_base_url, get_target_base_url, input_credentials, validate_scopes
+from cache import cached_project_details_many, cached_project_schema
+from comparison import (
+    PreparedSource,
+    compare_one_to_many,
+    create_diff_pool,
+    meta_difference_matrix,
+    meta_differences_long,
+    project_meta_frame,
+)
+from diff_records import records_frame
+from similarity import build_similarity_index
+from helpers import (
+    get_source_base_url,
+    get_target_base_url,
+    input_credentials,
+    project_selector,
+    snapshot_input,
+    validate_scopes,
+)
+from project_catalog import project_catalog
 
 st.set_page_config(page_title="Compare Project Schemas", page_icon=":yin_yang:")
 
@@ -68,82 +87,24 @@ def authenticate_credentials():
         st.error(f"❌ Target Authentication failed\n\n**Error:** {error_msg}")
 
 
-# --- Flatten Schema Function ---
+def use_snapshots_section():
+    """Lets either side be served from an uploaded company snapshot instead of the live API."""
+    with st.expander("📦 Use company snapshots instead of the live API"):
+        st.write("Snapshots are created on the **Company Snapshots** page. Comparisons against a snapshot make no API calls.")
+        col_source, col_target = st.columns(2)
+        with col_source:
+            source_snapshot = snapshot_input("Source snapshot", "source_snapshot_file")
+        with col_target:
+            target_snapshot = snapshot_input("Target snapshot", "target_snapshot_file")
+        if st.button("Use Snapshots", disabled=not (source_snapshot or target_snapshot)):
+            if source_snapshot:
+                st.session_state["source_auth"] = source_snapshot
+                st.session_state["source_company_name"] = source_snapshot.snapshot.company.get("name")
+            if target_snapshot:
+                st.session_state["target_auth"] = target_snapshot
+                st.session_state["target_company_name"] = target_snapshot.snapshot.company.get("name")
+            st.success("Snapshots are now used for the selected side(s).")
 
-def flatten_schema(datapoints, parent=""):
-    """
-    Recursively flattens a list of datapoint dictionaries.
-    Each datapoint is keyed by its internalName. If a datapoint contains a nested
-    list of datapoints (under the key "dataPoints"), these are flattened with a composite key.
-    For example, a datapoint with internalName "items" having nested datapoints with internalName "C"
-    will be represented with the composite key "items.C".
-    
-    Returns a dict mapping composite keys to datapoint dictionaries.
-    """
-    flat = {}
-    for dp in datapoints:
-        key = dp.get("internalName", "unknown")
-        composite_key = f"{parent}.{key}" if parent else key
-        flat[composite_key] = dp
-        # Look for nested datapoints under "dataPoints" key.
-        if "dataPoints" in dp and isinstance(dp["dataPoints"], list) and dp["dataPoints"]:
-            nested = flatten_schema(dp["dataPoints"], parent=composite_key)
-            flat.update(nested)
-    return flat
-
-# --- Compare Schema Function ---
-
-def compare_schemas_very_low(source_schema, target_schema, target_project_name):
-    """
-    Compares two schemas at a very detailed level.
-    Both schemas are expected to have a "dataPoints" list.
-    This function flattens the datapoints recursively (using the nested "dataPoints" key)
-    so that nested datapoints are given composite keys (e.g. "items.C").
-    
-    It then compares a set of attributes for each datapoint:
-       internalName, displayName, type, rules, normalization, derivation, source.
-    
-    For each composite key in the union of source and target, differences are captured.
-    Returns a list of difference records with columns:
-       Target Project, Data Point, Attribute, Difference.
-    """
-    differences = []
-    source_flat = flatten_schema(source_schema.get("dataPoints", []))
-    target_flat = flatten_schema(target_schema.get("dataPoints", []))
-    
-    all_keys = set(source_flat.keys()).union(set(target_flat.keys()))
-    attributes = ["internalName", "displayName", "type", "rules", "normalization", "derivation", "source"]
-    
-    for key in all_keys:
-        if key not in target_flat:
-            differences.append({
-                "Target Project": target_project_name,
-                "Data Point": key,
-                "Attribute": "Entire datapoint",
-                "Difference": "Missing in target"
-            })
-        elif key not in source_flat:
-            differences.append({
-                "Target Project": target_project_name,
-                "Data Point": key,
-                "Attribute": "Entire datapoint",
-                "Difference": "Extra in target"
-            })
-        else:
-            src_dp = source_flat[key]
-            tgt_dp = target_flat[key]
-            for attr in attributes:
-                src_val = src_dp.get(attr)
-                tgt_val = tgt_dp.get(attr)
-                diff = DeepDiff(src_val, tgt_val, ignore_order=True, verbose_level=2)
-                if diff:
-                    differences.append({
-                        "Target Project": target_project_name,
-                        "Data Point": key,
-                        "Attribute": attr,
-                        "Difference": str(diff)
-                    })
-    return differences
 
 def compare_datapoints_option():
     st.title("Compare Project Schemas")
@@ -155,50 +116,81 @@ def compare_datapoints_option():
     source_auth = st.session_state["source_auth"]
     target_auth = st.session_state["target_auth"]
     
-    # Retrieve project lists from source and target.
-    source_data = source_auth.get_projects()
-    target_data = target_auth.get_projects()
-    source_projects = source_data.get("data", [])
-    target_projects = target_data.get("data", [])
-    
-    if not source_projects:
+    # Retrieve searchable project catalogs of source and target.
+    source_catalog = project_catalog(source_auth)
+    target_catalog = project_catalog(target_auth)
+
+    if not source_catalog:
         st.error("No source projects found.")
         return
-    if not target_projects:
+    if not target_catalog:
         st.error("No target projects found.")
         return
-    
-    # Build selection lists (tuples of (id, name))
-    source_project_list = [(proj["id"], proj["name"]) for proj in source_projects]
-    target_project_list = [(proj["id"], proj["name"]) for proj in target_projects]
-    
+
     # Allow one source project.
-    source_project = st.selectbox("Source Project", source_project_list, format_func=lambda x: x[1])
-    # Allow multiple target projects (max 10).
-    target_projects_selected = st.multiselect("Target Project(s) (max 10)", target_project_list, format_func=lambda x: x[1])
-    if len(target_projects_selected) > 10:
-        st.error("You can select a maximum of 10 target projects.")
-        return
+    source_project = project_selector("Source Project", source_catalog, "compare_source_project")
+    # Allow multiple target projects, up to the whole target company.
+    compare_all_targets = st.checkbox(
+        f"Compare against all {len(target_catalog)} target projects",
+        key="compare_all_target_projects",
+    )
+    if compare_all_targets:
+        target_projects_selected = target_catalog.options()
+    else:
+        target_projects_selected = project_selector(
+            "Target Project(s)", target_catalog, "compare_target_projects", multiple=True,
+        )
+    use_processes = st.checkbox(
+        "Diff in separate processes",
+        help="Splits the datapoints of large schemas into key ranges and diffs them on all CPU cores.",
+    )
+    use_cache = st.checkbox(
+        "Reuse cached results",
+        value=True,
+        help="Reuses recently fetched schemas and earlier diffs of identical schema contents. "
+             "Untick to fetch everything from the API again.",
+    )
     
     if st.button("Compare"):
+        if not target_projects_selected:
+            st.error("Please select at least one target project.")
+            return
         # Retrieve source schema using source_auth.
-        source_schema = source_auth.get_project_schema(source_project[0])
+        source_schema, source_hash = cached_project_schema(source_auth, source_project[0], use_cache)
         if not source_schema:
             st.error("Failed to retrieve schema for the source project.")
             return
         
-        all_differences = []
-        for target_proj in target_projects_selected:
-            target_proj_id, target_proj_name = target_proj
-            target_schema = target_auth.get_project_schema(target_proj_id)
-            if not target_schema:
-                st.warning(f"Failed to retrieve schema for target project {target_proj_name}.")
-                continue
-            diffs = compare_schemas_very_low(source_schema, target_schema, target_proj_name)
-            all_differences.extend(diffs)
+        # Flatten and hash the source once for all targets.
+        source = PreparedSource(source_schema, source_hash)
+        
+        difference_frames = []
+        identical = 0
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+        total = len(target_projects_selected)
+        diff_pool = create_diff_pool() if use_processes else None
+        try:
+            for done, (target_proj_id, target_proj_name, diffs) in enumerate(
+                compare_one_to_many(source, target_auth, target_projects_selected,
+                                    diff_pool=diff_pool, use_cache=use_cache),
+                start=1,
+            ):
+                if diffs is None:
+                    st.warning(f"Failed to retrieve schema for target project {target_proj_name}.")
+                elif diffs:
+                    difference_frames.append(records_frame(diffs, **{"Target Project": target_proj_name}))
+                else:
+                    identical += 1
+                status_text.text(f"Compared {done}/{total}: {target_proj_name}")
+                progress_bar.progress(done / total)
+        finally:
+            if diff_pool is not None:
+                diff_pool.shutdown()
+        status_text.text(f"Compared {total} target project(s), {identical} identical to the source.")
         
-        if all_differences:
-            df = pd.DataFrame(all_differences, columns=["Target Project", "Data Point", "Attribute", "Difference"])
+        if difference_frames:
+            df = pd.concat(difference_frames, ignore_index=True)
             st.subheader("Schema Differences")
             st.dataframe(df)
         else:
@@ -207,6 +199,10 @@ def compare_datapoints_option():
 
 # --- MetaLevel Compare Function ---
 
+# Larger matrices are offered as a download instead of being rendered in the page.
+MAX_DISPLAYED_MATRIX_CELLS = 250_000
+
+
 def compare_meta_level_section():
     st.title("Compare Project Metadata")
     # Ensure both auth objects are available.
@@ -217,94 +213,226 @@ def compare_meta_level_section():
     source_auth = st.session_state["source_auth"]
     target_auth = st.session_state["target_auth"]
 
-    # Retrieve project lists from each company.
-    source_data = source_auth.get_projects()
-    target_data = target_auth.get_projects()
-    source_projects = source_data.get("data", [])
-    target_projects = target_data.get("data", [])
+    # Retrieve searchable project catalogs of each company.
+    source_catalog = project_catalog(source_auth)
+    target_catalog = project_catalog(target_auth)
 
-    if not source_projects:
+    if not source_catalog:
         st.error("No source projects found.")
         return
-    if not target_projects:
+    if not target_catalog:
         st.error("No target projects found.")
         return
 
-    source_project_list = [(proj["id"], proj["name"]) for proj in source_projects]
-    target_project_list = [(proj["id"], proj["name"]) for proj in target_projects]
-
-    # Allow one source project.
-    source_project = st.selectbox("Source Project", source_project_list, format_func=lambda x: x[1])
-    # Allow multiple target projects (max 10).
-    target_projects_selected = st.multiselect("Target Project(s) (max 10)", target_project_list, format_func=lambda x: x[1])
-    if len(target_projects_selected) > 10:
-        st.error("You can select a maximum of 10 target projects.")
-        return
+    # Allow any number of source and target projects, up to both whole companies.
+    if st.checkbox(f"Compare all {len(source_catalog)} source projects", key="meta_all_source_projects"):
+        source_projects_selected = source_catalog.options()
+    else:
+        source_projects_selected = project_selector(
+            "Source Project(s)", source_catalog, "meta_source_projects", multiple=True,
+        )
+    if st.checkbox(f"Compare against all {len(target_catalog)} target projects", key="meta_all_target_projects"):
+        target_projects_selected = target_catalog.options()
+    else:
+        target_projects_selected = project_selector(
+            "Target Project(s)", target_catalog, "meta_target_projects", multiple=True,
+        )
+    use_cache = st.checkbox(
+        "Reuse cached results",
+        value=True,
+        key="meta_use_cache",
+        help="Reuses recently fetched project details. Untick to fetch everything from the API again.",
+    )
 
     if st.button("Compare"):
-        # Retrieve project details using the get_project_by_id method.
-        source_details = source_auth.get_project_by_id(source_project[0])
-        if not source_details:
-            st.error("Failed to retrieve source project details.")
+        if not source_projects_selected or not target_projects_selected:
+            st.error("Please select at least one source and one target project.")
+            return
+        with st.spinner("Fetching project details..."):
+            source_details = cached_project_details_many(
+                source_auth, [pid for pid, _ in source_projects_selected], use_cache=use_cache
+            )
+            target_details = cached_project_details_many(
+                target_auth, [pid for pid, _ in target_projects_selected], use_cache=use_cache
+            )
+        for label, selected, details in (("source", source_projects_selected, source_details),
+                                         ("target", target_projects_selected, target_details)):
+            failed = [name for pid, name in selected if pid not in details]
+            if failed:
+                st.warning(f"Failed to retrieve details for {len(failed)} {label} project(s): {', '.join(failed)}")
+        if not source_details or not target_details:
+            st.error("No project details to compare.")
             return
 
-        # Extract only the meta-level fields.
-        source_meta = {
-            "extractionModelId": source_details.get("extractionModelId"),
-            "members": source_details.get("members"),
-            "retentionDays": source_details.get("retentionDays"),
-            "duplicates": source_details.get("duplicates"),
-            "completion": source_details.get("completion"),
-            "features": source_details.get("ocr", {}).get("features")
+        # Keep the selection order for the rows and columns of the matrix.
+        source_frame = project_meta_frame(
+            {pid: source_details[pid] for pid, _ in source_projects_selected if pid in source_details}
+        )
+        target_frame = project_meta_frame(
+            {pid: target_details[pid] for pid, _ in target_projects_selected if pid in target_details}
+        )
+        matrix, masks = meta_difference_matrix(source_frame, target_frame)
+        st.session_state["meta_comparison"] = {
+            "source_frame": source_frame,
+            "target_frame": target_frame,
+            "matrix": matrix,
+            "masks": masks,
+            "source_names": dict(source_projects_selected),
+            "target_names": dict(target_projects_selected),
         }
 
-        diff_list = []
-        for target_proj in target_projects_selected:
-            target_id, target_name = target_proj
-            target_details = target_auth.get_project_by_id(target_id)
-            if not target_details:
-                st.warning(f"Failed to retrieve details for target project {target_name}.")
-                continue
-
-            target_meta = {
-                "extractionModelId": target_details.get("extractionModelId"),
-                "members": target_details.get("members"),
-                "retentionDays": target_details.get("retentionDays"),
-                "duplicates": target_details.get("duplicates"),
-                "completion": target_details.get("completion"),
-                "features": target_details.get("ocr", {}).get("features")
-            }
-
-            for field in source_meta:
-                src_val = source_meta[field]
-                tgt_val = target_meta.get(field)
-                if src_val != tgt_val:
-                    diff_list.append({
-                        "Target Project": target_name,
-                        "Field": field,
-                        "Source Value": src_val,
-                        "Target Value": tgt_val
-                    })
-
-        if diff_list:
-            df = pd.DataFrame(diff_list, columns=["Target Project", "Field", "Source Value", "Target Value"])
-            st.subheader("Meta Level Differences")
-            st.dataframe(df)
+    result = st.session_state.get("meta_comparison")
+    if not result:
+        return
+
+    matrix = result["matrix"]
+    source_names = result["source_names"]
+    target_names = result["target_names"]
+    identical_pairs = int((matrix.values == 0).sum())
+    st.write(f"Compared {matrix.shape[0]} source × {matrix.shape[1]} target project(s): "
+             f"{identical_pairs} identical pair(s) at the meta level.")
+
+    if matrix.shape[0] > 1:
+        # Per source project: how many targets match exactly and which target is closest.
+        closest = matrix.values.argmin(axis=1)
+        summary = pd.DataFrame({
+            "Source Project": matrix.index.map(source_names),
+            "Identical Targets": (matrix.values == 0).sum(axis=1),
+            "Closest Target": matrix.columns.values[closest],
+            "Differing Fields": matrix.values[np.arange(matrix.shape[0]), closest],
+        })
+        summary["Closest Target"] = summary["Closest Target"].map(target_names)
+        st.subheader("Summary per Source Project")
+        st.dataframe(summary)
+
+        st.subheader("Differing Fields per Project Pair")
+        named = matrix.rename(index=source_names, columns=target_names)
+        if matrix.size <= MAX_DISPLAYED_MATRIX_CELLS:
+            st.dataframe(named)
+        else:
+            st.info(f"The matrix has {matrix.size} cells and is too large to display; download it instead.")
+        st.download_button(
+            "Download Matrix (CSV)",
+            data=named.to_csv().encode("utf-8"),
+            file_name="meta_difference_matrix.csv",
+            mime="text/csv",
+        )
+
+        detail_source = st.selectbox(
+            "Show field differences for source project",
+            list(matrix.index),
+            format_func=lambda pid: source_names.get(pid, pid),
+        )
+        source_rows = [matrix.index.get_loc(detail_source)]
+    else:
+        source_rows = None
+
+    diff_df = meta_differences_long(result["source_frame"], result["target_frame"], result["masks"], source_rows)
+    if diff_df.empty:
+        st.success("No differences found at the meta level.")
+        return
+    df = pd.DataFrame({
+        "Source Project": diff_df["Source Project ID"].map(source_names),
+        "Target Project": diff_df["Target Project ID"].map(target_names),
+        "Field": diff_df["Field"],
+        "Source Value": diff_df["Source Value"],
+        "Target Value": diff_df["Target Value"],
+    })
+    st.subheader("Meta Level Differences")
+    st.dataframe(df)
+
+
+# --- Schema Similarity Function ---
+
+def schema_similarity_section():
+    st.title("Schema Similarity")
+    st.write(
+        "Fetches every project schema of a company once and groups projects whose datapoint "
+        "structure is (nearly) identical, e.g. projects cloned from the same template."
+    )
+    if "source_auth" not in st.session_state or "target_auth" not in st.session_state:
+        st.error("Please authenticate both Source and Target credentials first.")
+        return
+
+    company = st.radio("Company", ["Source Company", "Target Company"], horizontal=True, key="similarity_company")
+    auth = st.session_state["source_auth"] if company == "Source Company" else st.session_state["target_auth"]
+
+    if st.button("Build Similarity Index"):
+        data = auth.get_projects()
+        projects = data.get("data", []) if data else []
+        if not projects:
+            st.error("No projects found.")
+            return
+        progress_bar = st.progress(0)
+        index, failed = build_similarity_index(
+            auth,
+            projects,
+            progress_callback=lambda done, total: progress_bar.progress(done / total),
+        )
+        if failed:
+            st.warning(f"Failed to retrieve the schema of {len(failed)} project(s): " + ", ".join(name for _, name in failed))
+        st.session_state["similarity_index"] = index
+        st.session_state["similarity_index_company"] = company
+
+    index = st.session_state.get("similarity_index")
+    if index is None or st.session_state.get("similarity_index_company") != company:
+        st.info("Build the index to see clusters of similar projects.")
+        return
+
+    st.caption(f"{len(index)} project schemas indexed.")
+
+    st.subheader("Near-Duplicate Clusters")
+    threshold = st.slider("Minimum datapoint similarity", 0.5, 1.0, 0.9, 0.01, key="similarity_threshold")
+    clusters = index.clusters(threshold)
+    if clusters:
+        rows = []
+        for number, cluster in enumerate(clusters, start=1):
+            for project_id in sorted(cluster, key=lambda pid: index.names[pid]):
+                rows.append({
+                    "Cluster": number,
+                    "Project": index.names[project_id],
+                    "Project ID": project_id,
+                    "Datapoints": len(index.keys[project_id]),
+                })
+        st.write(f"**{len(clusters)}** cluster(s) covering **{len(rows)}** projects.")
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+    else:
+        st.info("No clusters found at this similarity threshold.")
+
+    st.subheader("Most Similar Projects")
+    project_list = sorted(index.names.items(), key=lambda item: item[1])
+    selected = st.selectbox("Project", project_list, format_func=lambda x: x[1], key="similarity_query_project")
+    if selected:
+        similar = index.most_similar(selected[0], top_n=20)
+        if similar:
+            st.dataframe(
+                pd.DataFrame(
+                    [{"Project": name, "Project ID": pid, "Similarity": round(score, 3)} for pid, name, score in similar]
+                ),
+                use_container_width=True,
+                hide_index=True,
+            )
         else:
-            st.success("No differences found at the meta level.")            
+            st.info("No similar projects found.")
+
 
 def main():
     st.sidebar.title("Navigation")
-    compare_option = st.sidebar.radio("Select Compare Mode", ["Compare Datapoints", "Compare Metadata"])
+    compare_option = st.sidebar.radio(
+        "Select Compare Mode", ["Compare Datapoints", "Compare Metadata", "Schema Similarity"]
+    )
     
     # Always show the credentials input at the top.
     input_credentials()
     if st.button("Authenticate Credentials"):
         authenticate_credentials()
+    use_snapshots_section()
     
     if compare_option in ["Compare Metadata"]:
         # MetaLevel comparison option.
         compare_meta_level_section()
+    elif compare_option == "Schema Similarity":
+        schema_similarity_section()
     else:
         # DatapoinLevel comparison option.
         compare_datapoints_option()
@@ -0,0 +1,246 @@
+import pandas as pd
+import streamlit as st
+from auth import HypatosAPI
+from config import BASE_URL_EU, BASE_URL_US
+from diff_records import records_frame
+from drift import DRIFT_HISTORY, drift_report_with_history
+from helpers import snapshot_input, validate_scopes
+from snapshot import Snapshot, new_snapshot_path, refresh_snapshot, remove_snapshot_file
+
+st.set_page_config(page_title="Snapshot Drift", page_icon=":mag:")
+
+_SUMMARY_LABELS = {
+    "projects_unchanged": "Unchanged projects",
+    "projects_changed": "Changed projects",
+    "projects_added": "New projects",
+    "projects_removed": "Removed projects",
+    "routings_unchanged": "Unchanged rules",
+    "routings_changed": "Changed rules",
+    "routings_added": "New rules",
+    "routings_removed": "Removed rules",
+}
+
+
+# ---------------------------------------------------------------------------
+# Report display
+# ---------------------------------------------------------------------------
+
+def _render_report(report: dict, key: str):
+    company = report.get("company") or {}
+    st.write(
+        f"**{company.get('name') or 'Company'}**: snapshot of {report['base']['created_at']} "
+        f"→ {report['current']['created_at']}"
+    )
+    summary = report["summary"]
+    st.dataframe(
+        pd.DataFrame([{label: summary[field] for field, label in _SUMMARY_LABELS.items()}]),
+        use_container_width=True,
+        hide_index=True,
+    )
+
+    if report["projects"]:
+        st.subheader("Projects")
+        projects = pd.DataFrame([
+            {
+                "Project": change["name"],
+                "Project ID": change["project_id"],
+                "Status": change["status"],
+                "Metadata Differences": len(change["metadata"]),
+                "Datapoint Differences": len(change["schema"]),
+            }
+            for change in report["projects"]
+        ])
+        st.dataframe(projects, use_container_width=True, hide_index=True)
+        changed = [change for change in report["projects"] if change["metadata"] or change["schema"]]
+        if changed:
+            selected = st.selectbox(
+                "Show differences of project",
+                range(len(changed)),
+                format_func=lambda i: f"{changed[i]['name']} ({changed[i]['project_id']})",
+                key=f"{key}_project",
+            )
+            change = changed[selected]
+            if change["metadata"]:
+                st.dataframe(records_frame(change["metadata"]), use_container_width=True, hide_index=True)
+            if change["schema"]:
+                st.dataframe(records_frame(change["schema"]), use_container_width=True, hide_index=True)
+
+    if report["routings"]:
+        st.subheader("Routing Rules")
+        routings = pd.DataFrame([
+            {
+                "Rule": change["name"],
+                "Rule ID": change["routing_id"],
+                "Status": change["status"],
+                "Differences": len(change["differences"]),
+            }
+            for change in report["routings"]
+        ])
+        st.dataframe(routings, use_container_width=True, hide_index=True)
+        differences = [record for change in report["routings"] for record in change["differences"]]
+        if differences:
+            with st.expander("Routing rule differences"):
+                st.dataframe(records_frame(differences), use_container_width=True, hide_index=True)
+
+    if not report["projects"] and not report["routings"]:
+        st.success("✅ No drift: all projects and routing rules are unchanged.")
+
+
+# ---------------------------------------------------------------------------
+# Compute drift
+# ---------------------------------------------------------------------------
+
+def _live_snapshot(base: Snapshot):
+    """Refreshes base from the live company and returns the new Snapshot, or None on failure."""
+    client_id = st.session_state.get("drift_client_id", "")
+    client_secret = st.session_state.get("drift_client_secret", "")
+    if not client_id or not client_secret:
+        st.error("Please provide client_id and client_secret.")
+        return None
+    auth = HypatosAPI(client_id, client_secret, st.session_state["drift_base_url"])
+    if not auth.authenticate():
+        st.error(f"❌ Authentication failed\n\n**Error:** {auth.last_error or 'Unknown error occurred'}")
+        return None
+    if not validate_scopes(auth, "Company"):
+        return None
+    company = auth.get_company_info() or {}
+    if base.company.get("id") and company.get("id") and company["id"] != base.company["id"]:
+        st.error("The credentials belong to a different company than the baseline snapshot.")
+        return None
+    if company.get("id"):
+        st.session_state["drift_history_company"] = company
+
+    path = new_snapshot_path()
+    with st.spinner("Fetching what changed since the baseline snapshot..."):
+        manifest = refresh_snapshot(auth, base, path)
+    if manifest is None:
+        remove_snapshot_file(path)
+        st.error("Failed to list the projects or routing rules of the company.")
+        return None
+    # Only the latest live snapshot of the session is kept on disk.
+    previous = st.session_state.pop("drift_live_snapshot", None)
+    if previous is not None:
+        previous.close()
+        remove_snapshot_file(previous.path)
+    st.session_state["drift_live_snapshot"] = Snapshot(path)
+    return st.session_state["drift_live_snapshot"]
+
+
+def _compute_drift_section():
+    st.subheader("Compute Drift")
+    base_api = snapshot_input("Baseline snapshot (e.g. taken at cutover)", "drift_base_snapshot_file")
+    mode = st.radio("Compare against", ["Another snapshot", "Live company"], horizontal=True)
+    current_api = None
+    if mode == "Another snapshot":
+        current_api = snapshot_input("Current snapshot", "drift_current_snapshot_file")
+    else:
+        st.selectbox(
+            "API Region",
+            (BASE_URL_EU, BASE_URL_US),
+            key="drift_base_url",
+            format_func=lambda url: "EU - api.cloud.hypatos.ai" if url == BASE_URL_EU else "US - api.cloud.hypatos.com",
+        )
+        st.text_input("client_id", key="drift_client_id")
+        st.text_input("client_secret", type="password", key="drift_client_secret")
+
+    ready = base_api is not None and (mode == "Live company" or current_api is not None)
+    if st.button("🔍 Compute Drift", type="primary", disabled=not ready):
+        base = base_api.snapshot
+        current = current_api.snapshot if current_api is not None else _live_snapshot(base)
+        if current is not None:
+            if base.created_at and current.created_at and current.created_at < base.created_at:
+                st.warning("The current snapshot is older than the baseline; differences are shown from the baseline's view.")
+            with st.spinner("Comparing changed projects..."):
+                st.session_state["drift_report"] = drift_report_with_history(base, current)
+
+    report = st.session_state.get("drift_report")
+    if report:
+        _render_report(report, "drift_current")
+
+
+# ---------------------------------------------------------------------------
+# History
+# ---------------------------------------------------------------------------
+
+def _history_company():
+    """
+    The company whose history may be shown: the one authenticated on this page. A snapshot
+    file does not prove access to a company, so the history always needs credentials.
+    """
+    company = st.session_state.get("drift_history_company")
+    if company:
+        st.caption(f"📦 {company.get('name') or 'Unknown'} ({company['id']})")
+        return company
+    st.info("Enter the company's credentials to see its stored drift reports.")
+    st.selectbox(
+        "API Region",
+        (BASE_URL_EU, BASE_URL_US),
+        key="drift_history_base_url",
+        format_func=lambda url: "EU - api.cloud.hypatos.ai" if url == BASE_URL_EU else "US - api.cloud.hypatos.com",
+    )
+    client_id = st.text_input("client_id", key="drift_history_client_id")
+    client_secret = st.text_input("client_secret", type="password", key="drift_history_client_secret")
+    if not st.button("Show History", key="drift_history_authenticate"):
+        return None
+    if not client_id or not client_secret:
+        st.error("Please provide client_id and client_secret.")
+        return None
+    auth = HypatosAPI(client_id, client_secret, st.session_state["drift_history_base_url"])
+    if not auth.authenticate():
+        st.error(f"❌ Authentication failed\n\n**Error:** {auth.last_error or 'Unknown error occurred'}")
+        return None
+    company = auth.get_company_info() or {}
+    if not company.get("id"):
+        st.error("Company details could not be fetched. Please verify the credentials have `companies.read`.")
+        return None
+    st.session_state["drift_history_company"] = company
+    return company
+
+
+def _history_section():
+    st.subheader("Drift History")
+    company = _history_company()
+    if company is None:
+        return
+    company_id = company["id"]
+    reports = DRIFT_HISTORY.reports(company_id)
+    if not reports:
+        st.info("No drift reports stored yet for this company.")
+        return
+    overview = pd.DataFrame([
+        {
+            "Baseline": report["base"]["created_at"],
+            "Current": report["current"]["created_at"],
+            "Changed Projects": report["summary"]["projects_changed"],
+            "New Projects": report["summary"]["projects_added"],
+            "Removed Projects": report["summary"]["projects_removed"],
+            "Changed Rules": report["summary"]["routings_changed"],
+            "Computed": report["created_at"],
+        }
+        for report in reports
+    ])
+    st.dataframe(overview, use_container_width=True, hide_index=True)
+    selected = st.selectbox(
+        "Show report",
+        range(len(reports)),
+        format_func=lambda i: f"{reports[i]['base']['created_at']} → {reports[i]['current']['created_at']}",
+    )
+    _render_report(reports[selected], "drift_history")
+
+
+def main():
+    st.title("🔍 Snapshot Drift")
+    st.write(
+        "Shows what changed in a company between two snapshots, or between a snapshot and the "
+        "live company. Projects and rules whose content hash is unchanged are skipped, and every "
+        "report is kept in a local history."
+    )
+    tab_compute, tab_history = st.tabs(["Compute", "History"])
+    with tab_compute:
+        _compute_drift_section()
+    with tab_history:
+        _history_section()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,155 @@
+import pandas as pd
 import streamlit as st
-import requests
 from auth import HypatosAPI
+from cache import prefetch_projects
+from clone_engine import (
+    DEFAULT_CREATE_WORKERS,
+    STATUS_FAILED,
+    STATUS_REUSED,
+    TargetLookup,
+    clone_projects,
+    create_routing_rule,
+    routing_rule_payload,
+)
+from clone_journal import open_clone_journal
+from cutover_plan import STATUS_DONE, build_company_cutover_plan
+from fanout import SourceBundle, authenticate_targets, fan_out_clone, parse_target_credentials
+from fetcher import DEFAULT_FETCH_WORKERS, iter_fetch
 from helpers import (
+    REQUIRED_SCOPES,
     clear_session_state_generic,
     get_source_base_url,
     get_target_base_url,
     input_credentials,
+    project_selector,
     validate_scopes,
 )
 from config import BASE_URL_EU, BASE_URL_US
+from pairing import ProjectNameIndex
+from project_catalog import invalidate_project_catalog, project_catalog
+from routing import routing_graph
+from template_catalog import template_catalog
+from setup_api import SetupAPI
 
 
 st.set_page_config(page_title="Clone Projects", page_icon=":cyclone:")
 
 
-def _project_name_with_affixes(project_name, prefix="", suffix=""):
-    return f"{prefix or ''}{project_name}{suffix or ''}"
+def _clone_journal_panel(source_auth, target_auth, key):
+    """
+    Opens the clone journal of the authenticated company pair and shows what it holds.
+    Returns the CloneJournal, or None if the companies cannot be identified.
+    """
+    journal = open_clone_journal(source_auth, target_auth)
+    if journal is None:
+        st.warning("Could not identify both companies; this run is not journaled and cannot be resumed.")
+        return None
+    with st.expander("Clone journal"):
+        st.caption(
+            "Every project and routing rule created in the target company is recorded here. "
+            "Rerunning a clone reuses what was already created and only redoes the missing steps."
+        )
+        counts = journal.counts()
+        if counts:
+            st.dataframe(
+                pd.DataFrame([
+                    {"Kind": kind, "Status": status, "Count": count}
+                    for (kind, status), count in sorted(counts.items())
+                ]),
+                use_container_width=True,
+                hide_index=True,
+            )
+        else:
+            st.write("The journal is empty.")
+        st.caption(f"Stored in `{journal.path}`.")
+        if st.button("Clear Journal", key=f"{key}_clear_journal"):
+            journal.clear()
+            st.rerun()
+    return journal
+
+
+def _routing_closure_input(source_auth, selected_projects, source_catalog, key):
+    """
+    Optionally extends the selection with every project it routes documents to, so that all
+    routing rules leaving the selected projects can be copied. Returns the projects to clone.
+    """
+    include = st.checkbox(
+        "Include the projects the selection routes documents to", value=False, key=f"{key}_routing_closure",
+    )
+    if not include or not selected_projects:
+        return selected_projects
+    graph = routing_graph(source_auth)
+    if graph is None:
+        st.error("Failed to retrieve the routing rules of the source company.")
+        return selected_projects
+    if graph.unresolved:
+        st.warning(f"{len(graph.unresolved)} routing rule(s) could not be retrieved and are not followed.")
+    selected_ids = {project_id for project_id, _ in selected_projects}
+    closure = graph.closure(selected_ids)
+    added = sorted(
+        (source_catalog.option(project_id) for project_id in closure - selected_ids if project_id in source_catalog),
+        key=lambda option: option[1],
+    )
+    if added:
+        st.info(
+            f"Routing rules add {len(added)} project(s): " + ", ".join(name for _, name in added)
+        )
+    for cycle in graph.cycles(closure):
+        st.warning(
+            "Routing cycle: " + " → ".join(source_catalog.name(project_id) or project_id for project_id in cycle + cycle[:1])
+        )
+    return selected_projects + added
+
+
+def _model_id_input(target_catalog, key):
+    """Selects a target project and returns its extraction model ID, or None."""
+    selected_target_project = project_selector("Select Target Project for Model ID", target_catalog, key)
+    if not selected_target_project:
+        return None
+    selected_model_id = target_catalog.projects[selected_target_project[0]].get("extractionModelId")
+    st.write(f"Selected Model ID: {selected_model_id}")
+    return selected_model_id
+
+
+def _run_project_clone(source_auth, target_auth, selected_projects, model_id, prefix="", suffix="", journal=None,
+                       fetch_source=None, use_cache=False):
+    """
+    Clones the selected projects with the parallel clone pipeline, reporting each project
+    as it finishes. With use_cache, prefetched details and schemas are used.
+    Returns (project_id_map, project_name_map).
+    """
+    project_id_map = {}
+    project_name_map = {}
+    progress_bar = st.progress(0)
+    progress_text = st.empty()
+    for done, result in enumerate(
+        clone_projects(source_auth, target_auth, selected_projects, model_id, prefix, suffix, journal=journal,
+                       fetch_source=fetch_source, use_cache=use_cache),
+        start=1,
+    ):
+        if result["status"] != STATUS_FAILED:
+            project_id_map[result["source_project_id"]] = result["new_project_id"]
+            project_name_map[result["source_project_id"]] = result["source_project_name"]
+            project_name_map[result["new_project_id"]] = result["new_project_name"]
+            if result["status"] == STATUS_REUSED:
+                st.info(f"Project '{result['new_project_name']}' already exists: {result['reason']}")
+            else:
+                st.success(f"Project '{result['new_project_name']}' created successfully!")
+        else:
+            st.error(f"Failed to create project '{result['new_project_name']}': {result['reason']}")
+        progress_text.write(f"Processed {done} of {len(selected_projects)} projects.")
+        progress_bar.progress(done / len(selected_projects))
+    # The target's project list changed; selectors list it again on the next rerun.
+    invalidate_project_catalog(target_auth)
+    return project_id_map, project_name_map
 
 
 # --- Authentication Section (Always at Top) ---
-def authenticate_credentials():
-    """Authenticate both source and target credentials and store them separately."""
+def authenticate_credentials(require_target=True):
+    """
+    Authenticate both source and target credentials and store them separately.
+    With require_target False, missing target credentials are skipped (fan-out clone).
+    """
     source_user = st.session_state.get("sourcecompany_user", "")
     source_pw = st.session_state.get("sourcecompany_apipw", "")
     target_user = st.session_state.get("targetcompany_user", "")
@@ -32,7 +161,7 @@ def authenticate_credentials():
     if not source_user or not source_pw:
         st.error("Please provide Source Company credentials.")
         errors = True
-    if not target_user or not target_pw:
+    if require_target and (not target_user or not target_pw):
         st.error("Please provide Target Company credentials.")
         errors = True
     if errors:
@@ -40,6 +169,7 @@ def authenticate_credentials():
 
     source_auth = HypatosAPI(source_user, source_pw, source_base_url)
     target_auth = HypatosAPI(target_user, target_pw, target_base_url)
+    authenticate_target = bool(target_user and target_pw)
     
     if source_auth.authenticate():
         if validate_scopes(source_auth, "Source Company"):
@@ -59,7 +189,9 @@ def authenticate_credentials():
     else:
         error_msg = source_auth.last_error or "Unknown error occurred"
         st.error(f"❌ Source Authentication failed\n\n**Error:** {error_msg}")
-    
+
+    if not authenticate_target:
+        return
     if target_auth.authenticate():
         if validate_scopes(target_auth, "Target Company"):
             target_company = target_auth.get_company_info()
@@ -89,21 +221,17 @@ def copy_projects_section():
 
     source_auth = st.session_state["source_auth"]
     target_auth = st.session_state["target_auth"]
-    # When creating projects, we use target_auth (target token) for posting.
-    headers = target_auth.get_headers()
-    create_project_url = f"{target_auth.base_url}/projects"
+    journal = _clone_journal_panel(source_auth, target_auth, "copy_projects")
 
     # Retrieve projects from source.
-    data = source_auth.get_projects()
-    projects = data.get("data", [])
-    if not projects:
+    source_catalog = project_catalog(source_auth)
+    if not source_catalog:
         st.error("Failed to retrieve projects from the source company.")
         return
 
     # Retrieve projects from target for model ID selection.
-    target_data = target_auth.get_projects()
-    target_projects = target_data.get("data", [])
-    if not target_projects:
+    target_catalog = project_catalog(target_auth)
+    if not target_catalog:
         st.error("Failed to retrieve projects from the target company.")
         return
 
@@ -120,15 +248,7 @@ def copy_projects_section():
             - Refresh this page and select the project you just created from the dropdown below to get the model ID.
         ''')
 
-    target_project_list = [(proj["id"], proj["name"]) for proj in target_projects]
-    selected_target_project = st.selectbox("Select Target Project for Model ID", target_project_list, format_func=lambda x: x[1])
-    selected_model_id = None
-    if selected_target_project:
-        for proj in target_projects:
-            if proj["id"] == selected_target_project[0]:
-                selected_model_id = proj.get("extractionModelId")
-                st.write(f"Selected Model ID: {selected_model_id}")
-                break
+    selected_model_id = _model_id_input(target_catalog, "copy_projects_model_project")
 
     col_prefix, col_suffix = st.columns(2)
     with col_prefix:
@@ -136,12 +256,15 @@ def copy_projects_section():
     with col_suffix:
         project_name_suffix = st.text_input("Add Suffix", key="copy_projects_name_suffix")
 
-    project_list = [(proj["id"], proj["name"]) for proj in projects]
     st.subheader("Select Projects to Copy")
-    selected_projects = st.multiselect("Projects", project_list, format_func=lambda x: x[1])
+    selected_projects = project_selector("Projects", source_catalog, "copy_projects_selection", multiple=True)
+    selected_projects = _routing_closure_input(source_auth, selected_projects, source_catalog, "copy_projects")
+    # Details and schemas are fetched in the background while the form is completed,
+    # so creating the copies only costs the write calls.
+    prefetch_projects(source_auth, [project_id for project_id, _ in selected_projects])
 
     if st.button("Create Project Copies"):
-        if not selected_target_project or not selected_model_id:
+        if not selected_model_id:
             st.error("Please select a target project for the model ID.")
             return
         if not selected_projects:
@@ -149,41 +272,16 @@ def copy_projects_section():
             return
 
         # Mapping: original project ID -> new project ID
-        project_id_map = {}
-        project_name_map = {}
-        for project_id, project_name in selected_projects:
-            project_details = source_auth.get_project_by_id(project_id)
-            project_schema = source_auth.get_project_schema(project_id)
-            if project_details and project_schema:
-                final_project_name = _project_name_with_affixes(
-                    project_name,
-                    project_name_prefix,
-                    project_name_suffix,
-                )
-
-                new_project_payload = {
-                    "name": final_project_name,
-                    "note": project_details.get("note", ""),
-                    "ocr": project_details.get("ocr", {}),
-                    "extractionModelId": selected_model_id,
-                    "completion": project_details.get("completion", "manual"),
-                    "duplicates": project_details.get("duplicates", "allow"),
-                    "members": {"allow": "all"},
-                    "schema": project_schema,
-                    "retentionDays": project_details.get("retentionDays", 180)
-                }
-                response = requests.post(create_project_url, json=new_project_payload, headers=headers)
-                if response.status_code == 201:
-                    new_project = response.json()
-                    new_project_id = new_project.get("id")
-                    project_id_map[project_id] = new_project_id
-                    project_name_map[project_id] = project_name
-                    project_name_map[new_project_id] = final_project_name
-                    st.success(f"Project '{final_project_name}' created successfully!")
-                else:
-                    st.error(f"Failed to create project '{final_project_name}'. Status code: {response.status_code}")
-            else:
-                st.error(f"Failed to retrieve details for project '{project_name}'.")
+        project_id_map, project_name_map = _run_project_clone(
+            source_auth,
+            target_auth,
+            selected_projects,
+            selected_model_id,
+            project_name_prefix,
+            project_name_suffix,
+            journal,
+            use_cache=True,
+        )
         st.session_state["project_map"] = project_id_map
         st.session_state["project_name_map"] = project_name_map
 
@@ -199,6 +297,7 @@ def copy_projects_section():
                 target_auth,
                 saved_project_map,
                 saved_project_names,
+                journal,
             )
 
 # --- Copy Routing Rules Section ---
@@ -249,10 +348,13 @@ def _display_project_mapping(project_id_map, project_names=None):
         st.write(project_id_map)
 
 
-def copy_routing_rules_with_map(source_auth, target_auth, project_id_map, project_names=None):
+def copy_routing_rules_with_map(source_auth, target_auth, project_id_map, project_names=None, journal=None,
+                                source_rules=None):
     """
     Copy routing rules whose source from/to project IDs are both present in project_id_map.
-    project_id_map maps source project IDs to target project IDs.
+    project_id_map maps source project IDs to target project IDs. With a CloneJournal,
+    rules an earlier run already created are reused instead of created again.
+    source_rules are the source routing rules if already known (e.g. from the template catalog).
     """
     st.subheader("Copying Routing Rules")
     st.info(
@@ -260,13 +362,20 @@ def copy_routing_rules_with_map(source_auth, target_auth, project_id_map, projec
         "and destination projects are included in the project mapping below."
     )
 
-    rule_ids = source_auth.get_all_routing_rule_ids(limit=50)
-    if rule_ids is None:
-        st.error("Failed to retrieve routing rule IDs.")
-        return
+    # One /routings listing provides every rule; no rule is fetched on its own.
+    unresolved = []
+    if source_rules is not None:
+        rules = source_rules
+    else:
+        graph = routing_graph(source_auth, use_cache=False)
+        if graph is None:
+            st.error("Failed to retrieve the routing rules of the source company.")
+            return
+        rules = list(graph.rules.values())
+        unresolved = graph.unresolved
 
-    st.write(f"Found **{len(rule_ids)}** routing rules in the source company.")
-    if not rule_ids:
+    st.write(f"Found **{len(rules) + len(unresolved)}** routing rules in the source company.")
+    if not rules and not unresolved:
         st.info("No routing rules were found in the source company.")
         _display_routing_copy_results({}, 0, 0, [])
         return
@@ -277,25 +386,21 @@ def copy_routing_rules_with_map(source_auth, target_auth, project_id_map, projec
     project_names = project_names or {}
     results = []
 
-    progress_bar = st.progress(0)
-    progress_text = st.empty()
-
-    for index, rid in enumerate(rule_ids, start=1):
-        progress_text.write(f"Checking routing rule {index} of {len(rule_ids)}: `{rid}`")
-        rule_details = source_auth.get_routing_by_id(rid)
-        if rule_details is None:
-            failed += 1
-            results.append({
-                "status": "Failed",
-                "rule_id": rid,
-                "new_rule_id": "",
-                "source_route": "Unknown",
-                "target_route": "",
-                "reason": "Could not retrieve routing rule details from the source company.",
-            })
-            progress_bar.progress(index / len(rule_ids))
-            continue
+    # Listed rules whose details could not be read are reported, not silently dropped.
+    for rid in unresolved:
+        failed += 1
+        results.append({
+            "status": "Failed",
+            "rule_id": rid,
+            "new_rule_id": "",
+            "source_route": "",
+            "target_route": "",
+            "reason": "Could not retrieve routing rule details.",
+        })
 
+    to_copy = []
+    for rule_details in rules:
+        rid = rule_details["id"]
         original_from = rule_details.get("fromProjectId")
         original_to = rule_details.get("toProjectId")
         source_route = (
@@ -318,7 +423,6 @@ def copy_routing_rules_with_map(source_auth, target_auth, project_id_map, projec
                 "target_route": "",
                 "reason": f"Skipped because the mapped selection does not include the {' and '.join(missing_projects)}.",
             })
-            progress_bar.progress(index / len(rule_ids))
             continue
 
         new_from = project_id_map[original_from]
@@ -327,24 +431,39 @@ def copy_routing_rules_with_map(source_auth, target_auth, project_id_map, projec
             f"{_format_project_label(new_from, project_names)} -> "
             f"{_format_project_label(new_to, project_names)}"
         )
-        new_rule_payload = dict(rule_details)
-        new_rule_payload["fromProjectId"] = new_from
-        new_rule_payload["toProjectId"] = new_to
+        to_copy.append((rid, routing_rule_payload(rule_details, new_from, new_to), source_route, target_route))
+
+    # Existing target rules are indexed once, so equivalent rules are skipped without API calls.
+    lookup = TargetLookup(target_auth)
+    with st.spinner("Indexing the routing rules of the target company..."):
+        index = lookup.routing_index()
+    if index is None:
+        # Without the full target listing, existing rules could be created a second time.
+        st.error("Failed to retrieve the routing rules of the target company. No routing rules were copied.")
+        return
+    st.write(f"The target company already has **{len(index)}** routing rules.")
 
-        for field in ["id", "createdAt", "updatedAt"]:
-            new_rule_payload.pop(field, None)
+    progress_bar = st.progress(0)
+    progress_text = st.empty()
+    payloads = {rid: (payload, source_route, target_route) for rid, payload, source_route, target_route in to_copy}
+
+    def _create(rid):
+        return create_routing_rule(target_auth, rid, payloads[rid][0], journal, lookup)
 
-        new_rule = target_auth.create_routing_rule(new_rule_payload)
-        if new_rule:
-            new_rule_id = new_rule.get("id")
+    for index, (rid, outcome) in enumerate(
+        iter_fetch(_create, list(payloads), max_workers=DEFAULT_CREATE_WORKERS), start=1
+    ):
+        _, source_route, target_route = payloads[rid]
+        status, new_rule_id, reason = outcome or (STATUS_FAILED, "", "Target API did not create the routing rule.")
+        if status != STATUS_FAILED:
             copied[rid] = new_rule_id
             results.append({
-                "status": "Copied",
+                "status": "Reused" if status == STATUS_REUSED else "Copied",
                 "rule_id": rid,
                 "new_rule_id": new_rule_id,
                 "source_route": source_route,
                 "target_route": target_route,
-                "reason": "Created in the target company.",
+                "reason": reason,
             })
         else:
             failed += 1
@@ -354,10 +473,10 @@ def copy_routing_rules_with_map(source_auth, target_auth, project_id_map, projec
                 "new_rule_id": "",
                 "source_route": source_route,
                 "target_route": target_route,
-                "reason": "Target API did not create the routing rule.",
+                "reason": reason,
             })
-
-        progress_bar.progress(index / len(rule_ids))
+        progress_text.write(f"Copied routing rule {index} of {len(payloads)}: `{rid}`")
+        progress_bar.progress(index / len(payloads))
 
     progress_text.write("Finished copying routing rules.")
 
@@ -381,6 +500,7 @@ def copy_routing_rules_section():
 
     source_auth = st.session_state["source_auth"]
     target_auth = st.session_state["target_auth"]
+    journal = _clone_journal_panel(source_auth, target_auth, "copy_routings")
 
     saved_project_map = st.session_state.get("project_map", {})
     saved_project_names = st.session_state.get("project_name_map", {})
@@ -397,6 +517,7 @@ def copy_routing_rules_section():
                     target_auth,
                     saved_project_map,
                     saved_project_names,
+                    journal,
                 )
                 return
         with col_clear:
@@ -406,44 +527,34 @@ def copy_routing_rules_section():
                 st.rerun()
 
         with st.expander("Map existing projects manually instead"):
-            _manual_copy_routing_rules_section(source_auth, target_auth)
+            _manual_copy_routing_rules_section(source_auth, target_auth, journal)
         return
 
-    _manual_copy_routing_rules_section(source_auth, target_auth)
+    _manual_copy_routing_rules_section(source_auth, target_auth, journal)
 
 
-def _manual_copy_routing_rules_section(source_auth, target_auth):
+def _manual_copy_routing_rules_section(source_auth, target_auth, journal):
     st.subheader("Manual Project Mapping")
 
-    source_data = source_auth.get_projects()
-    target_data = target_auth.get_projects()
-    if not source_data:
+    source_catalog = project_catalog(source_auth)
+    target_catalog = project_catalog(target_auth)
+    if source_catalog is None:
         st.error("Failed to retrieve source projects.")
         return
-    if not target_data:
+    if target_catalog is None:
         st.error("Failed to retrieve target projects.")
         return
 
-    source_projects = source_data.get("data", [])
-    target_projects = target_data.get("data", [])
-    if not source_projects:
+    if not len(source_catalog):
         st.info("No source projects found.")
         return
-    if not target_projects:
+    if not len(target_catalog):
         st.info("No target projects found.")
         return
 
-    source_project_list = [(proj["id"], proj["name"]) for proj in source_projects]
-    target_project_list = [(proj["id"], proj["name"]) for proj in target_projects]
-    target_options = [None] + target_project_list
-    target_by_name = {proj["name"]: (proj["id"], proj["name"]) for proj in target_projects}
+    target_index = ProjectNameIndex(target_catalog.projects.values())
 
-    selected_sources = st.multiselect(
-        "Source Projects",
-        source_project_list,
-        format_func=lambda x: x[1],
-        key="routing_source_projects",
-    )
+    selected_sources = project_selector("Source Projects", source_catalog, "routing_source_projects", multiple=True)
 
     if not selected_sources:
         st.info("Select the source projects that participate in the routing rules you want to copy.")
@@ -455,14 +566,14 @@ def _manual_copy_routing_rules_section(source_auth, target_auth):
     mapping_complete = True
 
     for source_id, source_name in selected_sources:
-        default_target = target_by_name.get(source_name)
-        default_index = target_options.index(default_target) if default_target in target_options else 0
-        selected_target = st.selectbox(
+        found = target_index.match(source_name)
+        default_target = (found[0]["id"], found[0]["name"]) if found else None
+        selected_target = project_selector(
             f"Target project for '{source_name}'",
-            target_options,
-            index=default_index,
-            format_func=lambda x: "Select a target project" if x is None else x[1],
-            key=f"routing_target_for_{source_id}",
+            target_catalog,
+            f"routing_target_for_{source_id}",
+            default=default_target,
+            none_label="Select a target project",
         )
         if selected_target:
             project_id_map[source_id] = selected_target[0]
@@ -478,7 +589,7 @@ def _manual_copy_routing_rules_section(source_auth, target_auth):
         if not mapping_complete or not project_id_map:
             st.error("Please map every selected source project to a target project.")
             return
-        copy_routing_rules_with_map(source_auth, target_auth, project_id_map, project_names)
+        copy_routing_rules_with_map(source_auth, target_auth, project_id_map, project_names, journal)
 
 # --- Clone from Template Company Section ---
 ALLOWED_CLIENT_ID = "Lh8CbOZDvxLegwX21aLAjenUCbesYRia"
@@ -498,24 +609,34 @@ def clone_by_project_setup_section():
 
     source_auth = st.session_state["source_auth"]
     target_auth = st.session_state["target_auth"]
-
-    # Retrieve source projects.
-    data = source_auth.get_projects()
-    if not data:
+    journal = _clone_journal_panel(source_auth, target_auth, "setup_clone")
+
+    # Template projects come from the catalog shared by all sessions; it is only refreshed
+    # when it is older than a few minutes, and then only changed projects are fetched.
+    catalog = template_catalog(source_auth)
+    with st.spinner("Loading the template catalog..."):
+        loaded = catalog.ensure_fresh(source_auth)
+    if not loaded and not len(catalog):
         st.error("Failed to retrieve projects from the source company.")
         return
-    projects = data.get("data", [])
-    if not projects:
+    if not len(catalog):
         st.error("No projects found in the source company.")
         return
+    col_info, col_refresh = st.columns([3, 1])
+    with col_info:
+        st.caption(f"Template catalog version {catalog.version}, {len(catalog)} projects, checked {catalog.refreshed_at}.")
+    with col_refresh:
+        if st.button("Refresh Catalog", key="setup_refresh_catalog"):
+            with st.spinner("Refreshing the template catalog..."):
+                catalog.refresh(source_auth)
+            st.rerun()
 
     # Retrieve target projects for model ID selection.
-    target_data = target_auth.get_projects()
-    if not target_data:
+    target_catalog = project_catalog(target_auth)
+    if target_catalog is None:
         st.error("Failed to retrieve projects from the target company.")
         return
-    target_projects = target_data.get("data", [])
-    if not target_projects:
+    if not len(target_catalog):
         st.error("No projects found in the target company.")
         return
 
@@ -533,20 +654,7 @@ def clone_by_project_setup_section():
             Then refresh the page and select that project to get the model ID.
         ''')
 
-    target_project_list = [(proj["id"], proj["name"]) for proj in target_projects]
-    selected_target_project = st.selectbox(
-        "Select Target Project for Model ID",
-        target_project_list,
-        format_func=lambda x: x[1],
-        key="setup_model_id_project",
-    )
-    selected_model_id = None
-    if selected_target_project:
-        for proj in target_projects:
-            if proj["id"] == selected_target_project[0]:
-                selected_model_id = proj.get("extractionModelId")
-                st.write(f"Selected Model ID: {selected_model_id}")
-                break
+    selected_model_id = _model_id_input(target_catalog, "setup_model_id_project")
 
     col_prefix, col_suffix = st.columns(2)
     with col_prefix:
@@ -568,8 +676,8 @@ def clone_by_project_setup_section():
 
     tag = "[A]" if setup == "Setup A" else "[B]"
 
-    # Find projects matching the selected setup tag.
-    selected_projects = [(proj["id"], proj["name"]) for proj in projects if tag in proj["name"]]
+    # Projects with the selected setup tag, from the catalog's tag index.
+    selected_projects = catalog.projects_with_tag(tag)
 
     st.subheader(f"Projects to Copy ({len(selected_projects)})")
     if selected_projects:
@@ -579,59 +687,23 @@ def clone_by_project_setup_section():
         st.info(f"No projects found matching tag `{tag}`.")
 
     if st.button("Create Project Copies", key="setup_create_copies"):
-        if not selected_target_project or not selected_model_id:
+        if not selected_model_id:
             st.error("Please select a target project for the model ID.")
             return
         if not selected_projects:
             st.error("Please select at least one project to copy.")
             return
 
-        headers = target_auth.get_headers()
-        create_project_url = f"{target_auth.base_url}/projects"
-        project_id_map = {}
-
-        for project_id, project_name in selected_projects:
-            project_details = source_auth.get_project_by_id(project_id)
-            project_schema = source_auth.get_project_schema(project_id)
-            if project_details and project_schema:
-                final_project_name = _project_name_with_affixes(
-                    project_name,
-                    setup_name_prefix,
-                    setup_name_suffix,
-                )
-                new_project_payload = {
-                    "name": final_project_name,
-                    "note": project_details.get("note", ""),
-                    "ocr": project_details.get("ocr", {}),
-                    "extractionModelId": selected_model_id,
-                    "completion": project_details.get("completion", "manual"),
-                    "duplicates": project_details.get("duplicates", "allow"),
-                    "members": {"allow": "all"},
-                    "schema": project_schema,
-                    "retentionDays": project_details.get("retentionDays", 180),
-                }
-                response = requests.post(create_project_url, json=new_project_payload, headers=headers)
-                if response.status_code == 201:
-                    new_project = response.json()
-                    new_project_id = new_project.get("id")
-                    project_id_map[project_id] = new_project_id
-                    st.success(f"Project '{final_project_name}' created successfully!")
-                else:
-                    st.error(f"Failed to create project '{final_project_name}'. Status code: {response.status_code}")
-            else:
-                st.error(f"Failed to retrieve details for project '{project_name}'.")
-
-        project_name_map = {}
-        for orig_id, new_id in project_id_map.items():
-            for proj_id, proj_name in selected_projects:
-                if proj_id == orig_id:
-                    project_name_map[orig_id] = proj_name
-                    project_name_map[new_id] = _project_name_with_affixes(
-                        proj_name,
-                        setup_name_prefix,
-                        setup_name_suffix,
-                    )
-                    break
+        project_id_map, project_name_map = _run_project_clone(
+            source_auth,
+            target_auth,
+            selected_projects,
+            selected_model_id,
+            setup_name_prefix,
+            setup_name_suffix,
+            journal,
+            fetch_source=catalog.source,
+        )
 
         st.session_state["project_map"] = project_id_map
         st.session_state["project_name_map"] = project_name_map
@@ -649,8 +721,249 @@ def clone_by_project_setup_section():
                 target_auth_local,
                 project_id_map,
                 project_name_map,
+                journal,
+                source_rules=catalog.routing_rules,
+            )
+
+
+# ---------- Run Cutover Plan Section ----------
+
+def cutover_plan_section():
+    st.title("Run Cutover Plan")
+    st.write(
+        "Migrates projects, their configuration, routing rules and agent workflows in one run. "
+        "Every step starts as soon as the steps it depends on are done: a routing rule is created "
+        "as soon as its two projects exist, while other projects are still being copied."
+    )
+
+    if "source_auth" not in st.session_state or "target_auth" not in st.session_state:
+        st.error("Both source and target authentication must be completed.")
+        return
+
+    source_auth = st.session_state["source_auth"]
+    target_auth = st.session_state["target_auth"]
+    journal = _clone_journal_panel(source_auth, target_auth, "cutover")
+
+    source_catalog = project_catalog(source_auth)
+    if not source_catalog:
+        st.error("Failed to retrieve projects from the source company.")
+        return
+    target_catalog = project_catalog(target_auth)
+    if not target_catalog:
+        st.error("Failed to retrieve projects from the target company.")
+        return
+
+    st.subheader("New Project Details")
+    selected_model_id = _model_id_input(target_catalog, "cutover_model_id_project")
+
+    col_prefix, col_suffix = st.columns(2)
+    with col_prefix:
+        name_prefix = st.text_input("Add Prefix", key="cutover_name_prefix")
+    with col_suffix:
+        name_suffix = st.text_input("Add Suffix", key="cutover_name_suffix")
+
+    st.subheader("Scope")
+    if st.checkbox("All source projects", value=True, key="cutover_all_projects"):
+        selected_projects = source_catalog.options()
+    else:
+        selected_projects = project_selector("Projects", source_catalog, "cutover_projects", multiple=True)
+        selected_projects = _routing_closure_input(source_auth, selected_projects, source_catalog, "cutover")
+    copy_config = st.checkbox("Copy project configuration (completion, duplicates, retention, isLive)",
+                              value=True, key="cutover_copy_config")
+    copy_routings = st.checkbox("Copy routing rules between the selected projects", value=True,
+                                key="cutover_copy_routings")
+
+    setup_token = st.text_input(
+        "Setup API access_token (optional, for agent workflows)", type="password", key="cutover_setup_token",
+    )
+    setup_api = SetupAPI(setup_token.strip()) if setup_token.strip() else None
+    workflow_ids = []
+    source_company = source_auth.get_company_info() or {}
+    target_company = target_auth.get_company_info() or {}
+    if setup_api is not None:
+        settings = setup_api.get_prompting_settings(source_company.get("id"))
+        if settings is None:
+            st.error(f"Failed to load workflows. {setup_api.last_error or ''}")
+        else:
+            workflows = settings if isinstance(settings, list) else settings.get("data", [])
+            workflow_names = {w["id"]: w.get("name", "Unnamed") for w in workflows if w.get("id")}
+            workflow_ids = st.multiselect(
+                "Workflows to copy",
+                list(workflow_names),
+                format_func=lambda wid: f"{workflow_names[wid]} ({wid})",
+                key="cutover_workflows",
             )
 
+    max_workers = st.number_input("Parallel steps", min_value=1, max_value=32, value=DEFAULT_FETCH_WORKERS,
+                                  step=1, key="cutover_max_workers")
+
+    if st.button("Run Cutover Plan", type="primary", key="cutover_run"):
+        if not selected_model_id:
+            st.error("Please select a target project for the model ID.")
+            return
+        if not selected_projects:
+            st.error("Please select at least one project to copy.")
+            return
+
+        routing_rules = []
+        if copy_routings:
+            with st.spinner("Loading source routing rules..."):
+                graph = routing_graph(source_auth)
+            if graph is None:
+                st.error("Failed to retrieve the routing rules of the source company.")
+                return
+            if graph.unresolved:
+                st.warning(
+                    f"{len(graph.unresolved)} routing rule(s) could not be retrieved and are not copied: "
+                    + ", ".join(graph.unresolved)
+                )
+            routing_rules = list(graph.rules.values())
+        plan, state, left_out = build_company_cutover_plan(
+            source_auth,
+            target_auth,
+            selected_projects,
+            selected_model_id,
+            name_prefix,
+            name_suffix,
+            copy_config=copy_config,
+            routing_rules=routing_rules,
+            setup_api=setup_api,
+            workflow_ids=workflow_ids,
+            target_company_id=target_company.get("id"),
+            max_workers=int(max_workers),
+            journal=journal,
+        )
+        if left_out:
+            st.info(f"{len(left_out)} routing rule(s) connect projects outside the selection and are not copied.")
+
+        progress_bar = st.progress(0)
+        table = st.empty()
+        rows = []
+        for result in plan.run(max_workers=int(max_workers)):
+            rows.append(result)
+            progress_bar.progress(len(rows) / len(plan))
+            table.dataframe(
+                pd.DataFrame(rows, columns=["label", "status", "detail"]),
+                use_container_width=True,
+                hide_index=True,
+            )
+
+        invalidate_project_catalog(target_auth)
+        st.session_state["project_map"] = state.project_id_map
+        st.session_state["project_name_map"] = state.project_name_map
+        st.session_state["cutover_results"] = rows
+        failed = sum(1 for row in rows if row["status"] != STATUS_DONE)
+        if failed:
+            st.warning(f"Cutover finished: {len(rows) - failed} of {len(rows)} steps done, {failed} failed or skipped.")
+        else:
+            st.success(f"Cutover finished: all {len(rows)} steps done.")
+
+
+# ---------- Fan-out Clone Section ----------
+
+def fan_out_clone_section():
+    st.title("Fan-out Clone")
+    st.write(
+        "Clones the selected projects and the routing rules between them into many target companies at once. "
+        "The source company is read once; every target then runs in parallel and on its own, "
+        "so a failing target does not stop the others."
+    )
+    if "source_auth" not in st.session_state:
+        st.error("Source authentication must be completed in the top section.")
+        return
+
+    source_auth = st.session_state["source_auth"]
+    source_catalog = project_catalog(source_auth)
+    if not source_catalog:
+        st.error("Failed to retrieve projects from the source company.")
+        return
+
+    st.subheader("Target Companies")
+    targets_text = st.text_area(
+        "One target per line: client_id,client_secret[,EU|US]",
+        key="fanout_targets",
+        help="Targets without a region use the Target API Region selected above.",
+    )
+    model_project_name = st.text_input(
+        "Model project name",
+        key="fanout_model_project",
+        help="New projects get the extraction model of the target project with this name. "
+             "Targets without such a project are skipped.",
+    )
+    col_prefix, col_suffix = st.columns(2)
+    with col_prefix:
+        name_prefix = st.text_input("Add Prefix", key="fanout_name_prefix")
+    with col_suffix:
+        name_suffix = st.text_input("Add Suffix", key="fanout_name_suffix")
+
+    st.subheader("Select Projects to Copy")
+    selected_projects = project_selector("Projects", source_catalog, "fanout_projects", multiple=True)
+    selected_projects = _routing_closure_input(source_auth, selected_projects, source_catalog, "fanout")
+
+    if st.button("Clone into all Targets", type="primary", key="fanout_run"):
+        try:
+            credentials = parse_target_credentials(targets_text, get_target_base_url())
+        except ValueError as err:
+            st.error(str(err))
+            return
+        if not credentials:
+            st.error("Please enter at least one target company.")
+            return
+        if not model_project_name.strip():
+            st.error("Please enter the name of a target project whose extraction model the copies get.")
+            return
+        if not selected_projects:
+            st.error("Please select at least one project to copy.")
+            return
+
+        with st.spinner(f"Authenticating {len(credentials)} target companies..."):
+            targets = authenticate_targets(credentials, REQUIRED_SCOPES)
+        for target in targets:
+            if target["error"]:
+                st.error(f"❌ Target {target['client_id']}: {target['error']}")
+        ready = [target for target in targets if target["auth"] is not None]
+        if not ready:
+            return
+
+        progress_bar = st.progress(0)
+        progress_text = st.empty()
+
+        def update_progress(done, total):
+            progress_bar.progress(done / total)
+            progress_text.text(f"Reading source projects: {done}/{total}")
+
+        bundle = SourceBundle.load(source_auth, selected_projects, progress_callback=update_progress)
+        if bundle is None:
+            st.error("Failed to retrieve the routing rules of the source company.")
+            return
+        if bundle.unresolved_routings:
+            st.warning(
+                f"{len(bundle.unresolved_routings)} routing rule(s) could not be read from the source company "
+                "and are not copied."
+            )
+        if bundle.failed:
+            st.warning(f"{len(bundle.failed)} project(s) could not be read from the source company and are skipped.")
+        if not bundle.projects:
+            st.error("None of the selected projects could be read from the source company.")
+            return
+
+        progress_bar.progress(0)
+        progress_text.text(f"Cloning into {len(ready)} target companies...")
+        table = st.empty()
+        rows = []
+        for summary in fan_out_clone(bundle, ready, model_project_name.strip(), name_prefix, name_suffix):
+            rows.append({key: value for key, value in summary.items() if key != "project_id_map"})
+            progress_bar.progress(len(rows) / len(ready))
+            progress_text.text(f"Targets finished: {len(rows)}/{len(ready)}")
+            table.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+        done = sum(1 for row in rows if row["status"] == "Done")
+        if done == len(rows):
+            st.success(f"Fan-out clone finished: all {len(rows)} target companies done.")
+        else:
+            st.warning(f"Fan-out clone finished: {done} of {len(rows)} target companies done, "
+                       f"{len(rows) - done} failed or partial. Rerun to retry; finished objects are reused.")
+
 
 # ---------- Get Model ID Section ----------
 
@@ -661,28 +974,18 @@ def get_model_id_section():
         return
 
     target_auth = st.session_state["target_auth"]
-    # Retrieve projects with limit=200 from target.
-    projects_url = f"{target_auth.base_url}/projects"
-    headers = target_auth.get_headers()
-    query = {"limit": "200"}
-    response = requests.get(projects_url, headers=headers, params=query)
-    if response.status_code != 200:
-        st.error(f"Failed to retrieve projects from target company. Status code: {response.status_code}")
+    # All target projects, paged through by get_projects (a single request would stop at its limit).
+    catalog = project_catalog(target_auth)
+    if catalog is None:
+        st.error("Failed to retrieve projects from target company.")
         return
-    data = response.json()
-    projects = data.get("data", [])
-    if not projects:
+    if not len(catalog):
         st.info("No projects found for target company.")
         return
 
-    project_list = [(proj["id"], proj["name"]) for proj in projects]
-    selected_project = st.selectbox("Select Project", project_list, format_func=lambda x: x[1])
-    if st.button("Get Model ID"):
-        # Find the project details from the list by matching the project ID.
-        for proj in projects:
-            if proj["id"] == selected_project[0]:
-                st.write("Extraction Model ID:", proj.get("extractionModelId"))
-                break
+    selected_project = project_selector("Select Project", catalog, "model_id_project")
+    if st.button("Get Model ID") and selected_project:
+        st.write("Extraction Model ID:", catalog.projects[selected_project[0]].get("extractionModelId"))
 
 # --- Credentials helper for Clone from Template Company Setup (source from secrets) ---
 
@@ -712,7 +1015,8 @@ def _input_target_credentials_only():
 def main():
     st.sidebar.title("Navigation")
     page = st.sidebar.radio("Select Action",
-                            ["Clone from Template Company Setup", "Copy Projects", "Copy Routing Rules", "Get Model ID", "Clear Session State"])
+                            ["Clone from Template Company Setup", "Copy Projects", "Copy Routing Rules", "Run Cutover Plan",
+                             "Fan-out Clone", "Get Model ID", "Clear Session State"])
 
     # Credentials input: source is pre-loaded from secrets for "Clone from Template Company Setup".
     if page == "Clone from Template Company Setup":
@@ -722,7 +1026,7 @@ def main():
     else:
         input_credentials()
     if st.button("Authenticate Credentials"):
-        authenticate_credentials()
+        authenticate_credentials(require_target=page != "Fan-out Clone")
 
     if page == "Copy Projects":
         copy_projects_section()
@@ -730,6 +1034,10 @@ def main():
         clone_by_project_setup_section()
     elif page == "Copy Routing Rules":
         copy_routing_rules_section()
+    elif page == "Run Cutover Plan":
+        cutover_plan_section()
+    elif page == "Fan-out Clone":
+        fan_out_clone_section()
     elif page == "Get Model ID":
         get_model_id_section()
     elif page == "Clear Session State":
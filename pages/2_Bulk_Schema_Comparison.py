@@ -1,10 +1,25 @@
 import streamlit as st
 import pandas as pd
-from deepdiff import DeepDiff
-import json
+import os
+import shutil
+import tempfile
 from io import BytesIO
 from auth import HypatosAPI
-from helpers import get_datapoints_dict, get_metadata, validate_scopes
+from comparison import DEFAULT_FETCH_WORKERS, compare_pairs
+from diff_records import record_row
+from helpers import snapshot_input, validate_scopes
+from pairing import pair_projects
+from results_explorer import (
+    PAGE_SIZES,
+    STATUS_DIFFERENCES,
+    STATUS_ERROR,
+    STATUS_IDENTICAL,
+    STATUSES,
+    ResultsExplorer,
+    page_count,
+    result_status,
+)
+from table_io import EXPORT_FORMATS, TABLE_FILE_TYPES, load_table, open_row_writer
 
 st.set_page_config(page_title="Bulk Schema Comparison", layout="wide")
 
@@ -24,27 +39,9 @@ if 'comparison_results' not in st.session_state:
 # Helper function to load Excel with preserved formatting
 def load_excel_table(uploaded_file: BytesIO) -> pd.DataFrame:
     """
-    Reads Excel strictly as strings to preserve leading zeros and Excel's leading apostrophe.
+    Reads Excel, CSV or Parquet strictly as strings to preserve leading zeros and Excel's leading apostrophe.
     """
-    df = pd.read_excel(
-        uploaded_file,
-        dtype=str,
-        keep_default_na=False,
-        engine="openpyxl"
-    )
-    # Normalize headers
-    df.columns = [str(c).strip() for c in df.columns]
-    
-    def _normalize(val):
-        if val is None:
-            return ""
-        s = str(val).strip()
-        # Remove Excel's leading apostrophe for numbers like '00001
-        if s.startswith("'") and len(s) > 1 and s[1:].replace(".", "").replace("-", "").isdigit():
-            return s[1:]
-        return s
-    
-    return df.applymap(_normalize)
+    return load_table(uploaded_file)
 
 def create_template_excel(sample_data: list) -> bytes:
     """Create an Excel template with sample data."""
@@ -54,6 +51,68 @@ def create_template_excel(sample_data: list) -> bytes:
         df.to_excel(xw, index=False, sheet_name="Project Pairs")
     return bio.getvalue()
 
+# Columns of the summary export
+SUMMARY_COLUMNS = [
+    'Pair', 'Source Project Name', 'Source Project ID', 'Target Project Name', 'Target Project ID',
+    'Status', 'Number of Differences', 'Error Message'
+]
+
+# Columns of the difference rows export
+DIFFERENCE_COLUMNS = [
+    'Pair', 'Source Project ID', 'Target Project ID',
+    'Data Point', 'Attribute', 'Path', 'Kind', 'Source Value', 'Target Value'
+]
+
+def summary_row(pair_number: int, result: dict) -> dict:
+    """Summary export row of one comparison result."""
+    return {
+        'Pair': pair_number,
+        'Source Project Name': result['source_project_name'],
+        'Source Project ID': result['source_project_id'],
+        'Target Project Name': result['target_project_name'],
+        'Target Project ID': result['target_project_id'],
+        'Status': result_status(result),
+        'Number of Differences': 0 if result['error'] else len(result['differences']),
+        'Error Message': result['error'] if result['error'] else ''
+    }
+
+def open_result_exports() -> dict:
+    """
+    Opens the streaming export files of a comparison run in a new temporary directory.
+    Returns a dict with the directory and the summary (Excel), detailed (NDJSON) and
+    differences (Parquet) writers.
+    """
+    export_dir = tempfile.mkdtemp(prefix="bulk_comparison_")
+    return {
+        'dir': export_dir,
+        'summary': open_row_writer("xlsx", os.path.join(export_dir, "schema_comparison_summary.xlsx"),
+                                   SUMMARY_COLUMNS, sheet_name="Summary"),
+        'detailed': open_row_writer("ndjson", os.path.join(export_dir, "schema_comparison_detailed.ndjson")),
+        'differences': open_row_writer("parquet", os.path.join(export_dir, "schema_comparison_differences.parquet"),
+                                       DIFFERENCE_COLUMNS, types={'Pair': int}),
+    }
+
+def write_result_exports(exports: dict, pair_number: int, result: dict, comparison_type: str):
+    """Appends one comparison result to every export file as soon as it is produced."""
+    exports['summary'].write_row(summary_row(pair_number, result))
+    rows = [record_row(record) for record in result['differences'] or []]
+    exports['detailed'].write_row({'pair': pair_number, 'comparison_type': comparison_type, **result, 'differences': rows})
+    for row in rows:
+        exports['differences'].write_row({
+            'Pair': pair_number,
+            'Source Project ID': result['source_project_id'],
+            'Target Project ID': result['target_project_id'],
+            **row
+        })
+
+def close_result_exports(exports: dict) -> dict:
+    """Closes the export writers and returns the paths of the finished files by key."""
+    paths = {}
+    for key in ('summary', 'detailed', 'differences'):
+        exports[key].close()
+        paths[key] = exports[key].path
+    return paths
+
 # Authentication Section
 st.header("🔐 Authentication")
 
@@ -127,235 +186,257 @@ if st.button("🔑 Authenticate Credentials", type="primary"):
         st.error(f"❌ Authentication failed: {str(e)}")
         st.session_state.authenticated = False
 
+with st.expander("📦 Use company snapshots instead of the live API"):
+    st.write("Snapshots are created on the **Company Snapshots** page. Comparisons against a snapshot make no API calls.")
+    snap_col1, snap_col2 = st.columns(2)
+    with snap_col1:
+        source_snapshot = snapshot_input("Source snapshot", "bulk_source_snapshot_file")
+    with snap_col2:
+        target_snapshot = snapshot_input("Target snapshot", "bulk_target_snapshot_file")
+    if st.button("Use Snapshots", disabled=not (source_snapshot or target_snapshot)):
+        if source_snapshot:
+            st.session_state.source_api = source_snapshot
+        if target_snapshot:
+            st.session_state.target_api = target_snapshot
+        # Either side may still come from the live credentials above
+        st.session_state.authenticated = (
+            st.session_state.source_api is not None and st.session_state.target_api is not None
+        )
+        if st.session_state.authenticated:
+            st.success("✅ Snapshots loaded!")
+        else:
+            st.info("Snapshot loaded. Authenticate or load a snapshot for the other side as well.")
+
 st.markdown("---")
 
-def compare_datapoints_detailed(source_flat, target_flat):
+def match_pairs_by_name():
     """
-    Compares flattened datapoints in detail, checking multiple attributes.
-    Returns a list of differences.
+    Pairs every source project with the target project of the same name.
+    Returns a DataFrame with Source/Target Project ID columns, or None if no pairs are available yet.
     """
-    differences = []
-    all_keys = set(source_flat.keys()).union(set(target_flat.keys()))
-    attributes = ["internalName", "displayName", "type", "rules", "normalization", "derivation", "source"]
+    st.info("Each source project is paired with the target project that has the same name.")
+    col_fuzzy, col_prefix, col_suffix = st.columns(3)
+    with col_fuzzy:
+        fuzzy = st.checkbox(
+            "Allow fuzzy matches",
+            help="Also pairs names that only share most of their words. Exact and "
+                 "case/punctuation-insensitive matches are always used."
+        )
+    with col_prefix:
+        target_prefix = st.text_input("Target name prefix", help="Prefix added to the target names when cloning")
+    with col_suffix:
+        target_suffix = st.text_input("Target name suffix", help="Suffix added to the target names when cloning")
     
-    for key in all_keys:
-        if key not in target_flat:
-            differences.append({
-                "Data Point": key,
-                "Attribute": "Entire datapoint",
-                "Difference": "Missing in target"
-            })
-        elif key not in source_flat:
-            differences.append({
-                "Data Point": key,
-                "Attribute": "Entire datapoint",
-                "Difference": "Extra in target"
-            })
-        else:
-            src_dp = source_flat[key]
-            tgt_dp = target_flat[key]
-            for attr in attributes:
-                src_val = src_dp.get(attr)
-                tgt_val = tgt_dp.get(attr)
-                diff = DeepDiff(src_val, tgt_val, ignore_order=True, verbose_level=2)
-                if diff:
-                    differences.append({
-                        "Data Point": key,
-                        "Attribute": attr,
-                        "Difference": str(diff)
-                    })
-    return differences
-
-def compare_metadata_detailed(source_meta, target_meta):
-    """
-    Compares metadata dictionaries field by field.
-    Returns a list of differences.
-    """
-    differences = []
-    for field in source_meta:
-        src_val = source_meta[field]
-        tgt_val = target_meta.get(field)
-        if src_val != tgt_val:
-            differences.append({
-                "Field": field,
-                "Source Value": str(src_val),
-                "Target Value": str(tgt_val)
-            })
-    return differences
+    if st.button("🔗 Match Projects by Name"):
+        with st.spinner("Fetching projects..."):
+            source_data = st.session_state.source_api.get_projects()
+            target_data = st.session_state.target_api.get_projects()
+        if not source_data or not target_data:
+            st.error("❌ Failed to retrieve the project lists")
+            return None
+        st.session_state.name_matched_pairs = pair_projects(
+            source_data.get("data", []),
+            target_data.get("data", []),
+            fuzzy=fuzzy,
+            target_prefix=target_prefix,
+            target_suffix=target_suffix
+        )
+    
+    matched = st.session_state.get("name_matched_pairs")
+    if matched is None:
+        return None
+    pairs, unmatched = matched
+    if unmatched:
+        st.warning(f"⚠️ {len(unmatched)} source project(s) have no matching target project")
+        with st.expander("Unmatched source projects"):
+            for _, name in unmatched:
+                st.write(f"- {name}")
+    ambiguous = [p for p in pairs if p['ambiguous']]
+    if ambiguous:
+        st.warning(f"⚠️ {len(ambiguous)} source project(s) matched several target projects; the first match is used")
+    if not pairs:
+        st.error("❌ No project pairs could be matched by name")
+        return None
+    return pd.DataFrame([
+        {
+            'Source Project ID': p['source_id'],
+            'Target Project ID': p['target_id'],
+            'Source Project': p['source_name'],
+            'Target Project': p['target_name'],
+            'Match': p['match'],
+        }
+        for p in pairs
+    ])
 
 # File Upload and Comparison Section
 if st.session_state.authenticated:
-    st.header("📁 Upload Project Pairs")
+    st.header("📁 Project Pairs")
     
-    # Template Download Section
-    st.subheader("📥 Download Template")
-    st.info("Download the template file, fill in your project pairs, then upload it below.")
-    
-    # Sample data for template
-    sample_data = [
-        {"Source Project ID": "project-123-example", "Target Project ID": "project-456-example"},
-        {"Source Project ID": "project-789-example", "Target Project ID": "project-012-example"},
-        {"Source Project ID": "project-345-example", "Target Project ID": "project-678-example"}
-    ]
-    
-    template_excel = create_template_excel(sample_data)
-    st.download_button(
-        label="📄 Download Template",
-        data=template_excel,
-        file_name="project_pairs_template.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        help="Template with example project IDs"
+    pair_source = st.radio(
+        "How should the project pairs be provided?",
+        ["Upload Excel file", "Match by project name"],
+        horizontal=True
     )
+    df_display = None
     
-    st.markdown("---")
-    
-    # File Upload Section
-    st.subheader("📤 Upload Your File")
-    
-    st.info("""
-    **File Format Requirements:**
-    - Upload an Excel file (.xlsx or .xls)
-    - **Column 1:** Source Project IDs
-    - **Column 2:** Target Project IDs
-    - Each row represents one comparison pair
-    - Leading zeros in project IDs will be preserved automatically
-    """)
-    
-    uploaded_file = st.file_uploader(
-        "Choose an Excel file", 
-        type=['xlsx', 'xls'],
-        help="Upload an Excel file with Source and Target project IDs in two columns"
-    )
-    
-    if uploaded_file is not None:
-        try:
-            # Read the Excel file with proper formatting preservation
-            df = load_excel_table(uploaded_file)
-            
-            # Display the uploaded data
-            st.subheader("📋 Uploaded Project Pairs")
-            
-            # Ensure we have at least 2 columns
-            if df.shape[1] < 2:
-                st.error("❌ File must have at least 2 columns (Source and Target project IDs)")
-            else:
-                # Use first two columns regardless of their names
-                df_display = df.iloc[:, :2].copy()
-                df_display.columns = ['Source Project ID', 'Target Project ID']
+    if pair_source == "Upload Excel file":
+        # Template Download Section
+        st.subheader("📥 Download Template")
+        st.info("Download the template file, fill in your project pairs, then upload it below.")
+        
+        # Sample data for template
+        sample_data = [
+            {"Source Project ID": "project-123-example", "Target Project ID": "project-456-example"},
+            {"Source Project ID": "project-789-example", "Target Project ID": "project-012-example"},
+            {"Source Project ID": "project-345-example", "Target Project ID": "project-678-example"}
+        ]
+        
+        template_excel = create_template_excel(sample_data)
+        st.download_button(
+            label="📄 Download Template",
+            data=template_excel,
+            file_name="project_pairs_template.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            help="Template with example project IDs"
+        )
+        
+        st.markdown("---")
+        
+        # File Upload Section
+        st.subheader("📤 Upload Your File")
+        
+        st.info("""
+        **File Format Requirements:**
+        - Upload an Excel, CSV or Parquet file (.xlsx, .xls, .csv or .parquet)
+        - **Column 1:** Source Project IDs
+        - **Column 2:** Target Project IDs
+        - Each row represents one comparison pair
+        - Leading zeros in project IDs will be preserved automatically
+        """)
+        
+        uploaded_file = st.file_uploader(
+            "Choose an Excel, CSV or Parquet file", 
+            type=TABLE_FILE_TYPES,
+            help="Upload an Excel file with Source and Target project IDs in two columns"
+        )
+        
+        if uploaded_file is not None:
+            try:
+                # Read the Excel file with proper formatting preservation
+                df = load_excel_table(uploaded_file)
                 
-                # Remove any rows with missing values
-                df_display = df_display.dropna()
-                df_display = df_display[
-                    (df_display['Source Project ID'] != '') & 
-                    (df_display['Target Project ID'] != '')
-                ]
+                # Display the uploaded data
+                st.subheader("📋 Uploaded Project Pairs")
                 
-                if len(df_display) == 0:
-                    st.error("❌ No valid project pairs found in the file")
+                # Ensure we have at least 2 columns
+                if df.shape[1] < 2:
+                    st.error("❌ File must have at least 2 columns (Source and Target project IDs)")
                 else:
-                    st.dataframe(df_display, use_container_width=True)
-                    st.caption(f"Total pairs to compare: {len(df_display)}")
+                    # Use first two columns regardless of their names
+                    df_display = df.iloc[:, :2].copy()
+                    df_display.columns = ['Source Project ID', 'Target Project ID']
                     
-                    # Comparison type selection
-                    comparison_type = st.radio(
-                        "Select Comparison Type:",
-                        ["Data Points", "Metadata"],
-                        horizontal=True
-                    )
+                    # Remove any rows with missing values
+                    df_display = df_display.dropna()
+                    df_display = df_display[
+                        (df_display['Source Project ID'] != '') & 
+                        (df_display['Target Project ID'] != '')
+                    ]
                     
-                    # Compare button
-                    if st.button("🔍 Compare All Pairs", type="primary"):
-                        results = []
-                        progress_bar = st.progress(0)
-                        status_text = st.empty()
-                        
-                        total_pairs = len(df_display)
-                        
-                        for idx, row in df_display.iterrows():
-                            source_project_id = str(row['Source Project ID']).strip()
-                            target_project_id = str(row['Target Project ID']).strip()
-                            
-                            status_text.text(f"Comparing pair {idx + 1}/{total_pairs}: {source_project_id} → {target_project_id}")
-                            
-                            # Initialize project names
-                            source_project_name = source_project_id
-                            target_project_name = target_project_id
-                            
-                            try:
-                                # Fetch project names
-                                try:
-                                    source_project_details = st.session_state.source_api.get_project_by_id(source_project_id)
-                                    if source_project_details:
-                                        source_project_name = source_project_details.get('name', source_project_id)
-                                except:
-                                    pass  # Keep ID as name if fetch fails
-                                
-                                try:
-                                    target_project_details = st.session_state.target_api.get_project_by_id(target_project_id)
-                                    if target_project_details:
-                                        target_project_name = target_project_details.get('name', target_project_id)
-                                except:
-                                    pass  # Keep ID as name if fetch fails
-                                
-                                if comparison_type == "Data Points":
-                                    # Get flattened datapoints for both projects
-                                    source_datapoints = get_datapoints_dict(
-                                        st.session_state.source_api, 
-                                        source_project_id
-                                    )
-                                    target_datapoints = get_datapoints_dict(
-                                        st.session_state.target_api, 
-                                        target_project_id
-                                    )
-                                    
-                                    # Detailed comparison
-                                    differences = compare_datapoints_detailed(source_datapoints, target_datapoints)
-                                    
-                                else:  # Metadata
-                                    # Get metadata for both projects
-                                    source_metadata = get_metadata(
-                                        st.session_state.source_api, 
-                                        source_project_id
-                                    )
-                                    target_metadata = get_metadata(
-                                        st.session_state.target_api, 
-                                        target_project_id
-                                    )
-                                    
-                                    # Detailed comparison
-                                    differences = compare_metadata_detailed(source_metadata, target_metadata)
-                                
-                                results.append({
-                                    'source_project_id': source_project_id,
-                                    'source_project_name': source_project_name,
-                                    'target_project_id': target_project_id,
-                                    'target_project_name': target_project_name,
-                                    'has_differences': len(differences) > 0,
-                                    'differences': differences,
-                                    'error': None
-                                })
-                                
-                            except Exception as e:
-                                results.append({
-                                    'source_project_id': source_project_id,
-                                    'source_project_name': source_project_name,
-                                    'target_project_id': target_project_id,
-                                    'target_project_name': target_project_name,
-                                    'has_differences': None,
-                                    'differences': [],
-                                    'error': str(e)
-                                })
-                            
-                            progress_bar.progress((idx + 1) / total_pairs)
-                        
-                        status_text.text("✅ Comparison complete!")
-                        st.session_state.comparison_results = {
-                            'results': results,
-                            'comparison_type': comparison_type
-                        }
+                    if len(df_display) == 0:
+                        st.error("❌ No valid project pairs found in the file")
+                        df_display = None
+            
+            except Exception as e:
+                st.error(f"❌ Error reading file: {str(e)}")
+    else:
+        df_display = match_pairs_by_name()
+    
+    if df_display is not None:
+        st.dataframe(df_display, use_container_width=True)
+        st.caption(f"Total pairs to compare: {len(df_display)}")
+        
+        # Comparison type selection
+        comparison_type = st.radio(
+            "Select Comparison Type:",
+            ["Data Points", "Metadata"],
+            horizontal=True
+        )
+        
+        # Concurrency and cache settings
+        col_workers, col_processes, col_cache = st.columns(3)
+        with col_workers:
+            max_workers = st.number_input(
+                "Parallel API requests",
+                min_value=1,
+                max_value=32,
+                value=DEFAULT_FETCH_WORKERS,
+                help="Number of project pairs fetched at the same time"
+            )
+        with col_processes:
+            use_processes = st.checkbox(
+                "Diff in separate processes",
+                value=False,
+                help="Runs the diffing on all CPU cores. Useful for very large schemas."
+            )
+        with col_cache:
+            use_cache = st.checkbox(
+                "Reuse cached results",
+                value=True,
+                help="Reuses recently fetched schemas and earlier diffs of identical schema contents. "
+                     "Untick to fetch everything from the API again."
+            )
         
-        except Exception as e:
-            st.error(f"❌ Error reading file: {str(e)}")
+        # Compare button
+        if st.button("🔍 Compare All Pairs", type="primary"):
+            total_pairs = len(df_display)
+            results = [None] * total_pairs
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+            
+            pairs = [
+                (str(row['Source Project ID']).strip(), str(row['Target Project ID']).strip())
+                for _, row in df_display.iterrows()
+            ]
+            
+            # Drop the files of the previous run before writing new ones
+            previous = st.session_state.comparison_results
+            if previous and previous.get('export_dir'):
+                shutil.rmtree(previous['export_dir'], ignore_errors=True)
+            exports = open_result_exports()
+            
+            try:
+                completed = 0
+                for idx, result in compare_pairs(
+                    st.session_state.source_api,
+                    st.session_state.target_api,
+                    pairs,
+                    comparison_type,
+                    max_workers=int(max_workers),
+                    diff_processes=(os.cpu_count() or 1) if use_processes else 0,
+                    use_cache=use_cache
+                ):
+                    # Keep results in upload order, report progress in completion order
+                    results[idx] = result
+                    write_result_exports(exports, idx + 1, result, comparison_type)
+                    completed += 1
+                    status_text.text(
+                        f"Compared pair {completed}/{total_pairs}: "
+                        f"{result['source_project_id']} → {result['target_project_id']}"
+                    )
+                    progress_bar.progress(completed / total_pairs)
+            finally:
+                # Always finish the files, so an interrupted run leaves no open writers
+                export_paths = close_result_exports(exports)
+            
+            status_text.text("✅ Comparison complete!")
+            st.session_state.comparison_results = {
+                'results': results,
+                'explorer': ResultsExplorer(results),
+                'comparison_type': comparison_type,
+                'export_dir': exports['dir'],
+                'export_paths': export_paths
+            }
 
     st.markdown("---")
     
@@ -363,112 +444,92 @@ if st.session_state.authenticated:
     if st.session_state.comparison_results is not None:
         st.header("📊 Comparison Results")
         
-        results = st.session_state.comparison_results['results']
         comparison_type = st.session_state.comparison_results['comparison_type']
+        explorer = st.session_state.comparison_results['explorer']
         
         # Summary statistics
         col1, col2, col3 = st.columns(3)
         
-        total = len(results)
-        successful = len([r for r in results if r['error'] is None])
-        with_differences = len([r for r in results if r['has_differences'] == True])
-        identical = len([r for r in results if r['has_differences'] == False])
+        counts = explorer.status_counts()
+        total = len(explorer)
         
         col1.metric("Total Comparisons", total)
-        col2.metric("With Differences", with_differences)
-        col3.metric("Identical", identical)
+        col2.metric("With Differences", counts[STATUS_DIFFERENCES])
+        col3.metric("Identical", counts[STATUS_IDENTICAL])
         
-        if successful < total:
-            st.warning(f"⚠️ {total - successful} comparison(s) failed")
+        if counts[STATUS_ERROR]:
+            st.warning(f"⚠️ {counts[STATUS_ERROR]} comparison(s) failed")
         
         st.markdown("---")
         
-        # Detailed results for each pair
-        for idx, result in enumerate(results):
-            status_icon = "✅" if result['has_differences'] == False else "⚠️" if result['error'] is None else "❌"
-            status_text = "Identical" if result['has_differences'] == False else "Differences Found" if result['error'] is None else "Error"
-            
-            # Create display title with project names
-            source_display = f"{result['source_project_name']}" if result['source_project_name'] != result['source_project_id'] else result['source_project_id']
-            target_display = f"{result['target_project_name']}" if result['target_project_name'] != result['target_project_id'] else result['target_project_id']
-            
-            with st.expander(
-                f"**Pair {idx + 1}:** {source_display} → {target_display} ({status_text} {status_icon})",
-                expanded=(result['has_differences'] == True)
-            ):
-                if result['error']:
-                    st.error(f"Error during comparison: {result['error']}")
-                else:
-                    # Display project info in a nice format
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.markdown("**Source Project**")
-                        st.markdown(f"**Name:** {result['source_project_name']}")
-                        st.markdown(f"**ID:** `{result['source_project_id']}`")
-                    with col2:
-                        st.markdown("**Target Project**")
-                        st.markdown(f"**Name:** {result['target_project_name']}")
-                        st.markdown(f"**ID:** `{result['target_project_id']}`")
-                    
-                    if not result['has_differences']:
-                        st.success(f"✅ The {comparison_type.lower()} are identical!")
-                    else:
-                        st.warning(f"⚠️ {len(result['differences'])} difference(s) found in {comparison_type.lower()}")
-                        
-                        # Display differences in a table
-                        if result['differences']:
-                            diff_df = pd.DataFrame(result['differences'])
-                            st.dataframe(diff_df, use_container_width=True)
+        # Filters are applied to the indexed results; only the visible page is rendered
+        filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
+        with filter_col1:
+            status_filter = st.multiselect("Status", STATUSES, key="results_status_filter")
+        with filter_col2:
+            attribute_label = "Field" if comparison_type == "Metadata" else "Attribute"
+            attribute_filter = st.multiselect(attribute_label, explorer.attributes, key="results_attribute_filter")
+        with filter_col3:
+            datapoint_query = st.text_input(
+                "Data Point contains",
+                key="results_datapoint_filter",
+                disabled=comparison_type == "Metadata"
+            ).strip()
+        with filter_col4:
+            pair_filter = st.number_input(
+                "Pair (0 = all)", min_value=0, max_value=total, value=0, step=1, key="results_pair_filter"
+            )
         
-        # Export results option
-        st.markdown("---")
-        st.subheader("💾 Export Results")
+        view_col, size_col, page_col = st.columns(3)
+        with view_col:
+            view = st.radio("Show", ["Pairs", "Differences"], horizontal=True, key="results_view")
+        with size_col:
+            page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key="results_page_size")
         
-        # Create summary dataframe
-        summary_data = []
-        for result in results:
-            summary_data.append({
-                'Source Project Name': result['source_project_name'],
-                'Source Project ID': result['source_project_id'],
-                'Target Project Name': result['target_project_name'],
-                'Target Project ID': result['target_project_id'],
-                'Status': 'Error' if result['error'] else ('Identical' if not result['has_differences'] else 'Differences Found'),
-                'Number of Differences': 0 if result['error'] else len(result['differences']),
-                'Error Message': result['error'] if result['error'] else ''
-            })
+        if view == "Pairs":
+            mask = explorer.pair_mask(status_filter, attribute_filter, datapoint_query, int(pair_filter))
+        else:
+            mask = explorer.difference_mask(status_filter, attribute_filter, datapoint_query, int(pair_filter))
+        matching = int(mask.sum())
+        pages = page_count(matching, page_size)
+        # Filters can shrink the result, keep the page widget within range
+        if st.session_state.get("results_page", 1) > pages:
+            st.session_state["results_page"] = pages
+        with page_col:
+            page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key="results_page")
         
-        summary_df = pd.DataFrame(summary_data)
+        st.caption(f"{matching} matching {view.lower()} · page {page} of {pages}")
+        if view == "Pairs":
+            st.dataframe(explorer.pairs_page(mask, page, page_size), use_container_width=True, hide_index=True)
+        else:
+            st.dataframe(explorer.differences_page(mask, page, page_size), use_container_width=True, hide_index=True)
         
-        col1, col2 = st.columns(2)
+        # Export results option
+        st.markdown("---")
+        st.subheader("💾 Export Results")
         
-        with col1:
-            # Export summary as Excel
-            summary_excel = create_template_excel(summary_data)
-            st.download_button(
-                label="📥 Download Summary (Excel)",
-                data=summary_excel,
-                file_name="schema_comparison_summary.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+        # The export files were written while the comparison ran
+        export_paths = st.session_state.comparison_results['export_paths']
+        downloads = [
+            ('summary', "📥 Download Summary (Excel)", 'xlsx'),
+            ('detailed', "📥 Download Detailed Results (NDJSON)", 'ndjson'),
+            ('differences', "📥 Download Difference Rows (Parquet)", 'parquet'),
+        ]
         
-        with col2:
-            # Create detailed JSON export
-            detailed_export = {
-                'comparison_type': comparison_type,
-                'total_comparisons': total,
-                'successful_comparisons': successful,
-                'with_differences': with_differences,
-                'identical': identical,
-                'results': results
-            }
-            
-            json_str = json.dumps(detailed_export, indent=2, default=str)
-            st.download_button(
-                label="📥 Download Detailed Results (JSON)",
-                data=json_str,
-                file_name="schema_comparison_detailed.json",
-                mime="application/json"
-            )
+        for col, (key, label, export_format) in zip(st.columns(len(downloads)), downloads):
+            with col:
+                path = export_paths[key]
+                if not os.path.exists(path):
+                    st.warning("Export file is no longer available. Please run the comparison again.")
+                    continue
+                with open(path, 'rb') as f:
+                    st.download_button(
+                        label=label,
+                        data=f,
+                        file_name=os.path.basename(path),
+                        mime=EXPORT_FORMATS[export_format][1],
+                        key=f"download_{key}"
+                    )
 
 else:
     st.info("👆 Please authenticate with both source and target company credentials to continue.")
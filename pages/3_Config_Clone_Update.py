@@ -1,12 +1,22 @@
 import streamlit as st
 from auth import HypatosAPI
+from cache import (
+    PREFETCH_MAX_AGE_SECONDS,
+    cached_project_details,
+    cached_project_schema,
+    invalidate_project_responses,
+    prefetch_projects,
+)
 from helpers import (
     clear_session_state_generic,
     get_source_base_url,
     get_target_base_url,
     input_credentials,
+    project_selector,
     validate_scopes,
 )
+from pairing import pair_projects
+from project_catalog import project_catalog
 
 
 st.set_page_config(page_title="Config Clone & Update", page_icon=":gear:")
@@ -105,29 +115,22 @@ def update_config_section():
     # Use the first auth to build the project list for selection.
     # When "Both Companies", we show source projects (assuming matching projects exist in both).
     primary_label, primary_auth = auth_targets[0]
-    data = primary_auth.get_projects()
-    if not data:
+    catalog = project_catalog(primary_auth)
+    if catalog is None:
         st.error(f"Failed to retrieve projects from {primary_label} Company.")
         return
-    projects = data.get("data", [])
-    if not projects:
+    if not len(catalog):
         st.info(f"No projects found in {primary_label} Company.")
         return
 
-    project_list = [(proj["id"], proj["name"]) for proj in projects]
-    selected_projects = st.multiselect(
-        "Select Projects to Update",
-        project_list,
-        format_func=lambda x: x[1],
-        key="update_config_projects",
-    )
+    selected_projects = project_selector("Select Projects to Update", catalog, "update_config_projects", multiple=True)
 
     if not selected_projects:
         st.info("Please select at least one project.")
         return
 
     # Show current config of the first selected project as reference.
-    first_details = primary_auth.get_project_by_id(selected_projects[0][0])
+    first_details = cached_project_details(primary_auth, selected_projects[0][0], max_age=PREFETCH_MAX_AGE_SECONDS)
     if first_details:
         st.subheader(f"Current Configuration (from '{selected_projects[0][1]}')")
         col1, col2 = st.columns(2)
@@ -177,6 +180,7 @@ def update_config_section():
         for project_id, project_name in selected_projects:
             for label, auth in auth_targets:
                 result = auth.update_project(project_id, payload)
+                invalidate_project_responses(auth, project_id)
                 if result:
                     st.success(f"[{label}] Project '{project_name}' updated successfully!")
                 else:
@@ -199,45 +203,31 @@ def clone_config_section():
     target_auth = st.session_state["target_auth"]
 
     # Source projects
-    source_data = source_auth.get_projects()
-    if not source_data:
+    source_catalog = project_catalog(source_auth)
+    if source_catalog is None:
         st.error("Failed to retrieve source projects.")
         return
-    source_projects = source_data.get("data", [])
-    if not source_projects:
+    if not len(source_catalog):
         st.info("No source projects found.")
         return
 
     # Target projects
-    target_data = target_auth.get_projects()
-    if not target_data:
+    target_catalog = project_catalog(target_auth)
+    if target_catalog is None:
         st.error("Failed to retrieve target projects.")
         return
-    target_projects = target_data.get("data", [])
-    if not target_projects:
+    if not len(target_catalog):
         st.info("No target projects found.")
         return
 
     col_src, col_tgt = st.columns(2)
     with col_src:
-        source_list = [(p["id"], p["name"]) for p in source_projects]
-        selected_source = st.selectbox(
-            "Source Project",
-            source_list,
-            format_func=lambda x: x[1],
-            key="clone_config_source",
-        )
+        selected_source = project_selector("Source Project", source_catalog, "clone_config_source")
     with col_tgt:
-        target_list = [(p["id"], p["name"]) for p in target_projects]
-        selected_target = st.selectbox(
-            "Target Project",
-            target_list,
-            format_func=lambda x: x[1],
-            key="clone_config_target",
-        )
+        selected_target = project_selector("Target Project", target_catalog, "clone_config_target")
 
     if selected_source:
-        source_details = source_auth.get_project_by_id(selected_source[0])
+        source_details = cached_project_details(source_auth, selected_source[0], max_age=PREFETCH_MAX_AGE_SECONDS)
         if source_details:
             st.subheader("Source Project Configuration")
             st.json({
@@ -252,7 +242,7 @@ def clone_config_section():
             st.error("Please select both source and target projects.")
             return
 
-        source_details = source_auth.get_project_by_id(selected_source[0])
+        source_details = cached_project_details(source_auth, selected_source[0], max_age=PREFETCH_MAX_AGE_SECONDS)
         if not source_details:
             st.error("Failed to retrieve source project details.")
             return
@@ -265,6 +255,7 @@ def clone_config_section():
         }
 
         result = target_auth.update_project(selected_target[0], payload)
+        invalidate_project_responses(target_auth, selected_target[0])
         if result:
             st.success(
                 f"Configuration cloned from '{selected_source[1]}' to '{selected_target[1]}' successfully!"
@@ -291,45 +282,31 @@ def clone_schema_section():
     target_auth = st.session_state["target_auth"]
 
     # Source projects
-    source_data = source_auth.get_projects()
-    if not source_data:
+    source_catalog = project_catalog(source_auth)
+    if source_catalog is None:
         st.error("Failed to retrieve source projects.")
         return
-    source_projects = source_data.get("data", [])
-    if not source_projects:
+    if not len(source_catalog):
         st.info("No source projects found.")
         return
 
     # Target projects
-    target_data = target_auth.get_projects()
-    if not target_data:
+    target_catalog = project_catalog(target_auth)
+    if target_catalog is None:
         st.error("Failed to retrieve target projects.")
         return
-    target_projects = target_data.get("data", [])
-    if not target_projects:
+    if not len(target_catalog):
         st.info("No target projects found.")
         return
 
     col_src, col_tgt = st.columns(2)
     with col_src:
-        source_list = [(p["id"], p["name"]) for p in source_projects]
-        selected_source = st.selectbox(
-            "Source Project",
-            source_list,
-            format_func=lambda x: x[1],
-            key="clone_schema_source",
-        )
+        selected_source = project_selector("Source Project", source_catalog, "clone_schema_source")
     with col_tgt:
-        target_list = [(p["id"], p["name"]) for p in target_projects]
-        selected_targets = st.multiselect(
-            "Target Project(s)",
-            target_list,
-            format_func=lambda x: x[1],
-            key="clone_schema_target",
-        )
+        selected_targets = project_selector("Target Project(s)", target_catalog, "clone_schema_target", multiple=True)
 
     if selected_source:
-        source_schema = source_auth.get_project_schema(selected_source[0])
+        source_schema, _ = cached_project_schema(source_auth, selected_source[0], max_age=PREFETCH_MAX_AGE_SECONDS)
         if source_schema:
             datapoints = source_schema.get("dataPoints", [])
             st.subheader("Source Schema Preview")
@@ -342,7 +319,7 @@ def clone_schema_section():
             st.error("Please select a source project and at least one target project.")
             return
 
-        source_schema = source_auth.get_project_schema(selected_source[0])
+        source_schema, _ = cached_project_schema(source_auth, selected_source[0], max_age=PREFETCH_MAX_AGE_SECONDS)
         if not source_schema:
             st.error("Failed to retrieve source project schema.")
             return
@@ -353,6 +330,7 @@ def clone_schema_section():
 
         for target_id, target_name in selected_targets:
             result = target_auth.update_project(target_id, payload)
+            invalidate_project_responses(target_auth, target_id)
             if result:
                 st.success(f"Schema cloned from '{selected_source[1]}' to '{target_name}' successfully!")
                 success_count += 1
@@ -381,28 +359,30 @@ def clone_schema_to_target_section():
     target_auth = st.session_state["target_auth"]
 
     # Source projects
-    source_data = source_auth.get_projects()
-    if not source_data:
+    source_catalog = project_catalog(source_auth)
+    if source_catalog is None:
         st.error("Failed to retrieve source projects.")
         return
-    source_projects = source_data.get("data", [])
-    if not source_projects:
+    if not len(source_catalog):
         st.info("No source projects found.")
         return
 
-    source_list = [(p["id"], p["name"]) for p in source_projects]
-    selected_sources = st.multiselect(
-        "Select Source Projects",
-        source_list,
-        format_func=lambda x: x[1],
-        key="clone_schema_target_sources",
+    selected_sources = project_selector(
+        "Select Source Projects", source_catalog, "clone_schema_target_sources", multiple=True,
     )
 
     if not selected_sources:
         st.info("Please select at least one source project.")
         return
+    # Schemas and details are fetched in the background while the options are set,
+    # so cloning only costs the target calls.
+    prefetch_projects(source_auth, [source_id for source_id, _ in selected_sources])
 
     st.write(f"**{len(selected_sources)}** project(s) selected.")
+    match_normalized = st.checkbox(
+        "Also match names that differ only in case, spacing or punctuation",
+        key="clone_schema_target_match_normalized",
+    )
 
     # --- Configuration clone options ---
     st.subheader("Configuration Options")
@@ -413,7 +393,7 @@ def clone_schema_to_target_section():
     )
 
     # Pre-fill from the first selected source project.
-    first_source_details = source_auth.get_project_by_id(selected_sources[0][0])
+    first_source_details = cached_project_details(source_auth, selected_sources[0][0], max_age=PREFETCH_MAX_AGE_SECONDS)
     default_completion = first_source_details.get("completion", "manual") if first_source_details else "manual"
     default_duplicates = first_source_details.get("duplicates", "allow") if first_source_details else "allow"
     default_retention = first_source_details.get("retentionDays", 180) if first_source_details else 180
@@ -449,29 +429,28 @@ def clone_schema_to_target_section():
         )
 
     if st.button("Clone Schema to Target"):
-        # Fetch target projects and build a name -> project lookup.
-        target_data = target_auth.get_projects()
-        if not target_data:
+        # Pair the selected sources with the target projects by name in one pass.
+        target_catalog = project_catalog(target_auth)
+        if target_catalog is None:
             st.error("Failed to retrieve target projects.")
             return
-        target_projects = target_data.get("data", [])
-        target_by_name = {}
-        for p in target_projects:
-            target_by_name[p["name"]] = p
+        pairs, unmatched = pair_projects(
+            [{"id": source_id, "name": source_name} for source_id, source_name in selected_sources],
+            list(target_catalog.projects.values()),
+            normalized=match_normalized,
+        )
 
         matched = 0
-        skipped = 0
+        skipped = len(unmatched)
         failed = 0
 
-        for source_id, source_name in selected_sources:
-            target_project = target_by_name.get(source_name)
-            if not target_project:
-                st.warning(f"No matching project found in target company for '{source_name}'. Skipped.")
-                skipped += 1
-                continue
+        for _, source_name in unmatched:
+            st.warning(f"No matching project found in target company for '{source_name}'. Skipped.")
 
-            target_id = target_project["id"]
-            source_schema = source_auth.get_project_schema(source_id)
+        for pair in pairs:
+            source_id, source_name = pair["source_id"], pair["source_name"]
+            target_id, target_name = pair["target_id"], pair["target_name"]
+            source_schema, _ = cached_project_schema(source_auth, source_id, max_age=PREFETCH_MAX_AGE_SECONDS)
             if not source_schema:
                 st.error(f"Failed to retrieve schema from source project '{source_name}'.")
                 failed += 1
@@ -481,7 +460,7 @@ def clone_schema_to_target_section():
 
             # Build config payload.
             if config_mode == "Clone as-is from source":
-                source_details = source_auth.get_project_by_id(source_id)
+                source_details = cached_project_details(source_auth, source_id, max_age=PREFETCH_MAX_AGE_SECONDS)
                 if source_details:
                     payload["completion"] = source_details.get("completion", "manual")
                     payload["duplicates"] = source_details.get("duplicates", "allow")
@@ -494,11 +473,12 @@ def clone_schema_to_target_section():
                 payload["isLive"] = default_is_live
 
             result = target_auth.update_project(target_id, payload)
+            invalidate_project_responses(target_auth, target_id)
             if result:
-                st.success(f"Schema & config cloned: '{source_name}' (source) -> '{source_name}' (target, ID: {target_id})")
+                st.success(f"Schema & config cloned: '{source_name}' (source) -> '{target_name}' (target, ID: {target_id})")
                 matched += 1
             else:
-                st.error(f"Failed to update target project '{source_name}' (ID: {target_id}).")
+                st.error(f"Failed to update target project '{target_name}' (ID: {target_id}).")
                 failed += 1
 
         st.subheader("Summary")
@@ -1,6 +1,6 @@
-import re
 import streamlit as st
 import pandas as pd
+from agent_workflow import retarget_agent
 from auth import HypatosAPI
 from setup_api import SetupAPI
 from helpers import check_admin_access
@@ -225,73 +225,12 @@ if "caw_agents_done" not in st.session_state:
             st.error(f"No agents found or fetch failed. {setup_api.last_error or ''}")
         else:
             agent_ids = [a.get("id") for a in agents_list if a.get("id")]
-            pattern = re.compile(r'_[a-fA-F0-9]{24}')
             results = []
             progress_bar = st.progress(0)
             total = len(agent_ids)
 
             for i, agent_id in enumerate(agent_ids):
-                # Fetch all versions; latest is the first element
-                versions = setup_api.get_agent_by_id(agent_id)
-                if not versions:
-                    results.append({
-                        "agent": agent_id,
-                        "id": agent_id,
-                        "version": "-",
-                        "replacements": "",
-                        "status": f"FAILED: could not fetch versions. {setup_api.last_error or ''}",
-                    })
-                    progress_bar.progress((i + 1) / total)
-                    continue
-
-                agent = versions[0]
-                prompt = agent.get("prompt") or ""
-
-                matches = pattern.findall(prompt)
-                unique = set(matches)
-                replacements_label = (
-                    ", ".join(f"{m} → _{target_company_id}" for m in sorted(unique))
-                    if matches else "none"
-                )
-
-                new_prompt = pattern.sub(f"_{target_company_id}", prompt)
-
-                version_str = str(agent.get("version", "1.0"))
-                try:
-                    new_version = str(int(float(version_str)) + 1)
-                except (ValueError, TypeError):
-                    new_version = "2"
-
-                # Strip only server-managed timestamps; id and companyId must be included
-                read_only_fields = {"createdAt", "updatedAt"}
-                payload = {
-                    k: v for k, v in agent.items() if k not in read_only_fields
-                }
-                payload["prompt"] = new_prompt
-                payload["version"] = new_version
-
-                update_result = setup_api.update_agent(agent_id, payload)
-                if update_result is not None:
-                    results.append({
-                        "agent": agent.get("name", agent_id),
-                        "id": agent_id,
-                        "sent_version": new_version,
-                        "replacements": replacements_label,
-                        "status": "OK",
-                        "payload": payload,
-                        "api_response": update_result,
-                    })
-                else:
-                    results.append({
-                        "agent": agent.get("name", agent_id),
-                        "id": agent_id,
-                        "sent_version": new_version,
-                        "replacements": replacements_label,
-                        "status": f"FAILED: {setup_api.last_error or 'unknown error'}",
-                        "payload": payload,
-                        "api_response": None,
-                    })
-
+                results.append(retarget_agent(setup_api, agent_id, target_company_id))
                 progress_bar.progress((i + 1) / total)
 
             st.session_state["caw_agents_done"] = True
@@ -311,7 +250,10 @@ for r in update_results:
     label = f"{icon} **{r['agent']}** — version sent: `{r['sent_version']}` — replacements: {r['replacements']} — {r['status']}"
     with st.expander(label, expanded=r["status"] != "OK"):
         st.write("**Payload sent:**")
-        st.json(r["payload"])
+        if r["payload"] is not None:
+            st.json(r["payload"])
+        else:
+            st.write("_(not sent)_")
         st.write("**API response:**")
         if r["api_response"] is not None:
             st.json(r["api_response"])
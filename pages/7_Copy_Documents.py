@@ -1,4 +1,7 @@
 import io
+import os
+import shutil
+import tempfile
 import time
 import unicodedata
 import urllib.parse
@@ -14,6 +17,14 @@ from helpers import (
     input_credentials,
     validate_scopes,
 )
+from table_io import (
+    EXPORT_FORMATS,
+    TABLE_FILE_TYPES,
+    NdjsonRowWriter,
+    iter_ndjson_rows,
+    open_row_writer,
+    read_id_column,
+)
 
 st.set_page_config(page_title="Copy Documents", page_icon=":card_index:")
 
@@ -92,9 +103,14 @@ def _safe_filename(name: str) -> str:
 
 
 def _parse_doc_ids(excel_file) -> list:
-    df = pd.read_excel(excel_file, header=None, dtype=str)
-    values = df.iloc[:, 0].dropna().str.strip().tolist()
-    return [v for v in values if len(v) >= 20 and " " not in v]
+    values = read_id_column(excel_file)
+    valid = (values.str.len() >= 20) & ~values.str.contains(" ", regex=False)
+    return values[valid].tolist()
+
+
+_LOG_COLUMNS = [
+    "Source Doc ID", "Copied", "Target Doc ID", "External Data Set", "Status", "Failed Step", "Notes",
+]
 
 
 def _empty_log_entry(source_doc_id: str) -> dict:
@@ -270,28 +286,87 @@ def _copy_one_document(source_doc_id: str, source_auth, target_auth, target_proj
 # Log helpers
 # ---------------------------------------------------------------------------
 
+# Append-only run journal: a document retried later gets another row.
+_LOG_FILE = "copy_documents_journal.ndjson"
+
+
+def _log_dir() -> str:
+    export_dir = st.session_state.get("copy_docs_export_dir")
+    if not export_dir or not os.path.isdir(export_dir):
+        export_dir = tempfile.mkdtemp(prefix="copy_documents_")
+        st.session_state["copy_docs_export_dir"] = export_dir
+    return export_dir
+
+
+def _log_entry(entry: dict):
+    """Adds an entry to the session log and appends it to the log file on disk right away."""
+    st.session_state.setdefault("copy_docs_log", []).append(entry)
+    _append_log_row(entry)
+
+
+def _append_log_row(entry: dict):
+    with NdjsonRowWriter(os.path.join(_log_dir(), _LOG_FILE), _LOG_COLUMNS, append=True) as writer:
+        writer.write_row(entry)
+    st.session_state["copy_docs_log_rows"] = st.session_state.get("copy_docs_log_rows", 0) + 1
+
+
 def _update_log_entry(source_doc_id: str, updates: dict):
-    """Find the log entry for source_doc_id and apply updates in place."""
+    """
+    Find the log entry for source_doc_id and apply updates in place. The updated entry is
+    appended to the journal file; exports keep only the last row of each document.
+    """
     log = st.session_state.get("copy_docs_log", [])
     for entry in log:
         if entry["Source Doc ID"] == source_doc_id:
             entry.update(updates)
+            _append_log_row(entry)
             break
     st.session_state["copy_docs_log"] = log
 
 
+def _log_export(export_format: str) -> str:
+    """
+    The log in export_format, with one row per document like the on-screen log. It is
+    converted from the journal file by streaming, and only again after new rows were logged.
+    """
+    export_dir = _log_dir()
+    log_path = os.path.join(export_dir, _LOG_FILE)
+    if not os.path.exists(log_path):
+        # The temp directory was removed meanwhile; write the session log out again.
+        with NdjsonRowWriter(log_path, _LOG_COLUMNS) as writer:
+            writer.write_rows(st.session_state.get("copy_docs_log", []))
+        st.session_state.pop("copy_docs_log_exported", None)
+    path = os.path.join(export_dir, f"copy_documents_log.{export_format}")
+    rows = st.session_state.get("copy_docs_log_rows", 0)
+    exported = st.session_state.setdefault("copy_docs_log_exported", {})
+    if exported.get(export_format) != rows or not os.path.exists(path):
+        with open_row_writer(export_format, path, _LOG_COLUMNS, sheet_name="Run Log",
+                             types={"Copied": bool, "External Data Set": bool}) as writer:
+            writer.write_rows(iter_ndjson_rows(log_path, key="Source Doc ID"))
+        exported[export_format] = rows
+    return path
+
+
+def _clear_log():
+    export_dir = st.session_state.pop("copy_docs_export_dir", None)
+    if export_dir:
+        shutil.rmtree(export_dir, ignore_errors=True)
+    st.session_state["copy_docs_log"] = []
+    st.session_state.pop("copy_docs_log_rows", None)
+    st.session_state.pop("copy_docs_log_exported", None)
+
+
 def _render_log():
     log = st.session_state.get("copy_docs_log", [])
     if not log:
         return
 
-    df = pd.DataFrame(log)
-    total            = len(df)
-    copied           = int(df["Copied"].sum())
-    ext_set          = int(df["External Data Set"].sum())
-    both             = int((df["Copied"] & df["External Data Set"]).sum())
-    failed           = int((df["Status"] == "failed").sum())
-    partial          = int((df["Status"] == "partial").sum())
+    total            = len(log)
+    copied           = sum(1 for entry in log if entry["Copied"])
+    ext_set          = sum(1 for entry in log if entry["External Data Set"])
+    both             = sum(1 for entry in log if entry["Copied"] and entry["External Data Set"])
+    failed           = sum(1 for entry in log if entry["Status"] == "failed")
+    partial          = sum(1 for entry in log if entry["Status"] == "partial")
 
     st.subheader("Run Log")
     c1, c2, c3, c4, c5, c6 = st.columns(6)
@@ -302,18 +377,25 @@ def _render_log():
     c5.metric("Partial",          partial)
     c6.metric("Failed",           failed)
 
-    st.dataframe(df, use_container_width=True)
+    st.dataframe(log, use_container_width=True)
 
-    csv = df.to_csv(index=False).encode("utf-8")
-    st.download_button(
-        label="⬇️ Download Log as CSV",
-        data=csv,
-        file_name="copy_documents_log.csv",
-        mime="text/csv",
+    export_format = st.selectbox(
+        "Log export format",
+        ["csv", "xlsx", "ndjson", "parquet"],
+        format_func=lambda fmt: EXPORT_FORMATS[fmt][0],
+        key="copy_docs_log_format",
     )
+    path = _log_export(export_format)
+    with open(path, "rb") as f:
+        st.download_button(
+            label=f"⬇️ Download Log as {EXPORT_FORMATS[export_format][0]}",
+            data=f,
+            file_name=f"copy_documents_log.{export_format}",
+            mime=EXPORT_FORMATS[export_format][1],
+        )
 
     if st.button("Clear Log"):
-        st.session_state["copy_docs_log"] = []
+        _clear_log()
         st.rerun()
 
 
@@ -357,10 +439,10 @@ def _copy_documents_section():
 
     st.divider()
     st.subheader("Document IDs")
-    st.caption("Upload an Excel file with document IDs in the first column.")
+    st.caption("Upload an Excel, CSV or Parquet file with document IDs in the first column.")
     excel_file = st.file_uploader(
-        "Upload Excel (.xlsx / .xls)",
-        type=["xlsx", "xls"],
+        "Upload Excel / CSV / Parquet (.xlsx / .xls / .csv / .parquet)",
+        type=TABLE_FILE_TYPES,
         key="copy_docs_excel",
     )
 
@@ -369,8 +451,7 @@ def _copy_documents_section():
         doc_ids = _parse_doc_ids(excel_file)
         st.info(f"**{len(doc_ids)}** document ID(s) found.")
         with st.expander("Preview IDs"):
-            for did in doc_ids:
-                st.write(f"- `{did}`")
+            st.dataframe(pd.DataFrame({"Document ID": doc_ids}), hide_index=True)
 
     if not doc_ids:
         _render_log()
@@ -425,14 +506,11 @@ def _copy_documents_section():
 
     st.divider()
     if st.button("Copy Documents", type="primary"):
-        # Initialise log for this run (append to existing session log)
-        if "copy_docs_log" not in st.session_state:
-            st.session_state["copy_docs_log"] = []
-
+        # Entries are appended to the existing session log and its file as each document finishes.
         for i, doc_id in enumerate(doc_ids, 1):
             st.markdown(f"### Document {i}/{len(doc_ids)}: `{doc_id}`")
             entry = _copy_one_document(doc_id, source_auth, target_auth, target_project[0])
-            st.session_state["copy_docs_log"].append(entry)
+            _log_entry(entry)
             st.divider()
 
     _render_log()
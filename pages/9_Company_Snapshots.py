@@ -0,0 +1,222 @@
+import os
+import re
+
+import pandas as pd
+import streamlit as st
+from auth import HypatosAPI
+from config import BASE_URL_EU, BASE_URL_US
+from helpers import snapshot_input, validate_scopes
+from setup_api import SetupAPI
+from snapshot import SNAPSHOT_FILE_EXTENSION, create_snapshot, new_snapshot_path, refresh_snapshot, remove_snapshot_file
+
+st.set_page_config(page_title="Company Snapshots", page_icon=":package:")
+
+_STAGE_LABELS = {
+    "details": "project details",
+    "schemas": "project schemas",
+    "routings": "routing rules",
+}
+
+
+def _snapshot_file_name(company_name: str, created_at: str) -> str:
+    safe_name = re.sub(r"[^\w\-]+", "_", company_name or "company").strip("_")
+    stamp = (created_at or "").replace(":", "").replace("-", "")
+    return f"{safe_name}_{stamp}.{SNAPSHOT_FILE_EXTENSION}"
+
+
+# ---------------------------------------------------------------------------
+# Credentials
+# ---------------------------------------------------------------------------
+
+def _credential_inputs(prefix: str):
+    st.selectbox(
+        "API Region",
+        (BASE_URL_EU, BASE_URL_US),
+        key=f"{prefix}_base_url",
+        format_func=lambda url: "EU - api.cloud.hypatos.ai" if url == BASE_URL_EU else "US - api.cloud.hypatos.com",
+    )
+    st.text_input("client_id", key=f"{prefix}_client_id")
+    st.text_input("client_secret", type="password", key=f"{prefix}_client_secret")
+    st.text_input(
+        "Setup API access_token (optional)",
+        type="password",
+        key=f"{prefix}_setup_token",
+        help="Also captures the company's prompting settings and agents from the Setup API.",
+    )
+    st.number_input("Parallel requests", min_value=1, max_value=32, value=8, step=1, key=f"{prefix}_max_workers")
+
+
+def _authenticate(prefix: str):
+    """Returns (auth, setup_api) for the credentials entered under prefix, or None on failure."""
+    client_id = st.session_state.get(f"{prefix}_client_id", "")
+    client_secret = st.session_state.get(f"{prefix}_client_secret", "")
+    if not client_id or not client_secret:
+        st.error("Please provide client_id and client_secret.")
+        return None
+    auth = HypatosAPI(client_id, client_secret, st.session_state[f"{prefix}_base_url"])
+    if not auth.authenticate():
+        st.error(f"❌ Authentication failed\n\n**Error:** {auth.last_error or 'Unknown error occurred'}")
+        return None
+    if not validate_scopes(auth, "Company"):
+        return None
+    setup_token = st.session_state.get(f"{prefix}_setup_token", "").strip()
+    return auth, SetupAPI(setup_token) if setup_token else None
+
+
+def _progress_reporter():
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+
+    def _progress(stage, done, total):
+        status_text.text(f"Fetching {_STAGE_LABELS.get(stage, stage)}: {done}/{total}")
+        progress_bar.progress(done / total if total else 1.0)
+
+    return _progress, status_text
+
+
+def _store_result(manifest, path):
+    failed = manifest["failed"]
+    if any(failed.values()):
+        st.warning(
+            f"Could not fetch {len(failed['details'])} project detail(s), {len(failed['schemas'])} schema(s) "
+            f"and {len(failed['routings'])} routing rule(s). They are missing from the snapshot."
+        )
+    # Only the latest snapshot of the session is kept on disk.
+    previous = st.session_state.get("snapshot_created")
+    if previous and previous["path"] != path:
+        remove_snapshot_file(previous["path"])
+    st.session_state["snapshot_created"] = {
+        "path": path,
+        "file_name": _snapshot_file_name(manifest["company"].get("name"), manifest["created_at"]),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Create snapshot
+# ---------------------------------------------------------------------------
+
+def _create_snapshot_section():
+    st.subheader("Create Snapshot")
+    st.write(
+        "Captures the project list, project details, schemas and routing rules of one company "
+        "into a single compressed file. Identical schemas and rules are stored only once."
+    )
+    _credential_inputs("snapshot")
+    if not st.button("📸 Create Snapshot", type="primary"):
+        return
+    authenticated = _authenticate("snapshot")
+    if authenticated is None:
+        return
+    auth, setup_api = authenticated
+
+    progress, status_text = _progress_reporter()
+    path = new_snapshot_path()
+    manifest = create_snapshot(auth, path, setup_api=setup_api,
+                               max_workers=int(st.session_state["snapshot_max_workers"]),
+                               progress_callback=progress)
+    if manifest is None:
+        remove_snapshot_file(path)
+        st.error("Failed to list the projects or routing rules of the company.")
+        return
+    status_text.text("✅ Snapshot created.")
+    _store_result(manifest, path)
+
+
+# ---------------------------------------------------------------------------
+# Refresh snapshot
+# ---------------------------------------------------------------------------
+
+def _refresh_snapshot_section():
+    st.subheader("Refresh Snapshot")
+    st.write(
+        "Creates a new snapshot from an earlier one, fetching only the projects and routing rules "
+        "that changed since it was taken."
+    )
+    base_api = snapshot_input("Earlier snapshot", "refresh_base_snapshot_file")
+    _credential_inputs("refresh")
+    if not st.button("🔄 Refresh Snapshot", type="primary", disabled=base_api is None):
+        return
+    authenticated = _authenticate("refresh")
+    if authenticated is None:
+        return
+    auth, setup_api = authenticated
+    base = base_api.snapshot
+    company = auth.get_company_info() or {}
+    if base.company.get("id") and company.get("id") and company["id"] != base.company["id"]:
+        st.error("The credentials belong to a different company than the earlier snapshot.")
+        return
+
+    progress, status_text = _progress_reporter()
+    path = new_snapshot_path()
+    manifest = refresh_snapshot(auth, base, path, setup_api=setup_api,
+                                max_workers=int(st.session_state["refresh_max_workers"]),
+                                progress_callback=progress)
+    if manifest is None:
+        remove_snapshot_file(path)
+        st.error("Failed to list the projects or routing rules of the company.")
+        return
+    refresh = manifest["refresh"]
+    status_text.text(
+        f"✅ Snapshot refreshed: {refresh['projects_fetched']} project(s) and "
+        f"{refresh['routings_fetched']} routing rule(s) fetched, {refresh['projects_reused']} project(s) and "
+        f"{refresh['routings_reused']} routing rule(s) unchanged."
+    )
+    _store_result(manifest, path)
+
+
+def _download_created_snapshot(key: str):
+    created = st.session_state.get("snapshot_created")
+    if not created or not os.path.exists(created["path"]):
+        return
+    size_mb = os.path.getsize(created["path"]) / (1024 * 1024)
+    with open(created["path"], "rb") as f:
+        st.download_button(
+            label=f"⬇️ Download Snapshot ({size_mb:.1f} MB)",
+            data=f,
+            file_name=created["file_name"],
+            mime="application/zip",
+            key=key,
+        )
+
+
+# ---------------------------------------------------------------------------
+# Inspect snapshot
+# ---------------------------------------------------------------------------
+
+def _inspect_snapshot_section():
+    st.subheader("Inspect Snapshot")
+    snapshot_api = snapshot_input("Snapshot file", "inspect_snapshot_file")
+    if snapshot_api is None:
+        return
+    snapshot = snapshot_api.snapshot
+    st.dataframe(pd.DataFrame([snapshot.summary()]), use_container_width=True, hide_index=True)
+    projects = pd.DataFrame([
+        {
+            "Project": proj.get("name"),
+            "Project ID": proj["id"],
+            "Schema Hash": (snapshot.schema_hash(proj["id"]) or "")[:12],
+        }
+        for proj in snapshot.projects
+    ])
+    st.dataframe(projects, use_container_width=True, hide_index=True)
+
+
+def main():
+    st.title("📦 Company Snapshots")
+    st.write(
+        "A snapshot is an offline copy of a company's configuration. Upload it on the comparison "
+        "pages to analyse the company without calling the API."
+    )
+    tab_create, tab_refresh, tab_inspect = st.tabs(["Create", "Refresh", "Inspect"])
+    with tab_create:
+        _create_snapshot_section()
+        _download_created_snapshot("download_created_snapshot")
+    with tab_refresh:
+        _refresh_snapshot_section()
+        _download_created_snapshot("download_refreshed_snapshot")
+    with tab_inspect:
+        _inspect_snapshot_section()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import re
+import unicodedata
+from collections import defaultdict
+
+# Minimum token similarity for a fuzzy name match.
+DEFAULT_MIN_FUZZY_SCORE = 0.6
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalizes a project name for matching: Unicode NFKC, case-folded, with
+    every run of punctuation and whitespace collapsed to a single space.
+    "Invoice  EU - [A]" and "invoice_eu [a]" both become "invoice eu a".
+    """
+    folded = unicodedata.normalize("NFKC", name or "").casefold()
+    return _NON_WORD.sub(" ", folded).strip()
+
+
+def name_tokens(name: str) -> frozenset:
+    """Returns the set of normalized tokens of a project name."""
+    return frozenset(normalize_name(name).split())
+
+
+def strip_affixes(name: str, prefix: str = "", suffix: str = "") -> str:
+    """Removes a clone prefix/suffix from a project name if present."""
+    if prefix and name.startswith(prefix):
+        name = name[len(prefix):]
+    if suffix and name.endswith(suffix):
+        name = name[:-len(suffix)]
+    return name
+
+
+class ProjectNameIndex:
+    """
+    Lookup index over the project names of one company.
+
+    Builds an exact-name hash index, a normalized-name hash index and an inverted
+    token index once, so each lookup touches only the projects that share a name
+    or a token with the query instead of scanning every project.
+    """
+
+    def __init__(self, projects, prefix: str = "", suffix: str = ""):
+        """
+        Args:
+            projects: List of project dicts with "id" and "name", as returned by get_projects()["data"].
+            prefix, suffix: Affixes added to the indexed names when they were cloned; they are
+                ignored for matching.
+        """
+        self.projects = {}
+        self.by_name = defaultdict(list)
+        self.by_normalized = defaultdict(list)
+        self.by_token = defaultdict(set)
+        self._tokens = {}
+        for proj in projects:
+            project_id = proj["id"]
+            name = strip_affixes(proj.get("name", ""), prefix, suffix)
+            self.projects[project_id] = proj
+            self.by_name[name].append(project_id)
+            self.by_normalized[normalize_name(name)].append(project_id)
+            tokens = name_tokens(name)
+            self._tokens[project_id] = tokens
+            for token in tokens:
+                self.by_token[token].add(project_id)
+
+    def __len__(self):
+        return len(self.projects)
+
+    def match(self, name: str, normalized: bool = True, fuzzy: bool = False,
+              min_score: float = DEFAULT_MIN_FUZZY_SCORE):
+        """
+        Finds the project matching a name.
+        Tries an exact match, then (if normalized is True) a normalized match and,
+        if fuzzy is True, the project with the highest token Jaccard similarity of
+        at least min_score.
+
+        Returns:
+            tuple: (project dict, match type, score, number of equally good candidates),
+                   or None if nothing matches.
+        """
+        exact = self.by_name.get(name)
+        if exact:
+            return self.projects[exact[0]], "exact", 1.0, len(exact)
+
+        if normalized:
+            same = self.by_normalized.get(normalize_name(name))
+            if same:
+                return self.projects[same[0]], "normalized", 1.0, len(same)
+
+        if not fuzzy:
+            return None
+
+        tokens = name_tokens(name)
+        candidates = set()
+        for token in tokens:
+            candidates.update(self.by_token.get(token, ()))
+        best_score = 0.0
+        best = []
+        for project_id in candidates:
+            other = self._tokens[project_id]
+            score = len(tokens & other) / len(tokens | other)
+            if score > best_score:
+                best_score, best = score, [project_id]
+            elif score == best_score:
+                best.append(project_id)
+        if best and best_score >= min_score:
+            return self.projects[best[0]], "fuzzy", best_score, len(best)
+        return None
+
+
+def pair_projects(source_projects, target_projects, normalized=True, fuzzy=False,
+                  min_score=DEFAULT_MIN_FUZZY_SCORE, target_prefix="", target_suffix=""):
+    """
+    Pairs every source project with a target project by name in one pass.
+
+    Args:
+        source_projects, target_projects: Lists of project dicts with "id" and "name".
+        normalized, fuzzy: Which match types besides exact names are accepted
+            (see ProjectNameIndex.match).
+        target_prefix, target_suffix: Affixes the target names carry from cloning.
+
+    Returns:
+        tuple: (pairs, unmatched) where pairs is a list of dicts with keys
+               source_id, source_name, target_id, target_name, match, score, ambiguous
+               and unmatched is a list of (source_id, source_name) tuples.
+    """
+    index = ProjectNameIndex(target_projects, prefix=target_prefix, suffix=target_suffix)
+    pairs = []
+    unmatched = []
+    for proj in source_projects:
+        found = index.match(proj.get("name", ""), normalized=normalized, fuzzy=fuzzy, min_score=min_score)
+        if found is None:
+            unmatched.append((proj["id"], proj.get("name", "")))
+            continue
+        target, match_type, score, candidates = found
+        pairs.append({
+            "source_id": proj["id"],
+            "source_name": proj.get("name", ""),
+            "target_id": target["id"],
+            "target_name": target.get("name", ""),
+            "match": match_type,
+            "score": round(score, 3),
+            "ambiguous": candidates > 1,
+        })
+    return pairs, unmatched
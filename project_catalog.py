@@ -0,0 +1,141 @@
+import bisect
+import time
+from collections import defaultdict
+
+from cache import RESPONSE_CACHE
+from pairing import normalize_name
+
+# Number of options a project selector shows per page.
+PAGE_SIZE = 50
+
+# Length of the name fragments indexed for substring search.
+_GRAM_SIZE = 3
+
+
+def _grams(key: str) -> set:
+    return {key[i:i + _GRAM_SIZE] for i in range(len(key) - _GRAM_SIZE + 1)}
+
+
+class ProjectCatalog:
+    """
+    Searchable list of the projects of one company, for selectors.
+
+    The projects are sorted by normalized name once, so a name prefix is found by binary
+    search, and every 3-character fragment of the names is indexed, so a substring search
+    only checks the projects that contain all fragments of the query. Searches return one
+    page of options at a time, so a selector never renders thousands of entries.
+    """
+
+    def __init__(self, projects):
+        """
+        Args:
+            projects: List of project dicts with "id" and "name", as returned by get_projects()["data"].
+        """
+        ordered = sorted(
+            (proj for proj in projects if proj.get("id")),
+            key=lambda proj: (normalize_name(proj.get("name", "")), proj["id"]),
+        )
+        self.projects = {proj["id"]: proj for proj in ordered}
+        self.listed_at = time.strftime("%H:%M:%S")
+        self._cache_key = None
+        self._ids = [proj["id"] for proj in ordered]
+        self._positions = {project_id: position for position, project_id in enumerate(self._ids)}
+        self._keys = [normalize_name(proj.get("name", "")) for proj in ordered]
+        self._by_gram = defaultdict(list)
+        for position, key in enumerate(self._keys):
+            for gram in _grams(key):
+                self._by_gram[gram].append(position)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, project_id):
+        return project_id in self.projects
+
+    def name(self, project_id) -> str:
+        proj = self.projects.get(project_id)
+        return proj.get("name", "") if proj else ""
+
+    def invalidate(self):
+        """Drops this catalog from the shared cache, so the project list is retrieved again."""
+        if self._cache_key is not None:
+            RESPONSE_CACHE.pop(self._cache_key)
+
+    def option(self, project_id) -> tuple:
+        """The (project_id, project_name) selector option of a project."""
+        return project_id, self.name(project_id)
+
+    def options(self) -> list:
+        """All projects as (project_id, project_name) options, sorted by name."""
+        return [self.option(project_id) for project_id in self._ids]
+
+    def _prefix_positions(self, key) -> range:
+        start = bisect.bisect_left(self._keys, key)
+        end = bisect.bisect_left(self._keys, key + "\uffff", lo=start)
+        return range(start, end)
+
+    def _substring_positions(self, key) -> list:
+        grams = _grams(key)
+        if not grams:
+            # Queries shorter than a fragment are checked against every name.
+            return [position for position, name in enumerate(self._keys) if key in name]
+        postings = sorted((self._by_gram.get(gram, []) for gram in grams), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        return sorted(position for position in candidates if key in self._keys[position])
+
+    def search(self, query: str = "", offset: int = 0, limit: int = PAGE_SIZE):
+        """
+        Finds the projects whose name contains query (normalized, see pairing.normalize_name)
+        or whose ID equals it. Names starting with the query come first, then the other matches,
+        each sorted by name.
+
+        Returns:
+            tuple: (list of at most limit (project_id, project_name) options from offset on,
+                    total number of matches)
+        """
+        key = normalize_name(query)
+        if not key:
+            positions = range(len(self._ids))
+        else:
+            prefix = self._prefix_positions(key)
+            positions = list(prefix) + [
+                position for position in self._substring_positions(key) if position not in prefix
+            ]
+            query_id = (query or "").strip()
+            if query_id in self.projects:
+                position = self._positions[query_id]
+                positions = [position] + [other for other in positions if other != position]
+        page = [self.option(self._ids[position]) for position in positions[offset:offset + limit]]
+        return page, len(positions)
+
+
+def _catalog_key(auth):
+    return ("project_catalog", auth.base_url, auth.client_id, None)
+
+
+def project_catalog(auth, use_cache=True):
+    """
+    The ProjectCatalog of the company behind auth, reusing a recently built catalog if
+    available. Returns None if the project list cannot be retrieved.
+    """
+    key = _catalog_key(auth)
+    if use_cache:
+        cached = RESPONSE_CACHE.get(key)
+        if cached is not None:
+            return cached
+    data = auth.get_projects()
+    if not data:
+        return None
+    catalog = ProjectCatalog(data.get("data", []))
+    catalog._cache_key = key
+    RESPONSE_CACHE.set(key, catalog)
+    return catalog
+
+
+def invalidate_project_catalog(auth):
+    """Drops the cached catalog of a company, e.g. after projects were created in it."""
+    RESPONSE_CACHE.pop(_catalog_key(auth))
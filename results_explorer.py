@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+from diff_records import render_record
+
+# Pair statuses, in display order.
+STATUS_IDENTICAL = "Identical"
+STATUS_DIFFERENCES = "Differences Found"
+STATUS_ERROR = "Error"
+STATUSES = [STATUS_IDENTICAL, STATUS_DIFFERENCES, STATUS_ERROR]
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def result_status(result: dict) -> str:
+    """Status label of one bulk comparison result."""
+    if result["error"]:
+        return STATUS_ERROR
+    return STATUS_DIFFERENCES if result["has_differences"] else STATUS_IDENTICAL
+
+
+def page_count(total: int, page_size: int) -> int:
+    return max(1, -(-total // page_size))
+
+
+class ResultsExplorer:
+    """
+    Indexed, columnar view of bulk comparison results.
+
+    Builds one row per pair and one row per difference once, with status, datapoint
+    and attribute stored as categoricals, so every filter is a vectorized lookup and
+    only the rows of the requested page are rendered to text.
+    """
+
+    def __init__(self, results):
+        """
+        Args:
+            results: List of result dicts as yielded by comparison.compare_pairs, in pair order.
+        """
+        self.results = results
+        self.pairs = pd.DataFrame({
+            "Pair": np.arange(1, len(results) + 1),
+            "Source Project": [r["source_project_name"] for r in results],
+            "Source Project ID": [r["source_project_id"] for r in results],
+            "Target Project": [r["target_project_name"] for r in results],
+            "Target Project ID": [r["target_project_id"] for r in results],
+            "Status": pd.Categorical([result_status(r) for r in results], categories=STATUSES),
+            "Differences": np.array([len(r["differences"] or []) for r in results], dtype=np.int64),
+            "Error": [r["error"] or "" for r in results],
+        })
+
+        counts = self.pairs["Differences"].to_numpy()
+        # Position of the pair and of the record within that pair's list, for every difference.
+        self._diff_pair = np.repeat(np.arange(len(results)), counts)
+        self._diff_record = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        records = [record for r in results for record in (r["differences"] or [])]
+        self.differences = pd.DataFrame({
+            "pair": self._diff_pair,
+            "datapoint": pd.Categorical([record.datapoint or "" for record in records]),
+            "attribute": pd.Categorical([record.attribute for record in records]),
+            "kind": pd.Categorical([record.kind for record in records]),
+        })
+
+    def __len__(self):
+        return len(self.results)
+
+    @property
+    def attributes(self) -> list:
+        """Attributes (or metadata fields) that have at least one difference."""
+        return sorted(self.differences["attribute"].cat.categories)
+
+    def status_counts(self) -> dict:
+        return self.pairs["Status"].value_counts().reindex(STATUSES, fill_value=0).to_dict()
+
+    def _datapoint_mask(self, query: str) -> np.ndarray:
+        # Substring search runs over the distinct datapoints only, then maps back by category code.
+        column = self.differences["datapoint"]
+        matching = column.cat.categories.str.contains(query, case=False, regex=False)
+        return matching[column.cat.codes.to_numpy()] if len(matching) else np.zeros(len(column), dtype=bool)
+
+    def difference_mask(self, statuses=None, attributes=None, datapoint_query="", pair=None) -> np.ndarray:
+        """Boolean mask over the difference rows matching all given filters."""
+        mask = np.ones(len(self.differences), dtype=bool)
+        if statuses:
+            pair_ok = self.pairs["Status"].isin(statuses).to_numpy()
+            mask &= pair_ok[self._diff_pair]
+        if attributes:
+            mask &= self.differences["attribute"].isin(attributes).to_numpy()
+        if datapoint_query:
+            mask &= self._datapoint_mask(datapoint_query)
+        if pair:
+            mask &= self._diff_pair == pair - 1
+        return mask
+
+    def pair_mask(self, statuses=None, attributes=None, datapoint_query="", pair=None) -> np.ndarray:
+        """
+        Boolean mask over the pairs matching the status filter and, if attribute or
+        datapoint filters are given, having at least one matching difference.
+        pair optionally restricts the mask to one 1-based pair number.
+        """
+        mask = np.ones(len(self.pairs), dtype=bool)
+        if pair:
+            mask[:] = False
+            mask[pair - 1] = True
+        if statuses:
+            mask &= self.pairs["Status"].isin(statuses).to_numpy()
+        if attributes or datapoint_query:
+            matching = self.difference_mask(attributes=attributes, datapoint_query=datapoint_query)
+            has_match = np.zeros(len(self.pairs), dtype=bool)
+            has_match[self._diff_pair[matching]] = True
+            mask &= has_match
+        return mask
+
+    def pairs_page(self, mask, page: int, page_size: int) -> pd.DataFrame:
+        """The rows of one page (1-based) of the pairs selected by mask."""
+        positions = np.flatnonzero(mask)[(page - 1) * page_size:page * page_size]
+        return self.pairs.iloc[positions].reset_index(drop=True)
+
+    def differences_page(self, mask, page: int, page_size: int) -> pd.DataFrame:
+        """The rendered rows of one page (1-based) of the differences selected by mask."""
+        rows = np.flatnonzero(mask)[(page - 1) * page_size:page * page_size]
+        records = [
+            self.results[pair]["differences"][record]
+            for pair, record in zip(self._diff_pair[rows], self._diff_record[rows])
+        ]
+        pair_rows = self.pairs.iloc[self._diff_pair[rows]]
+        return pd.DataFrame({
+            "Pair": pair_rows["Pair"].to_numpy(),
+            "Source Project": pair_rows["Source Project"].to_numpy(),
+            "Target Project": pair_rows["Target Project"].to_numpy(),
+            "Data Point": [record.datapoint or "" for record in records],
+            "Attribute": [record.attribute for record in records],
+            "Difference": [render_record(record) for record in records],
+        })
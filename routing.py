@@ -0,0 +1,247 @@
+import threading
+from collections import deque
+
+from cache import RESPONSE_CACHE, canonical_hash
+from fetcher import fetch_many
+
+# Directions of a routing closure. Downstream follows rules from their fromProject to
+# their toProject: the projects a selection routes documents to.
+DOWNSTREAM = "downstream"
+UPSTREAM = "upstream"
+BOTH = "both"
+
+
+def full_routing_rules(auth, limit=50):
+    """
+    All routing rules of a company from the /routings listing. Rules are fetched one by
+    one only if the listing lacks their project IDs.
+
+    Returns:
+        tuple: (list of rules, list of IDs of listed rules whose details could not be fetched),
+               or (None, []) if the listing itself fails.
+    """
+    rules = auth.get_routing_rules(limit=limit)
+    if rules is None:
+        return None, []
+    incomplete = [rule["id"] for rule in rules if rule.get("id") and "fromProjectId" not in rule]
+    unresolved = []
+    if incomplete:
+        fetched, unresolved = fetch_many(auth.get_routing_by_id, incomplete)
+        rules = [fetched.get(rule.get("id"), rule) for rule in rules]
+    return [rule for rule in rules if rule.get("id") and "fromProjectId" in rule], unresolved
+
+
+class RoutingGraph:
+    """
+    Index of a company's routing rules as a directed graph over projects.
+
+    Built once from the /routings listing, with the rules adjacent to every project
+    indexed by fromProjectId (outgoing) and toProjectId (incoming), so closures and
+    cycle checks walk the graph without any further API calls.
+    """
+
+    def __init__(self, rules, unresolved=()):
+        """
+        Args:
+            rules: Routing rules with fromProjectId and toProjectId.
+            unresolved: IDs of rules that are known to exist but could not be read; they
+                are missing from the graph and reported as failures by the callers.
+        """
+        self.rules = {}
+        self.outgoing = {}
+        self.incoming = {}
+        self.unresolved = list(unresolved)
+        for rule in rules:
+            self.rules[rule["id"]] = rule
+            self.outgoing.setdefault(rule.get("fromProjectId"), []).append(rule)
+            self.incoming.setdefault(rule.get("toProjectId"), []).append(rule)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def successors(self, project_id) -> list:
+        return [rule.get("toProjectId") for rule in self.outgoing.get(project_id, [])]
+
+    def predecessors(self, project_id) -> list:
+        return [rule.get("fromProjectId") for rule in self.incoming.get(project_id, [])]
+
+    def closure(self, project_ids, direction=DOWNSTREAM) -> set:
+        """
+        The selected projects plus every project reachable from them over routing rules.
+        With DOWNSTREAM these are the projects the selection routes documents to, so every
+        routing rule leaving a selected project can be copied along with it.
+        """
+        neighbours = []
+        if direction in (DOWNSTREAM, BOTH):
+            neighbours.append(self.successors)
+        if direction in (UPSTREAM, BOTH):
+            neighbours.append(self.predecessors)
+        reached = set(project_ids)
+        queue = deque(reached)
+        while queue:
+            project_id = queue.popleft()
+            for step in neighbours:
+                for neighbour in step(project_id):
+                    if neighbour and neighbour not in reached:
+                        reached.add(neighbour)
+                        queue.append(neighbour)
+        return reached
+
+    def rules_within(self, project_ids) -> list:
+        """The rules whose two projects are both in project_ids."""
+        project_ids = set(project_ids)
+        return [
+            rule for project_id in project_ids for rule in self.outgoing.get(project_id, [])
+            if rule.get("toProjectId") in project_ids
+        ]
+
+    def cycles(self, project_ids=None) -> list:
+        """
+        Routing cycles, as lists of project IDs: every strongly connected group of two or more
+        projects, and every project routing to itself. With project_ids, only the subgraph of
+        those projects is searched.
+        """
+        nodes = set(project_ids) if project_ids is not None else set(self.outgoing) | set(self.incoming)
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        cycles = []
+        counter = 0
+
+        # Iterative Tarjan: large tenants can have routing chains deeper than the recursion limit.
+        for root in nodes:
+            if root in index:
+                continue
+            work = [(root, iter(self.successors(root)))]
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, children = work[-1]
+                advanced = False
+                for child in children:
+                    if child not in nodes:
+                        continue
+                    if child not in index:
+                        index[child] = lowlink[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(self.successors(child))))
+                        advanced = True
+                        break
+                    if child in on_stack:
+                        lowlink[node] = min(lowlink[node], index[child])
+                if advanced:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1 or node in self.successors(node):
+                        cycles.append(component[::-1])
+        return cycles
+
+
+def routing_graph(auth, use_cache=True):
+    """
+    The RoutingGraph of a company, reusing a recently built graph if available. Returns None
+    if the routing rules cannot be listed. A graph with unresolved rules is not cached.
+    """
+    # Keyed like the other cached responses, so credentials never share another tenant's graph.
+    key = ("routing_graph", auth.base_url, auth.client_id, None)
+    if use_cache:
+        cached = RESPONSE_CACHE.get(key)
+        if cached is not None:
+            return cached
+    rules, unresolved = full_routing_rules(auth)
+    if rules is None:
+        return None
+    graph = RoutingGraph(rules, unresolved)
+    if not unresolved:
+        RESPONSE_CACHE.set(key, graph)
+    return graph
+
+
+def routing_rule_key(rule) -> tuple:
+    """What makes two routing rules equivalent: their two projects and their routingNode content."""
+    return rule.get("fromProjectId"), rule.get("toProjectId"), canonical_hash(rule.get("routingNode"))
+
+
+class RoutingRuleIndex:
+    """
+    The routing rules of a (target) company keyed by routing_rule_key, built from one
+    /routings listing. Rules about to be copied are looked up here first, so a rule that
+    already exists is skipped without any API call. Safe to share between worker threads:
+    a rule being created is reserved, so an equivalent rule copied at the same time waits
+    for it instead of being created as well.
+    """
+
+    def __init__(self, rules):
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._reserved = {}
+        for rule in rules:
+            self._ids.setdefault(routing_rule_key(rule), rule["id"])
+
+    @classmethod
+    def from_auth(cls, auth):
+        """
+        The index of a company's rules, or None if they cannot all be listed: an incomplete
+        index would let existing rules be created again.
+        """
+        rules, unresolved = full_routing_rules(auth)
+        if rules is None or unresolved:
+            return None
+        return cls(rules)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def find(self, rule):
+        """The ID of an existing rule equivalent to rule, or None."""
+        with self._lock:
+            return self._ids.get(routing_rule_key(rule))
+
+    def reserve(self, rule):
+        """
+        The ID of an existing rule equivalent to rule, or None if the caller is to create it.
+        In that case the rule stays reserved until add() or release() is called, and
+        equivalent rules reserved meanwhile wait for the outcome.
+        """
+        key = routing_rule_key(rule)
+        while True:
+            with self._lock:
+                if key in self._ids:
+                    return self._ids[key]
+                pending = self._reserved.get(key)
+                if pending is None:
+                    self._reserved[key] = threading.Event()
+                    return None
+            pending.wait()
+
+    def add(self, rule, rule_id):
+        """Records a rule that was just created, ending its reservation."""
+        key = routing_rule_key(rule)
+        with self._lock:
+            self._ids.setdefault(key, rule_id)
+            pending = self._reserved.pop(key, None)
+        if pending is not None:
+            pending.set()
+
+    def release(self, rule):
+        """Ends the reservation of a rule that could not be created."""
+        with self._lock:
+            pending = self._reserved.pop(routing_rule_key(rule), None)
+        if pending is not None:
+            pending.set()
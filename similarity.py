@@ -0,0 +1,212 @@
+import hashlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+from cache import cached_project_schema
+from comparison import DEFAULT_FETCH_WORKERS, flatten_schema
+
+# 128 permutations in 16 bands of 8 rows: projects with a datapoint Jaccard
+# similarity above roughly 0.7 become LSH candidates of each other.
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 16
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_SEED = 1
+
+
+def _permutations(num_perm):
+    generator = np.random.RandomState(_SEED)
+    a = generator.randint(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+    b = generator.randint(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def _key_hashes(keys):
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=4).digest(), "little") for key in keys),
+        dtype=np.uint64,
+        count=len(keys),
+    )
+
+
+def schema_keys(schema) -> frozenset:
+    """Returns the set of composite datapoint keys (e.g. "items.C") of a schema."""
+    return frozenset(flatten_schema((schema or {}).get("dataPoints", [])))
+
+
+def _fetch_schema_keys(auth, project_id, use_cache):
+    """Returns (keys, schema_hash) of a project, or (None, None) if its schema cannot be fetched."""
+    if hasattr(auth, "get_flat_schema"):
+        # Snapshots hold the keys of every flattened schema, so no datapoint is decoded.
+        flat = auth.get_flat_schema(project_id)
+        if flat is None:
+            return None, None
+        return frozenset(flat), auth.snapshot.schema_hash(project_id)
+    schema, schema_hash = cached_project_schema(auth, project_id, use_cache)
+    if not schema:
+        return None, None
+    return schema_keys(schema), schema_hash
+
+
+class SchemaSimilarityIndex:
+    """
+    MinHash/LSH index over the datapoint key sets of many project schemas.
+
+    Each project gets a MinHash signature of its composite datapoint keys. The
+    signatures are split into bands and bucketed, so similar projects can be
+    found by looking only at the projects that share a bucket instead of
+    comparing every pair.
+    """
+
+    def __init__(self, num_perm=DEFAULT_NUM_PERM, bands=DEFAULT_BANDS):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands.")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._a, self._b = _permutations(num_perm)
+        self.names = {}
+        self.keys = {}
+        self.schema_hashes = {}
+        self.signatures = {}
+        self._buckets = [defaultdict(set) for _ in range(bands)]
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def signature(self, keys) -> np.ndarray:
+        """Computes the MinHash signature of a set of keys."""
+        if not keys:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        hashes = _key_hashes(list(keys))
+        # (a * h + b) mod p for every permutation and key, then the minimum per permutation.
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME
+        return np.bitwise_and(permuted, _MAX_HASH).min(axis=1)
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, project_id, project_name, keys, schema_hash=None):
+        """Adds or replaces a project in the index."""
+        if project_id in self.signatures:
+            self.remove(project_id)
+        signature = self.signature(keys)
+        self.names[project_id] = project_name
+        self.keys[project_id] = frozenset(keys)
+        self.schema_hashes[project_id] = schema_hash
+        self.signatures[project_id] = signature
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band][band_key].add(project_id)
+
+    def remove(self, project_id):
+        signature = self.signatures.pop(project_id, None)
+        if signature is None:
+            return
+        for band, band_key in self._band_keys(signature):
+            bucket = self._buckets[band].get(band_key)
+            if bucket:
+                bucket.discard(project_id)
+                if not bucket:
+                    del self._buckets[band][band_key]
+        self.names.pop(project_id, None)
+        self.keys.pop(project_id, None)
+        self.schema_hashes.pop(project_id, None)
+
+    def candidates(self, project_id) -> set:
+        """Returns the projects sharing at least one LSH bucket with project_id."""
+        found = set()
+        for band, band_key in self._band_keys(self.signatures[project_id]):
+            found.update(self._buckets[band].get(band_key, ()))
+        found.discard(project_id)
+        return found
+
+    def jaccard(self, project_a, project_b) -> float:
+        """Exact Jaccard similarity of two indexed projects' datapoint key sets."""
+        keys_a = self.keys[project_a]
+        keys_b = self.keys[project_b]
+        union = len(keys_a | keys_b)
+        return len(keys_a & keys_b) / union if union else 1.0
+
+    def most_similar(self, project_id, top_n=10):
+        """
+        Returns up to top_n (project_id, project_name, similarity) tuples for the
+        projects most similar to project_id, best first. Only LSH candidates are
+        scored, so projects below the banding threshold are not returned.
+        """
+        scored = [
+            (candidate, self.names[candidate], self.jaccard(project_id, candidate))
+            for candidate in self.candidates(project_id)
+        ]
+        scored.sort(key=lambda item: item[2], reverse=True)
+        return scored[:top_n]
+
+    def clusters(self, threshold=0.9):
+        """
+        Groups projects into near-duplicate clusters. Two projects are linked if
+        they are LSH candidates and their Jaccard similarity is at least threshold;
+        clusters are the connected groups of linked projects.
+        Returns a list of clusters (lists of project IDs) with more than one project,
+        largest first.
+        """
+        parent = {project_id: project_id for project_id in self.signatures}
+
+        def find(project_id):
+            while parent[project_id] != project_id:
+                parent[project_id] = parent[parent[project_id]]
+                project_id = parent[project_id]
+            return project_id
+
+        for band_buckets in self._buckets:
+            for bucket in band_buckets.values():
+                if len(bucket) < 2:
+                    continue
+                members = sorted(bucket)
+                for i, project_a in enumerate(members):
+                    for project_b in members[i + 1:]:
+                        root_a, root_b = find(project_a), find(project_b)
+                        if root_a != root_b and self.jaccard(project_a, project_b) >= threshold:
+                            parent[root_b] = root_a
+
+        groups = defaultdict(list)
+        for project_id in self.signatures:
+            groups[find(project_id)].append(project_id)
+        return sorted((group for group in groups.values() if len(group) > 1), key=len, reverse=True)
+
+
+def build_similarity_index(auth, projects, max_workers=DEFAULT_FETCH_WORKERS, use_cache=True,
+                           num_perm=DEFAULT_NUM_PERM, bands=DEFAULT_BANDS, progress_callback=None):
+    """
+    Fetches every project's schema once (concurrently) and indexes its datapoint keys.
+
+    Args:
+        auth: An instance of HypatosAPI.
+        projects: List of project dicts as returned by get_projects()["data"].
+        progress_callback: Optional callable(done, total) invoked on the calling thread.
+
+    Returns:
+        tuple: (SchemaSimilarityIndex, list of (project_id, project_name) whose schema could not be fetched)
+    """
+    index = SchemaSimilarityIndex(num_perm=num_perm, bands=bands)
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(_fetch_schema_keys, auth, proj["id"], use_cache): (proj["id"], proj["name"])
+            for proj in projects
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            project_id, project_name = futures[future]
+            try:
+                keys, schema_hash = future.result()
+            except Exception as e:
+                print(f"Unexpected error while fetching schema for {project_id}: {e}")
+                keys, schema_hash = None, None
+            if keys is not None:
+                index.add(project_id, project_name, keys, schema_hash)
+            else:
+                failed.append((project_id, project_name))
+            if progress_callback:
+                progress_callback(done, len(futures))
+    return index, failed
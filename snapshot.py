@@ -0,0 +1,678 @@
+import hashlib
+import io
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import zipfile
+from array import array
+from collections.abc import Mapping
+from datetime import datetime, timezone
+
+import numpy as np
+from cache import LRUCache, cached_project_details, cached_project_schema, canonical_hash, canonical_json
+from comparison import _compact_datapoints, flatten_schema
+from fetcher import DEFAULT_FETCH_WORKERS, iter_fetch
+
+# Version of the snapshot file layout, stored in the manifest.
+SNAPSHOT_FORMAT_VERSION = 2
+# Format 1 snapshots have no datapoint pool; their schemas are flattened on first access.
+READABLE_FORMATS = (1, 2)
+SNAPSHOT_FILE_EXTENSION = "hysnap"
+
+MANIFEST_NAME = "manifest.json"
+BLOB_PREFIX = "blobs/"
+# Flattened schemas: one {"keys": [...], "refs": [...]} entry per schema blob.
+FLAT_PREFIX = "flat/"
+# Datapoint pool, stored uncompressed so it can be memory-mapped: the canonical JSON of every
+# distinct compared datapoint, its start offsets (uint64, one extra for the end) and SHA-256 digests.
+POOL_DATA_NAME = "datapoints.bin"
+POOL_OFFSETS_NAME = "datapoints.idx"
+POOL_DIGESTS_NAME = "datapoints.sha"
+
+_DIGEST_SIZE = 32
+# Fixed part of a zip local file header; the file name and extra field follow it.
+_LOCAL_HEADER = struct.Struct("<4s5H3I2H")
+
+# Scopes a snapshot can serve; it is read-only.
+SNAPSHOT_SCOPES = ["projects.read", "routings.read", "companies.read"]
+
+# Decoded blobs kept per open snapshot. Whole schemas can be large; comparisons read
+# the flattened schemas instead, which decode one datapoint at a time.
+BLOB_CACHE_ENTRIES = 32
+FLAT_CACHE_ENTRIES = 1024
+
+
+# --- Writing ---
+
+class SnapshotWriter:
+    """
+    Writes a snapshot file: a zip archive with one deflate-compressed blob per distinct
+    JSON content, named by the SHA-256 of its canonical JSON, and a manifest that maps
+    projects and rules to blob hashes. Identical schemas or rules are stored once.
+
+    Schemas are also stored flattened: each distinct datapoint (reduced to the compared
+    attributes) goes into one shared pool, and each schema keeps only its composite keys
+    and pool references. The pool is buffered in a temporary file until close().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6)
+        self._written = set()
+        self._pool_data = tempfile.TemporaryFile()
+        self._pool_refs = {}
+        self._pool_offsets = array("Q", [0])
+        self._pool_digests = bytearray()
+
+    def put(self, obj) -> str:
+        """Stores obj if its content is not stored yet and returns its content hash."""
+        data = canonical_json(obj)
+        content_hash = hashlib.sha256(data).hexdigest()
+        self.put_raw(content_hash, data)
+        return content_hash
+
+    def put_raw(self, content_hash: str, data: bytes):
+        """Stores already serialized blob bytes, e.g. copied from another snapshot."""
+        if content_hash not in self._written:
+            self._zip.writestr(BLOB_PREFIX + content_hash, data)
+            self._written.add(content_hash)
+
+    def put_datapoint_raw(self, digest: bytes, data: bytes) -> int:
+        """Adds a datapoint's canonical JSON to the pool if it is new and returns its pool index."""
+        ref = self._pool_refs.get(digest)
+        if ref is None:
+            ref = len(self._pool_refs)
+            self._pool_refs[digest] = ref
+            self._pool_data.write(data)
+            self._pool_offsets.append(self._pool_offsets[-1] + len(data))
+            self._pool_digests += digest
+        return ref
+
+    def _put_flat(self, schema_hash, keys, refs):
+        self._zip.writestr(FLAT_PREFIX + schema_hash, canonical_json({"keys": keys, "refs": refs}))
+
+    def put_schema(self, schema) -> str:
+        """Stores a schema blob and its flattened datapoints. Returns the schema's content hash."""
+        schema_hash = self.put(schema)
+        if FLAT_PREFIX + schema_hash not in self._written:
+            self._written.add(FLAT_PREFIX + schema_hash)
+            compact = _compact_datapoints(flatten_schema(schema.get("dataPoints", [])))
+            refs = []
+            for datapoint in compact.values():
+                data = canonical_json(datapoint)
+                refs.append(self.put_datapoint_raw(hashlib.sha256(data).digest(), data))
+            self._put_flat(schema_hash, list(compact), refs)
+        return schema_hash
+
+    def copy_schema(self, snapshot, schema_hash):
+        """Copies a stored schema and its flattened datapoints from another snapshot without decoding them."""
+        self.put_raw(schema_hash, snapshot.raw_blob(schema_hash))
+        if FLAT_PREFIX + schema_hash in self._written:
+            return
+        self._written.add(FLAT_PREFIX + schema_hash)
+        flat = snapshot.flat_schema_by_hash(schema_hash)
+        pool = flat.pool
+        refs = [pool.put_into(self, ref) for ref in flat.refs.values()]
+        self._put_flat(schema_hash, list(flat.refs), refs)
+
+    def _write_stored(self, name, source):
+        info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+        info.compress_type = zipfile.ZIP_STORED
+        with self._zip.open(info, "w", force_zip64=True) as target:
+            shutil.copyfileobj(source, target, length=1024 * 1024)
+
+    def close(self, manifest: dict):
+        try:
+            if manifest:
+                self._pool_data.seek(0)
+                self._write_stored(POOL_DATA_NAME, self._pool_data)
+                self._write_stored(POOL_OFFSETS_NAME, io.BytesIO(np.asarray(self._pool_offsets, dtype="<u8").tobytes()))
+                self._write_stored(POOL_DIGESTS_NAME, io.BytesIO(bytes(self._pool_digests)))
+            self._zip.writestr(MANIFEST_NAME, json.dumps(manifest, indent=1, sort_keys=True))
+        finally:
+            self._zip.close()
+            self._pool_data.close()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _routing_version(rule: dict):
+    """
+    Change marker of a routing rule listing entry: its updatedAt, or the hash of the
+    entry if the listing carries the rule content. None if neither is available.
+    """
+    if rule.get("updatedAt"):
+        return rule["updatedAt"]
+    if len(rule) > 1:
+        return canonical_hash(rule)
+    return None
+
+
+def _capture_setup(writer, setup_api, company):
+    if setup_api is None or not company.get("id"):
+        return None
+    prompting_settings = setup_api.get_prompting_settings(company["id"])
+    agents = setup_api.get_agents(company["id"])
+    return {
+        "prompting_settings": writer.put(prompting_settings) if prompting_settings else None,
+        "agents": writer.put(agents),
+    }
+
+
+def _manifest(auth, company, projects, details, schemas, routings, routing_versions, setup, failed) -> dict:
+    return {
+        "format": SNAPSHOT_FORMAT_VERSION,
+        "created_at": _now(),
+        "base_url": auth.base_url,
+        "company": {"id": company.get("id"), "name": company.get("name")},
+        "projects": projects,
+        "details": details,
+        "schemas": schemas,
+        "routings": routings,
+        "routing_versions": routing_versions,
+        "setup": setup,
+        "failed": failed,
+    }
+
+
+def _fetch_into(put, fetch, keys, max_workers, progress_callback, stage):
+    """Fetches keys concurrently and stores each result with put as it arrives. Returns (hashes, failed)."""
+    hashes = {}
+    failed = []
+    for done, (key, result) in enumerate(iter_fetch(fetch, keys, max_workers), start=1):
+        if result:
+            hashes[key] = put(result)
+        else:
+            failed.append(key)
+        if progress_callback:
+            progress_callback(stage, done, len(keys))
+    return hashes, failed
+
+
+def create_snapshot(auth, path, setup_api=None, max_workers=DEFAULT_FETCH_WORKERS, use_cache=False,
+                    progress_callback=None) -> dict:
+    """
+    Captures a company's configuration into a snapshot file.
+
+    Fetches the project list, every project's details and schema, and every routing rule
+    concurrently (bounded by max_workers). With a SetupAPI, the company's prompting
+    settings and agents are captured as well.
+
+    Args:
+        auth: An authenticated HypatosAPI instance.
+        path: Where to write the snapshot file.
+        setup_api: Optional SetupAPI instance.
+        use_cache: Reuse recently fetched details and schemas instead of fetching them again.
+        progress_callback: Optional callable(stage, done, total) invoked on the calling thread.
+
+    Returns:
+        dict: The snapshot manifest, or None if the project list or the routing rules could
+              not be listed.
+    """
+    company = auth.get_company() or {}
+    project_data = auth.get_projects()
+    if project_data is None:
+        return None
+    projects = project_data.get("data", [])
+    project_ids = [proj["id"] for proj in projects]
+    routing_listing = auth.get_routing_rules(limit=50)
+    if routing_listing is None:
+        return None
+
+    writer = SnapshotWriter(path)
+    try:
+        details, failed_details = _fetch_into(
+            writer.put, lambda pid: cached_project_details(auth, pid, use_cache),
+            project_ids, max_workers, progress_callback, "details",
+        )
+        schemas, failed_schemas = _fetch_into(
+            writer.put_schema, lambda pid: cached_project_schema(auth, pid, use_cache)[0],
+            project_ids, max_workers, progress_callback, "schemas",
+        )
+        routing_versions = {rule["id"]: _routing_version(rule) for rule in routing_listing if rule.get("id")}
+        routings, failed_routings = _fetch_into(
+            writer.put, auth.get_routing_by_id, list(routing_versions), max_workers, progress_callback, "routings",
+        )
+        manifest = _manifest(
+            auth, company, projects, details, schemas, routings, routing_versions,
+            _capture_setup(writer, setup_api, company),
+            {"details": failed_details, "schemas": failed_schemas, "routings": failed_routings},
+        )
+    except BaseException:
+        writer.close({})
+        os.remove(path)
+        raise
+    writer.close(manifest)
+    return manifest
+
+
+def refresh_snapshot(auth, base, path, setup_api=None, max_workers=DEFAULT_FETCH_WORKERS,
+                     progress_callback=None) -> dict:
+    """
+    Writes a new snapshot of the company captured in base (a Snapshot), fetching only
+    what changed since base was taken.
+
+    Projects and routing rules are listed first. A project whose listing updatedAt equals
+    the one in base keeps its stored details and schema. Without updatedAt, the details are
+    fetched and the schema is only fetched again if the details' content hash changed.
+    Routing rules are re-fetched only if their listing updatedAt (or listing content) changed.
+    Unchanged blobs and flattened schemas are copied from base without decoding them.
+
+    Returns:
+        dict: The new manifest, with a "refresh" entry counting reused and fetched items,
+              or None if the project list or the routing rules could not be listed.
+    """
+    company = auth.get_company() or base.company
+    project_data = auth.get_projects()
+    if project_data is None:
+        return None
+    routing_listing = auth.get_routing_rules(limit=50)
+    if routing_listing is None:
+        return None
+    projects = project_data.get("data", [])
+    base_projects = {proj["id"]: proj for proj in base.projects}
+
+    writer = SnapshotWriter(path)
+    details, schemas = {}, {}
+    failed = {"details": [], "schemas": [], "routings": []}
+    stats = {"projects_reused": 0, "projects_fetched": 0, "routings_reused": 0, "routings_fetched": 0}
+
+    def _reuse(hashes, key, content_hash):
+        writer.put_raw(content_hash, base.raw_blob(content_hash))
+        hashes[key] = content_hash
+
+    def _reuse_schema(project_id):
+        schemas[project_id] = base.schema_hash(project_id)
+        writer.copy_schema(base, schemas[project_id])
+
+    try:
+        # Sort projects into unchanged, unknown (no updatedAt to compare) and changed or new.
+        unknown, changed = [], []
+        for proj in projects:
+            project_id = proj["id"]
+            old = base_projects.get(project_id)
+            stored = old is not None and base.details_hash(project_id) and base.schema_hash(project_id)
+            if not stored:
+                changed.append(project_id)
+            elif proj.get("updatedAt") and old.get("updatedAt"):
+                if proj["updatedAt"] == old["updatedAt"]:
+                    _reuse(details, project_id, base.details_hash(project_id))
+                    _reuse_schema(project_id)
+                    stats["projects_reused"] += 1
+                else:
+                    changed.append(project_id)
+            else:
+                unknown.append(project_id)
+
+        # Without updatedAt the details are fetched and their content hash decides.
+        for done, (project_id, result) in enumerate(iter_fetch(auth.get_project_by_id, unknown, max_workers), start=1):
+            if not result:
+                failed["details"].append(project_id)
+            else:
+                details[project_id] = writer.put(result)
+                if details[project_id] == base.details_hash(project_id):
+                    _reuse_schema(project_id)
+                    stats["projects_reused"] += 1
+                else:
+                    changed.append(project_id)
+            if progress_callback:
+                progress_callback("details", done, len(unknown))
+
+        need_details = [project_id for project_id in changed if project_id not in details]
+        fetched_details, failed_details = _fetch_into(
+            writer.put, auth.get_project_by_id, need_details, max_workers, progress_callback, "details",
+        )
+        details.update(fetched_details)
+        failed["details"].extend(failed_details)
+        fetched_schemas, failed["schemas"] = _fetch_into(
+            writer.put_schema, auth.get_project_schema, changed, max_workers, progress_callback, "schemas",
+        )
+        schemas.update(fetched_schemas)
+        stats["projects_fetched"] = len(changed)
+
+        base_routings = base.manifest.get("routings", {})
+        base_versions = base.manifest.get("routing_versions", {})
+        routing_versions = {rule["id"]: _routing_version(rule) for rule in routing_listing if rule.get("id")}
+        routings, changed_routings = {}, []
+        for routing_id, version in routing_versions.items():
+            if version is not None and routing_id in base_routings and base_versions.get(routing_id) == version:
+                _reuse(routings, routing_id, base_routings[routing_id])
+                stats["routings_reused"] += 1
+            else:
+                changed_routings.append(routing_id)
+        fetched_routings, failed["routings"] = _fetch_into(
+            writer.put, auth.get_routing_by_id, changed_routings, max_workers, progress_callback, "routings",
+        )
+        routings.update(fetched_routings)
+        stats["routings_fetched"] = len(changed_routings)
+
+        manifest = _manifest(
+            auth, company, projects, details, schemas, routings, routing_versions,
+            _capture_setup(writer, setup_api, company), failed,
+        )
+        manifest["refresh"] = {"base": base.snapshot_id, "base_created_at": base.created_at, **stats}
+    except BaseException:
+        writer.close({})
+        os.remove(path)
+        raise
+    writer.close(manifest)
+    return manifest
+
+
+# --- Reading ---
+
+class _Pool:
+    def decode(self, ref) -> dict:
+        return json.loads(self.raw(ref))
+
+    def put_into(self, writer, ref) -> int:
+        """Adds one datapoint to a SnapshotWriter's pool and returns its index there."""
+        return writer.put_datapoint_raw(self.digest(ref), self.raw(ref))
+
+
+class _MappedPool(_Pool):
+    """The datapoint pool of a snapshot file, read through a memory map."""
+
+    def __init__(self, data, offsets, digests):
+        self._data = data
+        self._offsets = np.frombuffer(offsets, dtype="<u8")
+        self._digests = digests
+
+    def raw(self, ref) -> bytes:
+        return bytes(self._data[int(self._offsets[ref]):int(self._offsets[ref + 1])])
+
+    def digest(self, ref) -> bytes:
+        return bytes(self._digests[ref * _DIGEST_SIZE:(ref + 1) * _DIGEST_SIZE])
+
+
+class _MemoryPool(_Pool):
+    """An in-memory datapoint pool, for schemas of format 1 snapshots."""
+
+    def __init__(self):
+        self._entries = []
+
+    def add(self, data: bytes) -> int:
+        self._entries.append((hashlib.sha256(data).digest(), data))
+        return len(self._entries) - 1
+
+    def raw(self, ref) -> bytes:
+        return self._entries[ref][1]
+
+    def digest(self, ref) -> bytes:
+        return self._entries[ref][0]
+
+
+class FlatSchema(Mapping):
+    """
+    The flattened datapoints of one schema, mapping composite keys to the compared
+    attributes like comparison._compact_datapoints. Only the keys and pool references
+    are held in memory; a datapoint is decoded when it is accessed, and its
+    datapoint_hash is read from the pool without decoding it.
+    """
+
+    def __init__(self, keys, refs, pool):
+        self.refs = dict(zip(keys, refs))
+        self.pool = pool
+        self._hashes = None
+
+    @classmethod
+    def from_schema(cls, schema):
+        pool = _MemoryPool()
+        compact = _compact_datapoints(flatten_schema(schema.get("dataPoints", [])))
+        return cls(list(compact), [pool.add(canonical_json(dp)) for dp in compact.values()], pool)
+
+    def __getitem__(self, key):
+        return self.pool.decode(self.refs[key])
+
+    def __contains__(self, key):
+        return key in self.refs
+
+    def __iter__(self):
+        return iter(self.refs)
+
+    def __len__(self):
+        return len(self.refs)
+
+    @property
+    def hashes(self) -> dict:
+        """Maps every key to the datapoint_hash of its datapoint."""
+        if self._hashes is None:
+            self._hashes = {key: self.pool.digest(ref).hex() for key, ref in self.refs.items()}
+        return self._hashes
+
+
+class Snapshot:
+    """
+    Read access to a snapshot file. Blobs are read from the archive and decoded only
+    when requested, and recently decoded blobs are kept in a small LRU cache.
+    The datapoint pool is memory-mapped, so flattened schemas only page in the
+    datapoints that are actually read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._zip = zipfile.ZipFile(path)
+        manifest_bytes = self._zip.read(MANIFEST_NAME)
+        self.manifest = json.loads(manifest_bytes)
+        if self.manifest.get("format") not in READABLE_FORMATS:
+            raise ValueError(f"Unsupported snapshot format: {self.manifest.get('format')}")
+        # The manifest references every blob by hash, so its hash identifies the whole snapshot.
+        self.snapshot_id = hashlib.sha256(manifest_bytes).hexdigest()
+        self._blobs = LRUCache(max_entries=BLOB_CACHE_ENTRIES)
+        self._flats = LRUCache(max_entries=FLAT_CACHE_ENTRIES)
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+        self._pool = None
+
+    def _stored_member(self, name) -> memoryview:
+        """Maps an uncompressed archive member without reading it."""
+        info = self._zip.getinfo(name)
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise ValueError(f"Snapshot member {name} is compressed and cannot be memory-mapped.")
+        header = _LOCAL_HEADER.unpack_from(self._map, info.header_offset)
+        start = info.header_offset + _LOCAL_HEADER.size + header[-2] + header[-1]
+        return memoryview(self._map)[start:start + info.file_size]
+
+    @property
+    def pool(self) -> _MappedPool:
+        with self._lock:
+            if self._pool is None:
+                self._file = open(self.path, "rb")
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._pool = _MappedPool(
+                    self._stored_member(POOL_DATA_NAME),
+                    self._stored_member(POOL_OFFSETS_NAME),
+                    self._stored_member(POOL_DIGESTS_NAME),
+                )
+            return self._pool
+
+    @property
+    def company(self) -> dict:
+        return self.manifest.get("company") or {}
+
+    @property
+    def created_at(self) -> str:
+        return self.manifest.get("created_at")
+
+    @property
+    def projects(self) -> list:
+        return self.manifest.get("projects", [])
+
+    def raw_blob(self, content_hash) -> bytes:
+        """Returns the stored canonical JSON bytes of a blob."""
+        with self._lock:
+            return self._zip.read(BLOB_PREFIX + content_hash)
+
+    def blob(self, content_hash):
+        """Returns the decoded JSON stored under content_hash, or None if it is not in the snapshot."""
+        if not content_hash:
+            return None
+        cached = self._blobs.get(content_hash)
+        if cached is not None:
+            return cached
+        try:
+            with self._lock:
+                data = self._zip.read(BLOB_PREFIX + content_hash)
+        except KeyError:
+            return None
+        obj = json.loads(data)
+        self._blobs.set(content_hash, obj)
+        return obj
+
+    def flat_schema_by_hash(self, schema_hash):
+        """Returns the FlatSchema of a stored schema, or None if it is not in the snapshot."""
+        if not schema_hash:
+            return None
+        flat = self._flats.get(schema_hash)
+        if flat is not None:
+            return flat
+        try:
+            with self._lock:
+                entry = json.loads(self._zip.read(FLAT_PREFIX + schema_hash))
+            flat = FlatSchema(entry["keys"], entry["refs"], self.pool)
+        except KeyError:
+            # Format 1 snapshots only store the schema itself.
+            schema = self.blob(schema_hash)
+            if schema is None:
+                return None
+            flat = FlatSchema.from_schema(schema)
+        self._flats.set(schema_hash, flat)
+        return flat
+
+    def flat_schema(self, project_id):
+        return self.flat_schema_by_hash(self.schema_hash(project_id))
+
+    def schema_hash(self, project_id):
+        return self.manifest.get("schemas", {}).get(project_id)
+
+    def details_hash(self, project_id):
+        return self.manifest.get("details", {}).get(project_id)
+
+    def schema(self, project_id):
+        return self.blob(self.schema_hash(project_id))
+
+    def details(self, project_id):
+        return self.blob(self.details_hash(project_id))
+
+    def routing(self, routing_id):
+        return self.blob(self.manifest.get("routings", {}).get(routing_id))
+
+    def routing_ids(self) -> list:
+        return list(self.manifest.get("routings", {}))
+
+    def setup(self, name):
+        """Returns the captured Setup API resource ("prompting_settings" or "agents"), or None."""
+        return self.blob((self.manifest.get("setup") or {}).get(name))
+
+    def summary(self) -> dict:
+        return {
+            "Company": self.company.get("name"),
+            "Created": self.created_at,
+            "Projects": len(self.projects),
+            "Schemas": len(self.manifest.get("schemas", {})),
+            "Routing Rules": len(self.manifest.get("routings", {})),
+            "Setup Settings": self.manifest.get("setup") is not None,
+        }
+
+    def close(self):
+        self._zip.close()
+        with self._lock:
+            self._pool = None
+            self._flats.clear()
+            if self._map is not None:
+                try:
+                    self._map.close()
+                except BufferError:
+                    # Flattened schemas still in use keep the map open until they are released.
+                    pass
+                self._file.close()
+
+
+class SnapshotAPI:
+    """
+    Read-only stand-in for HypatosAPI that serves a Snapshot, so the comparison pages
+    can run against stored snapshots without calling the API.
+    """
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+        # base_url and client_id make the response cache keys unique per snapshot.
+        self.base_url = f"snapshot://{snapshot.snapshot_id}"
+        self.client_id = snapshot.company.get("id")
+        self.scopes = list(SNAPSHOT_SCOPES)
+        self.last_error = None
+
+    def authenticate(self) -> bool:
+        return True
+
+    def has_required_scopes(self, required_scopes: list) -> bool:
+        return not self.get_missing_scopes(required_scopes)
+
+    def get_missing_scopes(self, required_scopes: list) -> list:
+        return [scope for scope in required_scopes if scope not in self.scopes]
+
+    def get_projects(self):
+        projects = self.snapshot.projects
+        return {"data": projects, "totalCount": len(projects)}
+
+    def get_project_schema(self, project_id):
+        return self.snapshot.schema(project_id)
+
+    def get_project_by_id(self, project_id):
+        return self.snapshot.details(project_id)
+
+    def get_flat_schema(self, project_id):
+        """The project's schema as a FlatSchema; used by comparisons instead of get_project_schema."""
+        return self.snapshot.flat_schema(project_id)
+
+    def get_schema_hash(self, project_id):
+        """Content hash of the project's schema, known without reading the schema."""
+        return self.snapshot.schema_hash(project_id)
+
+    def get_routing_rules(self, limit=20):
+        return [self.snapshot.routing(routing_id) for routing_id in self.snapshot.routing_ids()]
+
+    def get_all_routing_rule_ids(self, limit=20):
+        return self.snapshot.routing_ids()
+
+    def get_routing_by_id(self, routing_id):
+        return self.snapshot.routing(routing_id)
+
+    def get_company(self) -> dict:
+        return self.snapshot.company
+
+    def get_company_info(self, company_id: str = None):
+        return self.snapshot.company
+
+
+def new_snapshot_path() -> str:
+    """A path for a new snapshot file in its own temporary directory, see remove_snapshot_file."""
+    return os.path.join(tempfile.mkdtemp(prefix="snapshot_"), f"snapshot.{SNAPSHOT_FILE_EXTENSION}")
+
+
+def remove_snapshot_file(path):
+    """Deletes a snapshot file created at a new_snapshot_path, together with its directory."""
+    if path:
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+def open_snapshot_upload(uploaded_file) -> SnapshotAPI:
+    """
+    Stores an uploaded snapshot file at a new_snapshot_path and opens it. The caller removes
+    the file with remove_snapshot_file once the snapshot is no longer used.
+    """
+    path = new_snapshot_path()
+    with open(path, "wb") as f:
+        f.write(uploaded_file.getvalue())
+    try:
+        return SnapshotAPI(Snapshot(path))
+    except Exception:
+        remove_snapshot_file(path)
+        raise
@@ -0,0 +1,374 @@
+import csv
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook, load_workbook
+
+# Number of worksheet rows collected before they are turned into a DataFrame chunk.
+ROW_CHUNK_SIZE = 50_000
+
+# File types accepted by the table loaders.
+TABLE_FILE_TYPES = ["xlsx", "xls", "csv", "parquet"]
+
+# A cell that Excel stored with its leading apostrophe, e.g. '00001 or '-12.5.
+_APOSTROPHE_NUMBER = r"^'[\d.\-]*\d[\d.\-]*$"
+
+
+def _file_extension(uploaded_file) -> str:
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        name = os.fspath(uploaded_file)
+    else:
+        name = getattr(uploaded_file, "name", "") or ""
+    return os.path.splitext(name)[1].lower().lstrip(".") or "xlsx"
+
+
+def _cell_text(value) -> str:
+    # Same text as pd.read_excel(dtype=str): empty cells become "", dates "2024-01-02 00:00:00".
+    return "" if value is None else str(value)
+
+
+def _iter_sheet_chunks(uploaded_file, max_col=None):
+    """
+    Yields the rows of the first worksheet of an .xlsx file as lists of strings, grouped
+    into lists of ROW_CHUNK_SIZE rows. openpyxl's read-only mode streams the worksheet, so
+    only one chunk is held in memory. Empty rows are kept, except at the end of the sheet.
+    """
+    workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        # The stored dimensions can be wrong; read every row the sheet actually has.
+        sheet.reset_dimensions()
+        chunk = []
+        empty_rows = []
+        for values in sheet.iter_rows(max_col=max_col, values_only=True):
+            row = [_cell_text(value) for value in values]
+            if not any(row):
+                empty_rows.append(row)
+                continue
+            for pending in empty_rows + [row]:
+                chunk.append(pending)
+                if len(chunk) >= ROW_CHUNK_SIZE:
+                    yield chunk
+                    chunk = []
+            empty_rows = []
+        if chunk:
+            yield chunk
+    finally:
+        workbook.close()
+
+
+def _read_xlsx(uploaded_file, header=True, max_col=None) -> pd.DataFrame:
+    columns = None
+    frames = []
+    for chunk in _iter_sheet_chunks(uploaded_file, max_col=max_col):
+        if header and columns is None:
+            columns, chunk = chunk[0], chunk[1:]
+        if chunk:
+            frames.append(pd.DataFrame(chunk, dtype=object))
+    if not frames:
+        return pd.DataFrame(columns=columns or [], dtype=object)
+    # Rows of different lengths are padded to the widest row, like pd.read_excel.
+    df = pd.concat(frames, ignore_index=True).fillna("")
+    if columns is not None:
+        width = max(len(columns), df.shape[1])
+        df = df.reindex(columns=range(width), fill_value="")
+        df.columns = [
+            columns[position] if position < len(columns) and columns[position] != "" else f"Unnamed: {position}"
+            for position in range(width)
+        ]
+    return df
+
+
+def read_raw_table(uploaded_file, header=True, max_col=None) -> pd.DataFrame:
+    """
+    Reads an uploaded .xlsx, .xls, .csv or .parquet file with every cell as a string.
+    Empty cells become "". The file type is taken from the file name and defaults to .xlsx.
+
+    Args:
+        uploaded_file: A Streamlit UploadedFile, a path or a file-like object.
+        header: Whether the first row holds the column names.
+        max_col: Only read this many leading columns (Excel files only).
+    """
+    extension = _file_extension(uploaded_file)
+    header_row = 0 if header else None
+    if extension == "csv":
+        df = pd.read_csv(uploaded_file, header=header_row, dtype=str, keep_default_na=False)
+    elif extension == "parquet":
+        df = pd.read_parquet(uploaded_file)
+        # Parquet columns always carry names, so header does not apply.
+        df = df.astype("string").fillna("").astype(object)
+    elif extension == "xls":
+        # Legacy workbooks cannot be streamed by openpyxl.
+        df = pd.read_excel(uploaded_file, header=header_row, dtype=str, keep_default_na=False)
+    else:
+        df = _read_xlsx(uploaded_file, header=header, max_col=max_col)
+    if max_col is not None:
+        df = df.iloc[:, :max_col]
+    return df
+
+
+def normalize_text_column(column: pd.Series) -> pd.Series:
+    """
+    Strips whitespace and removes Excel's leading apostrophe from numbers like '00001,
+    using vectorized string operations.
+    """
+    text = column.fillna("").astype(str).str.strip()
+    quoted = text.str.match(_APOSTROPHE_NUMBER)
+    return text.where(~quoted, text.str[1:])
+
+
+def load_table(uploaded_file) -> pd.DataFrame:
+    """
+    Reads a table strictly as strings to preserve leading zeros and Excel's leading apostrophe.
+    Accepts .xlsx, .xls, .csv and .parquet files.
+    """
+    df = read_raw_table(uploaded_file)
+    # Normalize headers
+    df.columns = [str(c).strip() for c in df.columns]
+    return df.apply(normalize_text_column)
+
+
+def read_id_column(uploaded_file) -> pd.Series:
+    """
+    Reads the first column of a header-less table as stripped strings, skipping empty cells.
+    Accepts .xlsx, .xls, .csv and .parquet files.
+    """
+    df = read_raw_table(uploaded_file, header=False, max_col=1)
+    if df.empty:
+        return pd.Series([], dtype=object)
+    values = df.iloc[:, 0].astype(str).str.strip()
+    return values[values != ""].reset_index(drop=True)
+
+
+
+# --- Streaming Exporters ---
+
+# Rows buffered per Parquet row group.
+PARQUET_ROW_GROUP_SIZE = 10_000
+
+
+def _scalar(value):
+    # Nested values are written as compact JSON so every format gets one cell per value.
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, default=str)
+    return value
+
+
+class _RowWriter:
+    """
+    Base class of the streaming exporters. Rows are dicts, written one at a time to a
+    file on disk, so an export never holds more than a small buffer in memory.
+    """
+
+    def __init__(self, path, columns=None):
+        self.path = path
+        self.columns = list(columns) if columns else None
+        self.rows_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _values(self, row):
+        if self.columns is None:
+            self.columns = list(row)
+        return [_scalar(row.get(column)) for column in self.columns]
+
+    def write_row(self, row: dict):
+        raise NotImplementedError
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write_row(row)
+
+    def close(self):
+        pass
+
+
+class CsvRowWriter(_RowWriter):
+    """Writes rows to a UTF-8 CSV file with a header row."""
+
+    def __init__(self, path, columns=None):
+        super().__init__(path, columns)
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file)
+        if self.columns:
+            self._writer.writerow(self.columns)
+
+    def write_row(self, row):
+        header_pending = self.columns is None
+        values = self._values(row)
+        if header_pending:
+            self._writer.writerow(self.columns)
+        self._writer.writerow(["" if value is None else value for value in values])
+        self.rows_written += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class XlsxRowWriter(_RowWriter):
+    """
+    Writes rows to an .xlsx file with openpyxl's write-only mode, which streams each
+    appended row to a temporary file instead of keeping a cell object per value.
+    """
+
+    def __init__(self, path, columns=None, sheet_name="Sheet1"):
+        super().__init__(path, columns)
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet(title=sheet_name)
+        self._closed = False
+        if self.columns:
+            self._sheet.append(self.columns)
+
+    def write_row(self, row):
+        header_pending = self.columns is None
+        values = self._values(row)
+        if header_pending:
+            self._sheet.append(self.columns)
+        self._sheet.append(values)
+        self.rows_written += 1
+
+    def close(self):
+        if not self._closed:
+            self._workbook.save(self.path)
+            self._closed = True
+
+
+class NdjsonRowWriter(_RowWriter):
+    """
+    Writes each row as one JSON object per line. Rows keep all of their keys.
+    With append, rows are added to an existing file, e.g. a log written entry by entry.
+    """
+
+    def __init__(self, path, columns=None, append=False):
+        super().__init__(path, columns)
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write_row(self, row):
+        if self.columns is not None:
+            row = {column: row.get(column) for column in self.columns}
+        self._file.write(json.dumps(row, default=str))
+        self._file.write("\n")
+        self.rows_written += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def iter_ndjson_rows(path, key=None):
+    """
+    Yields the rows of an NDJSON file one at a time. With key, a row whose key column repeats
+    an earlier row's value replaces it: only the last row of each value is yielded, at the
+    position of the first. The file is read twice, so only line offsets are kept in memory.
+    """
+    if key is None:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    # First pass: the offset of the last line of every key value, in order of first appearance.
+    latest = {}
+    with open(path, "rb") as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                value = json.loads(line).get(key)
+                latest[offset if value is None else ("key", value)] = offset
+            offset += len(line)
+    with open(path, "rb") as f:
+        for offset in latest.values():
+            f.seek(offset)
+            yield json.loads(f.readline())
+
+
+_ARROW_TYPES = {int: pa.int64(), float: pa.float64(), bool: pa.bool_()}
+
+
+class ParquetRowWriter(_RowWriter):
+    """
+    Writes rows to a Parquet file in row groups of PARQUET_ROW_GROUP_SIZE rows.
+    types optionally maps columns to int, float or bool; all other columns are written
+    as strings, so values of mixed types are never lost.
+    """
+
+    def __init__(self, path, columns=None, types=None, row_group_size=PARQUET_ROW_GROUP_SIZE):
+        super().__init__(path, columns)
+        self.types = types or {}
+        self.row_group_size = row_group_size
+        self._buffer = []
+        self._writer = None
+        self._closed = False
+
+    def _schema(self):
+        return pa.schema([
+            pa.field(str(column), _ARROW_TYPES.get(self.types.get(column), pa.string()))
+            for column in self.columns or []
+        ])
+
+    def _coerce(self, value, python_type):
+        if value is None:
+            return None
+        if python_type is None:
+            return str(value)
+        try:
+            return python_type(value)
+        except (TypeError, ValueError):
+            return None
+
+    def _flush(self):
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, self._schema())
+        if not self._buffer:
+            return
+        arrays = []
+        for position, field in enumerate(self._writer.schema):
+            python_type = self.types.get(self.columns[position])
+            arrays.append(pa.array([self._coerce(row[position], python_type) for row in self._buffer], type=field.type))
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._writer.schema))
+        self._buffer = []
+
+    def write_row(self, row):
+        self._buffer.append(self._values(row))
+        self.rows_written += 1
+        if len(self._buffer) >= self.row_group_size:
+            self._flush()
+
+    def close(self):
+        if self._closed:
+            return
+        # Also writes a valid, empty file if no rows were written.
+        self._flush()
+        self._writer.close()
+        self._closed = True
+
+
+# Export formats: file extension -> (label, MIME type, writer class).
+EXPORT_FORMATS = {
+    "xlsx": ("Excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", XlsxRowWriter),
+    "csv": ("CSV", "text/csv", CsvRowWriter),
+    "ndjson": ("NDJSON", "application/x-ndjson", NdjsonRowWriter),
+    "parquet": ("Parquet", "application/vnd.apache.parquet", ParquetRowWriter),
+}
+
+
+def open_row_writer(export_format: str, path, columns=None, sheet_name="Sheet1", types=None):
+    """
+    Opens the streaming writer for an export format from EXPORT_FORMATS.
+    sheet_name only applies to Excel and types only to Parquet (see ParquetRowWriter).
+    """
+    writer_class = EXPORT_FORMATS[export_format][2]
+    if writer_class is XlsxRowWriter:
+        return writer_class(path, columns, sheet_name=sheet_name)
+    if writer_class is ParquetRowWriter:
+        return writer_class(path, columns, types=types)
+    return writer_class(path, columns)
@@ -0,0 +1,161 @@
+import re
+import threading
+import time
+
+from cache import canonical_hash
+from fetcher import DEFAULT_FETCH_WORKERS, iter_fetch
+from routing import RoutingGraph, full_routing_rules
+
+# Seconds a template catalog is served before the template company is checked for changes.
+TEMPLATE_REFRESH_SECONDS = 300
+
+# Setup tags in template project names, e.g. "Invoice EU [A]".
+TAG_PATTERN = re.compile(r"\[[^\[\]]+\]")
+
+
+class TemplateCatalog:
+    """
+    Process-wide catalog of one template company: its projects with their details and
+    schemas, its routing rules, and an index from setup tag to projects.
+
+    The catalog is warmed once and shared by every session. A refresh lists the projects
+    and fetches details and schemas only for projects that are new or changed, and bumps
+    version whenever the content changed. Picking a tag and cloning reads everything from
+    the catalog, without calls to the template company.
+    """
+
+    def __init__(self, refresh_seconds=TEMPLATE_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.version = 0
+        self.refreshed_at = None
+        self._lock = threading.Lock()
+        self._projects = {}
+        self._tag_index = {}
+        self._routing_graph = RoutingGraph([])
+        self._checked = None
+
+    def _stale(self) -> bool:
+        return self._checked is None or time.monotonic() - self._checked > self.refresh_seconds
+
+    def ensure_fresh(self, auth, max_workers=DEFAULT_FETCH_WORKERS) -> bool:
+        """Refreshes the catalog if it was never loaded or is older than refresh_seconds."""
+        if not self._stale():
+            return True
+        return self.refresh(auth, max_workers, force=False)
+
+    def refresh(self, auth, max_workers=DEFAULT_FETCH_WORKERS, force=True) -> bool:
+        """
+        Brings the catalog up to date with the template company. Returns False (keeping the
+        current content) if the project list or the routing rules cannot be retrieved.
+        """
+        # One refresh at a time; sessions arriving meanwhile wait and then see the fresh catalog.
+        with self._lock:
+            if not force and not self._stale():
+                return True
+            data = auth.get_projects()
+            if not data:
+                print("Failed to refresh the template catalog: the project list could not be retrieved.")
+                return False
+            listed = {proj["id"]: proj for proj in data.get("data", []) if proj.get("id")}
+
+            projects = {}
+            to_fetch = []
+            for project_id, proj in listed.items():
+                entry = self._projects.get(project_id)
+                if entry and proj.get("updatedAt") and proj["updatedAt"] == entry["project"].get("updatedAt"):
+                    projects[project_id] = dict(entry, project=proj)
+                else:
+                    to_fetch.append(project_id)
+
+            changed = set(self._projects) != set(listed)
+            def _fetch(project_id):
+                return self._fetch(auth, project_id, reuse_schema=not listed[project_id].get("updatedAt"))
+
+            for project_id, fetched in iter_fetch(_fetch, to_fetch, max_workers):
+                if fetched is None:
+                    # Keep what the catalog had; the project is fetched again on the next refresh.
+                    if project_id in self._projects:
+                        projects[project_id] = self._projects[project_id]
+                    continue
+                old = self._projects.get(project_id)
+                if old is None or (old["details_hash"], old["schema_hash"]) != (fetched["details_hash"], fetched["schema_hash"]):
+                    changed = True
+                projects[project_id] = dict(fetched, project=listed[project_id])
+
+            rules, unresolved = full_routing_rules(auth)
+            if rules is None or unresolved:
+                print("Failed to refresh the template catalog: the routing rules could not be retrieved.")
+                return False
+            routing_graph = RoutingGraph(rules)
+            if canonical_hash(routing_graph.rules) != canonical_hash(self._routing_graph.rules):
+                changed = True
+
+            self._projects = projects
+            self._tag_index = self._build_tag_index(projects)
+            self._routing_graph = routing_graph
+            self._checked = time.monotonic()
+            self.refreshed_at = time.strftime("%Y-%m-%d %H:%M:%S")
+            if changed:
+                self.version += 1
+            return True
+
+    def _fetch(self, auth, project_id, reuse_schema):
+        old = self._projects.get(project_id)
+        details = auth.get_project_by_id(project_id)
+        if not details:
+            return None
+        details_hash = canonical_hash(details)
+        if reuse_schema and old is not None and old["details_hash"] == details_hash:
+            # Listing without updatedAt: unchanged details keep the stored schema.
+            return dict(old, details=details)
+        schema = auth.get_project_schema(project_id)
+        if not schema:
+            return None
+        return {"details": details, "details_hash": details_hash, "schema": schema, "schema_hash": canonical_hash(schema)}
+
+    @staticmethod
+    def _build_tag_index(projects):
+        index = {}
+        for project_id, entry in sorted(projects.items(), key=lambda item: item[1]["project"].get("name") or ""):
+            for tag in set(TAG_PATTERN.findall(entry["project"].get("name") or "")):
+                index.setdefault(tag, []).append(project_id)
+        return index
+
+    def __len__(self):
+        return len(self._projects)
+
+    def tags(self) -> list:
+        return sorted(self._tag_index)
+
+    def projects_with_tag(self, tag) -> list:
+        """(project_id, project_name) of the template projects tagged with tag, sorted by name."""
+        projects = self._projects
+        return [
+            (project_id, projects[project_id]["project"].get("name"))
+            for project_id in self._tag_index.get(tag, [])
+            if project_id in projects
+        ]
+
+    def source(self, project_id):
+        """(details, schema, schema_hash) of a template project, or None if it is not in the catalog."""
+        entry = self._projects.get(project_id)
+        if entry is None:
+            return None
+        return entry["details"], entry["schema"], entry["schema_hash"]
+
+    @property
+    def routing_rules(self) -> list:
+        return list(self._routing_graph.rules.values())
+
+
+_CATALOGS = {}
+_CATALOGS_LOCK = threading.Lock()
+
+
+def template_catalog(auth) -> TemplateCatalog:
+    """The shared TemplateCatalog of the company behind auth (one per API region and client)."""
+    key = (auth.base_url, auth.client_id)
+    with _CATALOGS_LOCK:
+        if key not in _CATALOGS:
+            _CATALOGS[key] = TemplateCatalog()
+        return _CATALOGS[key]